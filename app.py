@@ -1,8 +1,35 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import openai
 import re
 import math
+import os
+import time
+import uuid
+import prompts
+from catalog import get_catalog
+from diagrams import diagram_html
+from event_store import event_store
+from journeys import get_journey
+from journey_state import JourneyState
+from llm import completion_with_reuse, CompletionStream, response_cache, run_concurrently
+from metrics import metrics
+from personas import get_persona_catalog
+from prompts import count_tokens
+from session_store import session_store
+from shared_cache import shared_cache
+from similarity import similar_responses
+from simulator import simulate_journey, journey_stages, DEFAULT_CONVERSION_RATES
+from sweep import QUICK_WAIT_OPTIONS, candidate_grid, describe_candidate, describe_front, run_sweep
+from timeline import EventTimeline
+
+# --- Startup ---
+@st.cache_resource
+def start_metrics_endpoint():
+    """Serve phase timings on METRICS_PORT, if set"""
+    metrics.serve()
+
+start_metrics_endpoint()
+run_started = time.perf_counter()
 
 # --- Page Configuration ---
 st.set_page_config(page_title="Iterable Demo Copilot", layout="wide")
@@ -34,21 +61,40 @@ def initialize_session_state():
     """Initialize all session state variables if they don't exist"""
     default_values = {
         'current_persona': 'GlowSkin',
-        'event_timeline': [],
-        'next_node_id': '',
-        'event_suggestion': '',
-        'journey_optimization': '',
-        'business_impact': ''
+        'event_timeline': EventTimeline(),
+        'session_key': uuid.uuid4().hex,
+        'ai_latency': {}
     }
     
-    for key, default_value in default_values.items():
-        if key not in st.session_state:
-            st.session_state[key] = default_value
+    with metrics.span("session_init"):
+        for key, default_value in default_values.items():
+            if key not in st.session_state:
+                st.session_state[key] = default_value
 
 initialize_session_state()
 
+# AI responses live in the shared session store; sessions only hold references
+def ai_response(slot):
+    return session_store.get(st.session_state.session_key, slot)
+
+def set_ai_response(slot, text):
+    session_store.set(st.session_state.session_key, slot, text)
+
+def clear_ai_responses(*slots):
+    session_store.clear(st.session_state.session_key, *slots)
+
 # --- Persona Selector ---
-persona_list = ["GlowSkin", "PulseFit", "JetQuest", "LeadSync"]
+catalog = get_catalog()
+persona_catalog = get_persona_catalog()
+
+# Large catalogs are searched by name prefix instead of listing every persona
+if len(persona_catalog) > 50:
+    persona_query = st.sidebar.text_input("Search Personas:", "")
+    persona_list = persona_catalog.search(persona_query, limit=100) if persona_query else persona_catalog.names(limit=100)
+    if st.session_state.current_persona in persona_catalog and st.session_state.current_persona not in persona_list:
+        persona_list = [st.session_state.current_persona] + persona_list
+else:
+    persona_list = persona_catalog.names()
 
 persona = st.sidebar.selectbox("Choose a Persona:", persona_list, 
                               index=persona_list.index(st.session_state.current_persona) if st.session_state.current_persona in persona_list else 0)
@@ -56,549 +102,507 @@ persona = st.sidebar.selectbox("Choose a Persona:", persona_list,
 # Check if persona changed and reset if so
 if persona != st.session_state.current_persona:
     st.session_state.current_persona = persona
-    st.session_state.event_timeline = []
-    st.session_state.next_node_id = ""
-    st.session_state.event_suggestion = ""
-    st.session_state.journey_optimization = ""
-    st.session_state.business_impact = ""
+    st.session_state.event_timeline.clear()
+    clear_ai_responses()
     st.rerun()
 
-# --- Event Selector ---
-event_options = {
-    "GlowSkin": [
-        "Cart Abandoned", "Email Opened", "Email Unopened", "Push Notification Ignored", 
-        "SMS Received", "Product Review Left", "Wishlist Item Added", "Discount Code Used",
-        "Social Media Shared", "Return Customer", "Subscription Started", "Unsubscribed"
-    ],
-    "PulseFit": [
-        "User Inactive", "Push Notification Sent", "Email Unopened", "Workout Completed",
-        "App Opened", "Premium Upgrade", "Goal Achievement", "Friend Invited", 
-        "Progress Photo Shared", "Subscription Cancelled", "Support Contact", "Tutorial Skipped"
-    ],
-    "JetQuest": [
-        "Flight Searched", "Booking Abandoned", "Email Opened", "SMS Clicked", 
-        "Price Alert Set", "Loyalty Points Earned", "Review Left", "Newsletter Subscribed",
-        "Mobile App Downloaded", "Customer Service Contact", "Refund Requested", "Rebooking Attempt"
-    ],
-    "LeadSync": [
-        "Trial Started", "Demo Requested", "Email Unopened", "Feature Explored",
-        "Integration Attempted", "Onboarding Completed", "Team Member Invited", "Billing Info Added",
-        "Support Ticket Created", "Webinar Attended", "Case Study Downloaded", "Contract Signed"
-    ]
+# Only the active persona's detail is loaded
+try:
+    persona_detail = persona_catalog.load(persona)
+except ValueError as e:
+    st.error(f"This persona cannot be shown: {e}")
+    st.stop()
+
+# Journey position is advanced one event at a time; it is only rebuilt from the
+# whole timeline when the persona (or its event mapping) changes
+journey_state = st.session_state.get("journey_state")
+if journey_state is None or journey_state.persona != persona or journey_state.event_to_node is not persona_detail["event_to_node"]:
+    with metrics.span("persona_switch"):
+        journey_state = JourneyState(persona, persona_detail["event_to_node"]).replay(st.session_state.event_timeline)
+        st.session_state.journey_state = journey_state
+
+# --- Page Sections ---
+# Each section below is a fragment: a widget inside one reruns only that
+# section. Sections share state through st.session_state, and a callback
+# that changes shared state reruns just the sections that display it, as
+# listed here. Sections that only read shared state when a button is pressed
+# (the AI prompts read the timeline) do not rerun when it changes.
+SECTION_DEPENDENCIES = {
+    "timeline": ["timeline", "diagram", "event_analytics"],
+    "selected_event": ["diagram"],
+    "ai_responses": ["ai_panel", "orchestration_hub"],
 }
 
-selected_event = st.selectbox("Simulate User Event:", event_options.get(persona, []))
+def rerun_sections(*state):
+    """Rerun the sections that display the given state; for use in widget callbacks"""
+    st.rerun(list(dict.fromkeys(section for name in state for section in SECTION_DEPENDENCIES[name])))
 
-# --- Timeline Management ---
-col1, col2 = st.columns(2)
+journey = get_journey(persona)
+
+def journey_position():
+    """Highlighted node and latest event.
+
+    The timeline's journey position wins; before any event, the selected
+    event is previewed.
+    """
+    selected_event = st.session_state.get("selected_event", "")
+    highlight_node = journey_state.node or persona_detail["event_to_node"].get(selected_event, "")
+    return highlight_node, journey_state.last_event or selected_event
 
-with col1:
-    if st.button("Add Event to Timeline"):
-        if selected_event and selected_event not in st.session_state.event_timeline:
+# --- Timeline Management ---
+def add_event():
+    # Repeats are allowed: a second "Email Opened" is part of the customer's history
+    selected_event = st.session_state.get("selected_event")
+    if selected_event:
+        with metrics.span("timeline_update", action="add"):
             st.session_state.event_timeline.append(selected_event)
-            st.rerun()
+            journey_state.advance(selected_event)
+            event_store.append(persona, selected_event, journey_state.node, st.session_state.session_key)
+    rerun_sections("timeline")
+
+def reset_timeline():
+    with metrics.span("timeline_update", action="reset"):
+        st.session_state.event_timeline.clear()
+        journey_state.reset()
+        clear_ai_responses()
+    rerun_sections("timeline", "ai_responses")
+
+TIMELINE_WINDOW = 20
+
+@st.fragment(key="timeline")
+@metrics.timed("section", section="timeline")
+def timeline_section():
+    # --- Event Selector ---
+    st.selectbox("Simulate User Event:", persona_detail["events"], key="selected_event",
+                 on_change=rerun_sections, args=("selected_event",))
 
-with col2:
-    if st.button("Reset Timeline"):
-        st.session_state.event_timeline = []
-        st.session_state.next_node_id = ""
-        st.session_state.event_suggestion = ""
-        st.session_state.journey_optimization = ""
-        st.session_state.business_impact = ""
-        st.rerun()
-
-# Display current timeline
-if st.session_state.event_timeline:
-    st.markdown("### Simulated Event Timeline")
-    st.write(" → ".join(st.session_state.event_timeline))
-else:
-    st.markdown("_No events in timeline yet._")
-
-# --- Event Highlight Mapping (Maps events to logical NEXT action based on journey flows) ---
-event_to_node_map = {
-    "GlowSkin": {
-        # Cart abandonment journey: A→E(SMS)→H(Email)→K(Push)→L(Exit)
-        "Cart Abandoned": "E",           # Just abandoned → Send SMS (first intervention)
-        "Email Opened": "K",             # Email opened but no purchase → Send Push (final attempt)  
-        "Email Unopened": "K",           # Email not opened → Send Push (escalate)
-        "Push Notification Ignored": "L", # Push ignored → Exit journey (no response after 3 touches)
-        "SMS Received": "H",             # SMS received but no purchase → Send Email with discount
-        "Product Review Left": "D",      # Review indicates purchase → Exit: Purchase Completed
-        "Wishlist Item Added": "E",      # Shows interest but no purchase → Send SMS
-        "Discount Code Used": "D",       # Code usage indicates purchase → Exit: Purchase Completed
-        "Social Media Shared": "D",      # Sharing indicates satisfaction/purchase → Exit: Purchase Completed
-        "Return Customer": "A",          # Return customer starts new journey → User Adds Items to Cart
-        "Subscription Started": "D",     # Subscription indicates conversion → Exit: Purchase Completed
-        "Unsubscribed": "L"              # Unsubscribed → Exit: No Response After 3 Touches
-    },
-    "PulseFit": {
-        # App engagement journey: A→E(Push)→H(Email)→K(SMS)→L(Exit)
-        "User Inactive": "E",            # User inactive after signup → Send Push (re-engagement)
-        "Push Notification Sent": "H",   # Push sent but still inactive → Send Email (workout tips)
-        "Email Unopened": "K",           # Email not opened → Send SMS with discount
-        "Workout Completed": "D",        # Workout done → Exit: User Engaged (success)
-        "App Opened": "D",               # App opened shows engagement → Exit: User Engaged
-        "Premium Upgrade": "D",          # Upgrade indicates engagement → Exit: User Engaged
-        "Goal Achievement": "D",         # Goal achieved shows engagement → Exit: User Engaged
-        "Friend Invited": "D",           # Social sharing shows engagement → Exit: User Engaged
-        "Progress Photo Shared": "D",    # Photo sharing shows engagement → Exit: User Engaged
-        "Subscription Cancelled": "L",   # Cancelled → Exit: User Remains Inactive
-        "Support Contact": "H",          # Support needed → Send Email with workout help
-        "Tutorial Skipped": "E"          # Tutorial skipped shows disengagement → Send Push
-    },
-    "JetQuest": {
-        # Booking conversion journey: A→E(Email)→H(SMS)→K(Retargeting)→L(Exit)
-        "Flight Searched": "E",          # Flight searched but not booked → Send Email (deal expires)
-        "Booking Abandoned": "E",        # Booking abandoned → Send Email (deal expires)
-        "Email Opened": "H",             # Email opened but no booking → Send SMS (last chance)
-        "SMS Clicked": "K",              # SMS clicked but no booking → Send Retargeting Ad
-        "Price Alert Set": "E",          # Price alert shows interest → Send Email about deals
-        "Loyalty Points Earned": "D",    # Points earned indicates booking → Exit: Booking Completed
-        "Review Left": "D",              # Review indicates completed trip → Exit: Booking Completed
-        "Newsletter Subscribed": "E",    # Newsletter signup shows interest → Send Email with deals
-        "Mobile App Downloaded": "E",    # App download shows interest → Send Email with deals
-        "Customer Service Contact": "E", # Service contact → Send Email (helpful follow-up)
-        "Refund Requested": "L",         # Refund requested → Exit: Deal Expired
-        "Rebooking Attempt": "E"         # Rebooking shows continued interest → Send Email
-    },
-    "LeadSync": {
-        # Trial activation journey: A→E(Email)→H(In-App)→K(CSM Alert)→L(Exit)
-        "Trial Started": "E",            # Trial started → Send Email (setup guidance)
-        "Demo Requested": "E",           # Demo requested → Send Email (follow up)
-        "Email Unopened": "H",           # Email not opened → Send In-App message
-        "Feature Explored": "D",         # Feature exploration shows engagement → Exit: Trial Converted
-        "Integration Attempted": "H",    # Integration attempted but may need help → Send In-App guide
-        "Onboarding Completed": "D",     # Onboarding done shows success → Exit: Trial Converted
-        "Team Member Invited": "D",      # Team invitation shows commitment → Exit: Trial Converted
-        "Billing Info Added": "D",       # Billing added indicates conversion → Exit: Trial Converted
-        "Support Ticket Created": "H",   # Support needed → Send In-App help
-        "Webinar Attended": "D",         # Webinar attendance shows engagement → Exit: Trial Converted
-        "Case Study Downloaded": "H",    # Case study download shows interest → Send In-App guide
-        "Contract Signed": "D"           # Contract signed → Exit: Trial Converted
-    }
-}
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("Add Event to Timeline", on_click=add_event)
+    with col2:
+        st.button("Reset Timeline", on_click=reset_timeline)
+
+    # Display current timeline; only the most recent events are rendered
+    event_timeline = st.session_state.event_timeline
+    if event_timeline:
+        st.markdown("### Simulated Event Timeline")
+        st.write(event_timeline.render(TIMELINE_WINDOW))
+        if len(event_timeline) > TIMELINE_WINDOW or event_timeline.dropped:
+            st.caption(f"{len(event_timeline):,} events · {event_timeline.distinct():,} distinct"
+                       + (f" · {event_timeline.dropped:,} oldest dropped" if event_timeline.dropped else ""))
+    else:
+        st.markdown("_No events in timeline yet._")
+
+timeline_section()
+
+@st.fragment(key="diagram")
+@metrics.timed("section", section="diagram")
+def diagram_section():
+    # --- Event Highlight Mapping (Maps events to logical NEXT action based on journey flows) ---
+    highlight_node, latest_event = journey_position()
+
+    # --- Mermaid Renderer ---
+    st.subheader(f"Customer Journey: {persona}")
+    with metrics.span("diagram_build"):
+        html = diagram_html(persona, highlight_node)
+        components.html(html, height=700, scrolling=True)
+    metrics.observe("diagram_html_bytes", len(html))
+
+    # --- Summary Card ---
+    st.markdown(f"**Use Case Summary:** {persona_detail['summary']}")
+
+    st.info("**Key Insight**: Notice how Iterable intelligently orchestrates the timing, channel selection, and messaging across your entire MarTech stack based on real customer behavior.")
+
+    # --- Event Status Display ---
+    if highlight_node:
+        action_description = journey.describe(highlight_node)
+        st.info(f"**Journey Update:** {latest_event} → Next Action: {action_description}")
+        if journey_state.events:
+            st.caption(f"Journey progress: {journey_state.describe()}")
+
+diagram_section()
+
+# --- Event Analytics Across Sessions ---
+@st.fragment(key="event_analytics")
+@metrics.timed("section", section="event_analytics")
+def event_analytics_section():
+    with st.expander("Event Analytics Across Sessions", expanded=False):
+        event_counts = event_store.frequency("event", persona=persona)
+        if event_counts:
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Most simulated events**")
+                st.dataframe([{"Event": e, "Count": n} for e, n in list(event_counts.items())[:10]], width="stretch")
+            with col2:
+                st.markdown("**Sessions reaching each node**")
+                st.dataframe([{"Node": journey.labels[journey.index[node]], "Sessions": n}
+                              for node, n in event_store.funnel(persona).items() if node in journey.index],
+                             width="stretch")
+        else:
+            st.markdown(f"_No {persona} events recorded yet._")
+
+event_analytics_section()
+
+
+# --- Journey Simulation ---
+@st.cache_data(show_spinner=False)
+def run_journey_simulation(persona_name, n_users, conversion_rates):
+    """Simulate a cohort through the persona journey (cached per parameter set)"""
+    return simulate_journey(persona_name, n_users, dict(conversion_rates), seed=42)
+
+@st.cache_data(show_spinner=False)
+def run_timing_sweep(persona_name, conversion_rates):
+    """Sweep wait times and channel order for a persona (cached per rate set)"""
+    candidates = candidate_grid(persona_name, QUICK_WAIT_OPTIONS)
+    return run_sweep(persona_name, candidates, 100_000, dict(conversion_rates))
+
+@st.fragment(key="simulation")
+@metrics.timed("section", section="simulation")
+def simulation_section():
+    with st.expander("Simulate Journey Performance", expanded=False):
+        stages = journey_stages(persona)
+        sim_channels = ["Organic"] + stages["channels"]
+        sim_users = st.select_slider("Synthetic Users:", options=[100_000, 1_000_000, 5_000_000, 10_000_000], value=1_000_000)
+        rate_cols = st.columns(len(sim_channels))
+        sim_rates = tuple(
+            (channel, rate_cols[i].slider(f"{channel} conversion %", 0.0, 50.0, DEFAULT_CONVERSION_RATES.get(channel, 0.05) * 100, 0.5) / 100)
+            for i, channel in enumerate(sim_channels)
+        )
 
-highlight_node = st.session_state.next_node_id or event_to_node_map.get(persona, {}).get(selected_event, "")
-highlight_class = "classDef highlight fill:#ffcc00;" if highlight_node else ""
-highlight_command = f"class {highlight_node} highlight;" if highlight_node else ""
-
-# --- Node Descriptions for UI Display ---
-node_descriptions = {
-    "GlowSkin": {
-        "A": "User adds items to cart",
-        "E": "Send SMS: 'You left something behind'", 
-        "H": "Send Email: 'Still want that glow? 10% off'",
-        "K": "Send Push: 'Your GlowKit is waiting'",
-        "D": "Exit: Purchase completed",
-        "L": "Exit: No response after 3 touches"
-    },
-    "PulseFit": {
-        "A": "User signs up for app",
-        "E": "Send Push: 'Ready to crush your fitness goals?'", 
-        "H": "Send Email: '5 Quick Workouts to Get Started'",
-        "K": "Send SMS: 'Get 30% off premium'",
-        "D": "Exit: User engaged",
-        "L": "Exit: User remains inactive"
-    },
-    "JetQuest": {
-        "A": "User browses flight deals",
-        "E": "Send Email: 'Your flight deal expires soon'", 
-        "H": "Send SMS: 'Last chance - save $200'",
-        "K": "Send Retargeting Ad: Similar destinations",
-        "D": "Exit: Booking completed",
-        "L": "Exit: Deal expired"
-    },
-    "LeadSync": {
-        "A": "User starts free trial",
-        "E": "Send Email: 'Complete your setup in 5 minutes'", 
-        "H": "Send In-App: 'Need help? Quick guide'",
-        "K": "Alert CSM: High-value prospect needs attention",
-        "D": "Exit: Trial converted",
-        "L": "Exit: Trial expired"
-    }
-}
+        if st.button("Run Simulation"):
+            with st.spinner("Simulating journey..."):
+                result = run_journey_simulation(persona, sim_users, sim_rates)
 
-# --- Journey Definitions with Highlight Support ---
-def get_journey_flow(persona_name, highlight_class_def, highlight_command_def):
-    flows = {
-        "GlowSkin": f'''graph TD
-            A[User Adds Items to Cart] --> B[Wait 2 Hours]
-            B --> C{{Has User Purchased?}}
-            C -->|Yes| D[Exit: Purchase Completed]
-            C -->|No| E[Send SMS: You left something behind]
-            E --> F[Wait 4 Hours]
-            F --> G{{Has User Purchased?}}
-            G -->|Yes| D
-            G -->|No| H[Send Email: Still want that glow? 10% off]
-            H --> I[Wait 2 Days]
-            I --> J{{Has User Purchased?}}
-            J -->|Yes| D
-            J -->|No| K[Send Push: Your GlowKit is waiting]
-            K --> L[Exit: No Response After 3 Touches]
-            {highlight_class_def}
-            {highlight_command_def}
-            ''',
-        "PulseFit": f'''graph TD
-            A[User Signs Up for App] --> B[Wait 24 Hours]
-            B --> C{{User Active in App?}}
-            C -->|Yes| D[Exit: User Engaged]
-            C -->|No| E[Send Push: Ready to crush your fitness goals?]
-            E --> F[Wait 3 Days]
-            F --> G{{User Active in App?}}
-            G -->|Yes| D
-            G -->|No| H[Send Email: 5 Quick Workouts to Get Started]
-            H --> I[Wait 1 Week]
-            I --> J{{User Active in App?}}
-            J -->|Yes| D
-            J -->|No| K[Send SMS: Get 30% off premium]
-            K --> L[Exit: User Remains Inactive]
-            {highlight_class_def}
-            {highlight_command_def}
-            ''',
-        "JetQuest": f'''graph TD
-            A[User Browses Flight Deals] --> B[Wait 1 Hour]
-            B --> C{{User Booked Flight?}}
-            C -->|Yes| D[Exit: Booking Completed]
-            C -->|No| E[Send Email: Your flight deal expires soon]
-            E --> F[Wait 6 Hours]
-            F --> G{{User Booked Flight?}}
-            G -->|Yes| D
-            G -->|No| H[Send SMS: Last chance - save $200]
-            H --> I[Wait 1 Day]
-            I --> J{{User Booked Flight?}}
-            J -->|Yes| D
-            J -->|No| K[Send Retargeting Ad: Similar destinations]
-            K --> L[Exit: Deal Expired]
-            {highlight_class_def}
-            {highlight_command_def}
-            ''',
-        "LeadSync": f'''graph TD
-            A[User Starts Free Trial] --> B[Wait 2 Days]
-            B --> C{{User Setup Complete?}}
-            C -->|Yes| D[Exit: Trial Converted]
-            C -->|No| E[Send Email: Complete your setup in 5 minutes]
-            E --> F[Wait 3 Days]
-            F --> G{{User Active in Trial?}}
-            G -->|Yes| D
-            G -->|No| H[Send In-App: Need help? Quick guide]
-            H --> I[Wait 1 Week]
-            I --> J{{User Engaged?}}
-            J -->|Yes| D
-            J -->|No| K[Alert CSM: High-value prospect needs attention]
-            K --> L[Exit: Trial Expired]
-            {highlight_class_def}
-            {highlight_command_def}
-            '''
-    }
-    return flows.get(persona_name, "")
-
-# --- Mermaid Renderer ---
-st.subheader(f"Customer Journey: {persona}")
-current_flow = get_journey_flow(persona, highlight_class, highlight_command)
-
-mermaid_html = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <script src="https://unpkg.com/mermaid@9.4.3/dist/mermaid.min.js"></script>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #ffffff; }}
-        .mermaid {{ text-align: center; }}
-    </style>
-</head>
-<body>
-    <div class="mermaid">
-{current_flow}
-    </div>
-    <script>
-        mermaid.initialize({{
-            startOnLoad: true,
-            theme: 'default',
-            securityLevel: 'loose',
-            flowchart: {{ useMaxWidth: true, htmlLabels: true, curve: 'basis' }}
-        }});
-    </script>
-</body>
-</html>
-"""
-
-components.html(mermaid_html, height=700, scrolling=True)
-
-# --- Summary Card ---
-summaries = {
-    "GlowSkin": "Recover abandoned carts using SMS, Email, and Push with incentives to drive conversion.",
-    "PulseFit": "Re-engage inactive app signups using push, educational email, and promo SMS.",
-    "JetQuest": "Follow up with browsing users using email, SMS, and retargeting to drive bookings.",
-    "LeadSync": "Activate trial users with email nudges, in-app guidance, and CSM alerts."
-}
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Conversion Rate", f"{result['conversion_rate']:.1%}", f"{result['funnel'][stages['success_exit']]:,} users")
+            with col2:
+                st.metric("Median Time to Convert", f"{result['time_to_convert']['p50_hours']:.1f} hours", f"p90 {result['time_to_convert']['p90_hours']:.1f} hours", delta_color="off")
+            with col3:
+                st.metric("Touches per User", f"{result['touches_per_user']:.2f}")
+
+            st.bar_chart({"Users": {f"{node_id}: {journey.labels[journey.index[node_id]]}": count for node_id, count in result["funnel"].items()}}, horizontal=True)
 
-st.markdown(f"**Use Case Summary:** {summaries.get(persona, 'N/A')}")
+        # Score every combination of wait times and channel order; the Pareto front
+        # also feeds the Journey Optimization prompt
+        if st.button("Optimize Timing & Channel Order"):
+            with st.spinner("Sweeping wait times and channel orders..."):
+                sweep = run_timing_sweep(persona, sim_rates)
+            st.session_state.timing_sweep = {"persona": persona, "front": sweep["front"]}
 
-st.info("**Key Insight**: Notice how Iterable intelligently orchestrates the timing, channel selection, and messaging across your entire MarTech stack based on real customer behavior.")
+        timing_sweep = st.session_state.get("timing_sweep")
+        if timing_sweep and timing_sweep["persona"] == persona:
+            st.markdown("**Best trade-offs between conversion and speed** (no other configuration beats these on both)")
+            st.dataframe([
+                {"Configuration": describe_candidate(r), "Conversion": f"{r['conversion_rate']:.1%}", "Mean hours to convert": round(r["mean_hours"], 1)}
+                for r in timing_sweep["front"]
+            ], hide_index=True, width="stretch")
 
-# --- Event Status Display ---
-if highlight_node:
-    action_description = node_descriptions.get(persona, {}).get(highlight_node, "Continue journey")
-    st.info(f"**Journey Update:** {selected_event} → Next Action: {action_description}")
+simulation_section()
 
 # --- AI-Powered Event & Journey Intelligence ---
 st.markdown("---")
 st.subheader("AI-Powered Marketing Intelligence")
 
-# Check if OpenAI API key is available
-def check_openai_config():
+def openai_api_key():
+    """OpenAI API key from Streamlit secrets, falling back to the environment"""
     try:
         api_key = st.secrets.get("OPENAI_API_KEY", "")
-        if not api_key:
-            st.error("OpenAI API key not found in Streamlit secrets. Please configure your API key.")
-            return False
-        return True
-    except Exception as e:
-        st.error("Error accessing OpenAI configuration. Please check your Streamlit secrets.")
+    except Exception:
+        api_key = ""
+    return api_key or os.environ.get("OPENAI_API_KEY", "")
+
+# Check if OpenAI API key is available
+def check_openai_config():
+    if not openai_api_key():
+        st.error("OpenAI API key not found in Streamlit secrets. Please configure your API key.")
         return False
+    return True
+
+stream_responses = st.sidebar.toggle("Stream AI responses", value=True)
+
+# Share of AI requests answered without an upstream call, across all sessions
+cache_stats, reuse_stats = response_cache.stats(), similar_responses.stats()
+if cache_stats["hits"] + cache_stats["misses"]:
+    requested = cache_stats["hits"] + cache_stats["misses"]
+    reused = cache_stats["hits"] + reuse_stats["hits"]
+    st.sidebar.caption(f"AI responses reused: {reused:,} of {requested:,} ({reused / requested:.0%}) · "
+                       f"{cache_stats['hits']:,} identical, {reuse_stats['hits']:,} similar")
+# Memory held for AI responses, this session's share against the average
+store_stats = session_store.stats()
+if store_stats["unique_responses"]:
+    st.sidebar.caption(f"AI response memory: {session_store.session_bytes(st.session_state.session_key) / 1024:.1f} KB "
+                       f"for this session · {store_stats['bytes_per_session'] / 1024:.1f} KB average over "
+                       f"{store_stats['sessions']:,} sessions")
+if shared_cache.enabled:
+    # Lookups from every app process sharing the cache file
+    shared_stats = shared_cache.stats()
+    st.sidebar.caption(f"Shared cache: {shared_stats['hit_rate']:.0%} hit rate across processes · "
+                       f"{shared_stats['bytes'] / 1e6:.1f} of {shared_stats['max_bytes'] / 1e6:.0f} MB")
+ai_request_timeout = 60.0
+
+ai_slot_titles = {
+    "event_suggestion": "Event Suggestions",
+    "journey_optimization": "Journey Optimization",
+    "business_impact": "Business Impact"
+}
 
-def make_openai_request(prompt, system_message, max_tokens=500):
-    """Make an OpenAI API request with proper error handling"""
+# Orchestration Hub selections; read from session state before the hub renders
+orchestration_defaults = prompts.ORCHESTRATION_DEFAULTS
+
+def record_llm_call(slot, mode, seconds, input_tokens, response, outcome="ok"):
+    """LLM call latency and token counts for the metrics endpoint"""
+    if not metrics.enabled:
+        return
+    metrics.observe("phase_seconds", seconds, phase="llm_call", slot=slot, mode=mode, outcome=outcome)
+    metrics.observe("llm_tokens", input_tokens or 0, slot=slot, direction="input")
+    if response:
+        metrics.observe("llm_tokens", count_tokens(response), slot=slot, direction="output")
+
+def make_openai_request(prompt, system_message, max_tokens=500, slot=None, input_tokens=None, signature=None, fresh=False):
+    """Make an OpenAI API request with proper error handling.
+
+    When streaming is enabled the response is written to the page token by
+    token as it arrives. Either way the full text is returned and the latency
+    is recorded under ``slot`` in ``st.session_state.ai_latency``. With a
+    ``signature`` the answer to a similar earlier request may be reused,
+    unless ``fresh`` is set.
+    """
+    started = time.perf_counter()
+    mode = "stream" if stream_responses else "blocking"
     try:
-        client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Updated to a more reliable model
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content
+        if stream_responses:
+            completion = CompletionStream(openai_api_key(), prompt, system_message, max_tokens, signature=signature, fresh=fresh,
+                                          timeout=ai_request_timeout)
+            st.write_stream(completion)
+            response, first_token, total = completion.text, completion.time_to_first_token, completion.total_latency
+            similarity = completion.similarity
+            mode = "cached" if completion.cached else mode
+        else:
+            response, similarity = completion_with_reuse(openai_api_key(), prompt, system_message, max_tokens, signature=signature, fresh=fresh)
+            first_token = total = time.perf_counter() - started
+        mode = "reused" if similarity is not None else mode
+        if slot:
+            st.session_state.ai_latency[slot] = {"time_to_first_token": first_token, "total_latency": total, "input_tokens": input_tokens, "similarity": similarity}
+        record_llm_call(slot, mode, total, input_tokens, response)
+        return response
     except Exception as e:
+        record_llm_call(slot, mode, time.perf_counter() - started, input_tokens, None, outcome="error")
         st.error(f"Error generating AI response: {str(e)}")
         return None
 
-col1, col2 = st.columns(2)
-
-with col1:
-    if st.button("Event Suggestions", use_container_width=True):
-        if not check_openai_config():
-            st.stop()
-            
-        # Clear other AI responses
-        st.session_state.journey_optimization = ""
-        
-        with st.spinner("Generating event suggestions..."):
-            timeline = st.session_state.event_timeline
-            event_history = ", ".join(timeline) if timeline else "No events simulated."
-
-            prompt = f"""
-You are a senior marketing strategist at Iterable. You must provide recommendations that EXACTLY match the highlighted step in the customer journey diagram.
-
-**Customer Profile:** {persona}
-**Recent Event:** {selected_event}
-**Event Timeline:** {event_history}
-
-**CRITICAL: The journey diagram is currently highlighting this specific action:**
-{node_descriptions.get(persona, {}).get(highlight_node, "Continue journey")}
-
-**Complete Journey Context for {persona}:**
-- **GlowSkin:** Cart Abandonment Recovery
-  A: User Adds Items to Cart → E: Send SMS "You left something behind" → H: Send Email "Still want that glow? 10% off" → K: Send Push "Your GlowKit is waiting" → D/L: Exit
-
-- **PulseFit:** App Re-engagement  
-  A: User Signs Up → E: Send Push "Ready to crush your fitness goals?" → H: Send Email "5 Quick Workouts to Get Started" → K: Send SMS "Get 30% off premium" → D/L: Exit
-
-- **JetQuest:** Booking Conversion
-  A: User Browses Flights → E: Send Email "Your flight deal expires soon" → H: Send SMS "Last chance - save $200" → K: Send Retargeting Ad "Similar destinations" → D/L: Exit
-
-- **LeadSync:** Trial Activation
-  A: User Starts Trial → E: Send Email "Complete your setup in 5 minutes" → H: Send In-App "Need help? Quick guide" → K: Alert CSM "High-value prospect needs attention" → D/L: Exit
-
-**MANDATORY REQUIREMENT:** Your recommendation must be about the HIGHLIGHTED ACTION ONLY: {node_descriptions.get(persona, {}).get(highlight_node, "Continue journey")}
-
-**Provide your recommendation in this format:**
+def show_latency(slot):
+    """Caption with the recorded latency of an AI response"""
+    latency = st.session_state.ai_latency.get(slot)
+    if latency:
+        tokens = f"{latency['input_tokens']:,} input tokens · " if latency.get("input_tokens") else ""
+        if latency.get("similarity") is not None:
+            st.caption(f"{tokens}Reused the answer to a similar request ({latency['similarity']:.0%} match)")
+        else:
+            st.caption(f"{tokens}First content in {latency['time_to_first_token'] * 1000:.0f} ms · complete in {latency['total_latency']:.2f} s")
+
+def event_suggestion_request():
+    """Prompt for recommendations on the highlighted journey step"""
+    highlight_node, latest_event = journey_position()
+    return prompts.event_suggestion_request(persona, latest_event, st.session_state.event_timeline, highlight_node,
+                                            progress=journey_state.describe())
+
+def journey_optimization_request():
+    """Prompt for optimizing the persona's journey"""
+    timing_sweep = st.session_state.get("timing_sweep")
+    sweep_summary = describe_front(timing_sweep["front"]) if timing_sweep and timing_sweep["persona"] == persona else "Not run."
+    return prompts.journey_optimization_request(persona, st.session_state.event_timeline, sweep_summary=sweep_summary)
+
+def hub_selection():
+    """Orchestration Hub selections from session state"""
+    return {key: st.session_state.get(key, default) for key, default in orchestration_defaults.items()}
+
+def business_impact_request():
+    """Prompt for quantifying Iterable's impact on the prospect's stack"""
+    return prompts.business_impact_request(persona, **hub_selection())
+
+ai_requests = {
+    "event_suggestion": (event_suggestion_request, "Generating event suggestions..."),
+    "journey_optimization": (journey_optimization_request, "Analyzing journey optimization..."),
+    "business_impact": (business_impact_request, "Calculating personalized business impact..."),
+}
 
-**Recommended Next Action:** [Must exactly match the highlighted action - if it's "Send SMS", recommend SMS strategy. If it's "Send Email", recommend email strategy, etc.]
+def request_ai(slot, *cleared, fresh=False):
+    """Button callback: generate ``slot`` on its section's rerun, clearing the ``cleared`` slots.
+
+    ``fresh`` skips the response caches, for when a reused answer does not fit.
+    """
+    clear_ai_responses(*cleared)
+    st.session_state.pending_ai = slot
+    st.session_state.pending_ai_fresh = fresh
+
+def show_ai_response(slot, show):
+    """Render a stored AI response with ``show(text)``, generating it first if requested.
+
+    A requested response streams into the spot where it is then displayed,
+    so the section does not need a second run to show it.
+    """
+    placeholder = st.empty()
+    if st.session_state.get("pending_ai") == slot:
+        st.session_state.pending_ai = None
+        with placeholder.container():
+            if not check_openai_config():
+                return
+            build_request, message = ai_requests[slot]
+            with st.spinner(message):
+                request = build_request()
+                response = make_openai_request(request["prompt"], request["system_message"], request["max_tokens"], slot=slot,
+                                               input_tokens=request["input_tokens"], signature=request["signature"],
+                                               fresh=st.session_state.get("pending_ai_fresh", False))
+        if not response:
+            return  # keep the error on screen
+        set_ai_response(slot, response)
+    text = ai_response(slot)
+    if text:
+        with placeholder.container():
+            show(text)
+            show_latency(slot)
+            if st.session_state.ai_latency.get(slot, {}).get("similarity") is not None:
+                st.button("Generate fresh", key=f"fresh_{slot}", on_click=request_ai, args=(slot,), kwargs={"fresh": True})
+
+@st.fragment(key="ai_panel")
+@metrics.timed("section", section="ai_panel")
+def ai_panel_section():
+    col1, col2 = st.columns(2)
 
-**Strategic Reasoning:** [Why this specific highlighted action is the right next step for this event]
+    with col1:
+        st.button("Event Suggestions", width="stretch", on_click=request_ai, args=("event_suggestion", "journey_optimization"))
 
-**Expected Outcome:** [What you expect from this specific action]
+    with col2:
+        st.button("Journey Optimization", width="stretch", on_click=request_ai, args=("journey_optimization", "event_suggestion"))
 
-**Tactical Details:** [Specific messaging, timing, or implementation guidance for this highlighted action]
+    # Generate every analysis at once; wall-clock time is the slowest request, not the sum
+    if st.button("Generate All Insights", width="stretch"):
+        if not check_openai_config():
+            st.stop()
 
-Do NOT recommend any action other than what is currently highlighted in the diagram.
-            """
+        requests = {
+            "event_suggestion": event_suggestion_request(),
+            "journey_optimization": journey_optimization_request()
+        }
+        hub = hub_selection()
+        if hub["data_sources"] and hub["activation_channels"] and hub["current_challenges"]:
+            requests["business_impact"] = business_impact_request()
+
+        with st.status("Generating all insights...", expanded=True) as status:
+            failures = 0
+            for slot, response, error, latency, similarity in run_concurrently(openai_api_key(), requests, timeout=ai_request_timeout):
+                record_llm_call(slot, "reused" if similarity is not None else "batch", latency or ai_request_timeout, requests[slot]["input_tokens"], response,
+                                outcome="error" if error or not response else "ok")
+                if error or not response:
+                    failures += 1
+                    st.error(f"{ai_slot_titles[slot]}: {error or 'Empty response'}")
+                    continue
+                set_ai_response(slot, response)
+                st.session_state.ai_latency[slot] = {"time_to_first_token": latency, "total_latency": latency, "input_tokens": requests[slot]["input_tokens"], "similarity": similarity}
+                st.write(f"{ai_slot_titles[slot]} ready in {latency:.2f} s")
+            status.update(label="Insights generated" if not failures else "Some insights failed", state="complete" if not failures else "error")
+        if not failures:
+            # Business impact is shown in the Orchestration Hub, so the whole page reruns
+            st.rerun()
 
-            response = make_openai_request(
-                prompt, 
-                "You are a senior marketing strategist specializing in customer engagement and MarTech.",
-                500
-            )
-            
-            if response:
-                st.session_state.event_suggestion = response
-                st.rerun()
+    # Display AI Responses for Event & Journey Intelligence
+    def show_event_suggestion(text):
+        st.success("**Event-Specific Recommendations:**")
+        st.markdown(text)
 
-with col2:
-    if st.button("Journey Optimization", use_container_width=True):
-        if not check_openai_config():
-            st.stop()
-            
-        # Clear other AI responses
-        st.session_state.event_suggestion = ""
-        
-        with st.spinner("Analyzing journey optimization..."):
-            timeline = st.session_state.event_timeline
-            event_history = ", ".join(timeline) if timeline else "No events simulated."
-
-            prompt = f"""
-You are a customer journey optimization expert at Iterable. Analyze the current journey for persona '{persona}' and event timeline:
-{event_history}
-
-Provide strategic recommendations for:
-1. **Journey Improvements** - How to optimize the current flow
-2. **Timing Adjustments** - Better wait times or triggers
-3. **Personalization Opportunities** - Ways to make it more relevant
-4. **Performance Metrics** - Key KPIs to track
-5. **Expected Business Impact** - Quantified improvements in conversion rates and revenue
-
-Focus on practical, actionable insights that would improve conversion rates and customer experience.
-            """
-
-            response = make_openai_request(
-                prompt,
-                "You are a customer journey optimization expert specializing in lifecycle marketing and conversion optimization.",
-                600
-            )
-            
-            if response:
-                st.session_state.journey_optimization = response
-                st.rerun()
+    def show_journey_optimization(text):
+        st.success("**Journey Optimization Strategy:**")
+        st.markdown(text)
 
-# Display AI Responses for Event & Journey Intelligence
-if st.session_state.event_suggestion:
-    st.success("**Event-Specific Recommendations:**")
-    st.markdown(st.session_state.event_suggestion)
+    show_ai_response("event_suggestion", show_event_suggestion)
+    show_ai_response("journey_optimization", show_journey_optimization)
 
-if st.session_state.journey_optimization:
-    st.success("**Journey Optimization Strategy:**")
-    st.markdown(st.session_state.journey_optimization)
+ai_panel_section()
 
 # --- Iterable's Cross-Channel Orchestration Hub ---
 st.markdown("---")
 st.subheader("Iterable's Cross-Channel Orchestration Hub")
 
-with st.expander("Why Iterable is Your Marketing Command Center", expanded=False):
-    st.markdown("""
-    **Transform Your Disconnected MarTech Stack into a Unified Growth Engine**  
+@st.fragment(key="orchestration_hub")
+@metrics.timed("section", section="orchestration_hub")
+def orchestration_hub_section():
+    with st.expander("Why Iterable is Your Marketing Command Center", expanded=False):
+        st.markdown("""
+        **Transform Your Disconnected MarTech Stack into a Unified Growth Engine**  
     
-    Most companies have 15+ marketing tools that don't talk to each other, creating data silos and missed opportunities. 
-    Iterable serves as your central orchestration layer, making every tool in your stack more effective.
+        Most companies have 15+ marketing tools that don't talk to each other, creating data silos and missed opportunities. 
+        Iterable serves as your central orchestration layer, making every tool in your stack more effective.
     
-    **What makes Iterable different:**
-    - **Real-time Cross-Channel Decisions**: Unlike point solutions, Iterable coordinates email, SMS, push, and in-app messages in real-time
-    - **Unified Customer Profiles**: Combines data from all sources to create a single view of each customer
-    - **Intelligent Channel Selection**: AI automatically chooses the best channel and timing for each individual
-    - **Workflow Automation**: Replace manual processes with automated, personalized customer journeys
-    """)
+        **What makes Iterable different:**
+        - **Real-time Cross-Channel Decisions**: Unlike point solutions, Iterable coordinates email, SMS, push, and in-app messages in real-time
+        - **Unified Customer Profiles**: Combines data from all sources to create a single view of each customer
+        - **Intelligent Channel Selection**: AI automatically chooses the best channel and timing for each individual
+        - **Workflow Automation**: Replace manual processes with automated, personalized customer journeys
+        """)
     
-    # Integration Configuration
-    col1, col2 = st.columns(2)
+        # Integration Configuration
+        col1, col2 = st.columns(2)
     
-    with col1:
-        st.markdown("**Current MarTech Stack**")
-        data_sources = st.multiselect("Select Your Current Tools:", [
-            "Salesforce CRM",
-            "Shopify/E-commerce Platform", 
-            "Google Analytics",
-            "Customer Data Platform (CDP)",
-            "Product Analytics (Mixpanel/Amplitude)",
-            "Support System (Zendesk)",
-            "Billing System (Stripe)",
-            "Data Warehouse (Snowflake/BigQuery)"
-        ], default=["Salesforce CRM", "Shopify/E-commerce Platform"])
+        with col1:
+            st.markdown("**Current MarTech Stack**")
+            data_sources = st.multiselect("Select Your Current Tools:", [
+                "Salesforce CRM",
+                "Shopify/E-commerce Platform", 
+                "Google Analytics",
+                "Customer Data Platform (CDP)",
+                "Product Analytics (Mixpanel/Amplitude)",
+                "Support System (Zendesk)",
+                "Billing System (Stripe)",
+                "Data Warehouse (Snowflake/BigQuery)"
+            ], default=orchestration_defaults["data_sources"], key="data_sources")
         
-        current_challenges = st.multiselect("Current Challenges:", [
-            "Data silos between tools",
-            "Manual campaign coordination", 
-            "Inconsistent customer experience",
-            "No unified customer view",
-            "Time-consuming campaign setup",
-            "Poor cross-channel attribution"
-        ], default=["Data silos between tools", "Manual campaign coordination"])
+            current_challenges = st.multiselect("Current Challenges:", [
+                "Data silos between tools",
+                "Manual campaign coordination", 
+                "Inconsistent customer experience",
+                "No unified customer view",
+                "Time-consuming campaign setup",
+                "Poor cross-channel attribution"
+            ], default=orchestration_defaults["current_challenges"], key="current_challenges")
         
-    with col2:
-        st.markdown("**Channels to Orchestrate**")
-        activation_channels = st.multiselect("Target Channels:", [
-            "Email",
-            "SMS", 
-            "Push Notifications",
-            "In-App Messages",
-            "Direct Mail",
-            "Webhooks to External Systems"
-        ], default=["Email", "SMS", "Push Notifications"])
+        with col2:
+            st.markdown("**Channels to Orchestrate**")
+            activation_channels = st.multiselect("Target Channels:", [
+                "Email",
+                "SMS", 
+                "Push Notifications",
+                "In-App Messages",
+                "Direct Mail",
+                "Webhooks to External Systems"
+            ], default=orchestration_defaults["activation_channels"], key="activation_channels")
         
-        team_size = st.selectbox("Marketing Team Size:", [
-            "Small (1-5 people)",
-            "Medium (6-15 people)", 
-            "Large (16+ people)"
-        ], index=1)
-
-    # Dynamic Business Impact Calculator
-    if data_sources and activation_channels and current_challenges:
-        if st.button("Calculate Iterable's Business Impact"):
-            if not check_openai_config():
-                st.stop()
-                
-            with st.spinner("Calculating personalized business impact..."):
-                prompt = f"""
-You are an Iterable ROI analyst. Based on this prospect's current situation, calculate specific, quantified business impact:
+            team_sizes = ["Small (1-5 people)", "Medium (6-15 people)", "Large (16+ people)"]
+            team_size = st.selectbox("Marketing Team Size:", team_sizes,
+                                     index=team_sizes.index(orchestration_defaults["team_size"]), key="team_size")
 
-**Current State:**
-- Tech Stack: {', '.join(data_sources)}
-- Challenges: {', '.join(current_challenges)}
-- Channels: {', '.join(activation_channels)}
-- Team Size: {team_size}
-- Persona Focus: {persona}
-
-**Calculate specific business impact metrics:**
-1. **Conversion Rate Improvement** - Based on their channels and persona type
-2. **Time Savings** - Hours saved per week from automation
-3. **Revenue Impact** - Annual revenue increase estimate
-4. **Campaign Efficiency** - Reduction in setup time and manual work
-5. **Customer Experience Score** - Improvement in unified experience
-
-Provide specific percentages and dollar amounts where possible. Make it realistic but compelling.
-
-IMPORTANT: Format as a brief, scannable list with numbers. Use "dollars" instead of dollar signs to avoid formatting issues. Avoid using asterisks in your response.
-                """
-
-                response = make_openai_request(
-                    prompt,
-                    "You are an ROI analyst specializing in MarTech transformation impact calculations.",
-                    400
-                )
-                
-                if response:
-                    st.session_state.business_impact = response
-                    st.rerun()
-
-    # Display calculated business impact
-    if st.session_state.business_impact:
-        st.markdown("**Calculated Business Impact:**")
-        st.info(st.session_state.business_impact)
-
-    # Enhanced Iterable Value Proposition Visualization
-    if data_sources and activation_channels:
-        st.markdown("---")
-        st.markdown("**Iterable's Orchestration Impact**")
+        # Dynamic Business Impact Calculator
+        if data_sources and activation_channels and current_challenges:
+            st.button("Calculate Iterable's Business Impact", on_click=request_ai, args=("business_impact",))
+
+        # Display calculated business impact
+        def show_business_impact(text):
+            st.markdown("**Calculated Business Impact:**")
+            st.info(text)
+
+        show_ai_response("business_impact", show_business_impact)
+
+        # Enhanced Iterable Value Proposition Visualization
+        if data_sources and activation_channels:
+            st.markdown("---")
+            st.markdown("**Iterable's Orchestration Impact**")
         
-        # Create columns for before/after comparison
-        col1, col2 = st.columns(2)
+            # Create columns for before/after comparison
+            col1, col2 = st.columns(2)
         
-        with col1:
-            st.markdown("**BEFORE: Disconnected Stack**")
-            st.error(f"""
+            with col1:
+                st.markdown("**BEFORE: Disconnected Stack**")
+                st.error(f"""
 **Current State:**
 • {len(data_sources)} disconnected tools
 • Manual campaign coordination
@@ -610,11 +614,11 @@ IMPORTANT: Format as a brief, scannable list with numbers. Use "dollars" instead
 • Average 3-5 hour campaign setup
 • 40% lower conversion rates
 • No real-time optimization
-            """)
+                """)
         
-        with col2:
-            st.markdown("**AFTER: Iterable Orchestration**")
-            st.success(f"""
+            with col2:
+                st.markdown("**AFTER: Iterable Orchestration**")
+                st.success(f"""
 **Unified Platform:**
 • All {len(data_sources)} tools connected
 • Automated cross-channel journeys
@@ -626,190 +630,111 @@ IMPORTANT: Format as a brief, scannable list with numbers. Use "dollars" instead
 • 50% faster campaign deployment
 • Unified customer experience
 • AI-powered optimization
-            """)
+                """)
         
-        # Overall impact summary
-        st.markdown("**Industry Benchmarks - Typical Iterable Impact:**")
-        st.caption("*These are average improvements seen across Iterable's customer base, not specific to your configuration above.*")
+            # Overall impact summary
+            st.markdown("**Industry Benchmarks - Typical Iterable Impact:**")
+            st.caption("*These are average improvements seen across Iterable's customer base, not specific to your configuration above.*")
         
-        col1, col2, col3 = st.columns(3)
+            col1, col2, col3 = st.columns(3)
         
-        with col1:
-            st.metric("Setup Time Reduction", "50%", "2-3 hours per campaign")
-        with col2:
-            st.metric("Conversion Rate Lift", "25-40%", "Unified experience")
-        with col3:
-            st.metric("Customer Satisfaction", "+35%", "Consistent messaging")
+            with col1:
+                st.metric("Setup Time Reduction", "50%", "2-3 hours per campaign")
+            with col2:
+                st.metric("Conversion Rate Lift", "25-40%", "Unified experience")
+            with col3:
+                st.metric("Customer Satisfaction", "+35%", "Consistent messaging")
+
+orchestration_hub_section()
 
 # --- Competitive Positioning Module ---
 st.markdown("---")
 st.subheader("Competitive Landscape Analysis")
 
-with st.expander("Strategic Competitive Positioning", expanded=False):
-    st.markdown("""
-    **Position Iterable Against Key Competitors**  
+@st.fragment(key="competitive")
+@metrics.timed("section", section="competitive")
+def competitive_section():
+    with st.expander("Strategic Competitive Positioning", expanded=False):
+        st.markdown("""
+        **Position Iterable Against Key Competitors**  
     
-    Enterprise deals are often competitive. This module helps you understand how to position Iterable's unique advantages 
-    against major competitors based on the specific customer situation and journey context.
+        Enterprise deals are often competitive. This module helps you understand how to position Iterable's unique advantages 
+        against major competitors based on the specific customer situation and journey context.
     
-    **Strategic Approach:**
-    - Focus on **fit vs. features** - what matters most for their specific use case
-    - Emphasize **business outcomes** over technical specifications  
-    - Address **real concerns** with professional, value-based responses
-    """)
+        **Strategic Approach:**
+        - Focus on **fit vs. features** - what matters most for their specific use case
+        - Emphasize **business outcomes** over technical specifications  
+        - Address **real concerns** with professional, value-based responses
+        """)
     
-    # Competitor Selection and Context
-    col1, col2 = st.columns(2)
+        # Competitor Selection and Context
+        col1, col2 = st.columns(2)
     
-    with col1:
-        st.markdown("**Competitive Situation**")
-        primary_competitor = st.selectbox("Primary Competitor in Evaluation:", [
-            "Braze",
-            "Klaviyo", 
-            "Salesforce Marketing Cloud",
-            "Mailchimp",
-            "SendGrid/Twilio Engage",
-            "HubSpot",
-            "Adobe Campaign"
-        ])
+        with col1:
+            st.markdown("**Competitive Situation**")
+            primary_competitor = st.selectbox("Primary Competitor in Evaluation:", [
+                "Braze",
+                "Klaviyo", 
+                "Salesforce Marketing Cloud",
+                "Mailchimp",
+                "SendGrid/Twilio Engage",
+                "HubSpot",
+                "Adobe Campaign"
+            ])
         
-    with col2:
-        st.markdown("**Decision Factors**")
-        key_priorities = st.multiselect("Customer's Top Priorities:", [
-            "Ease of implementation",
-            "Advanced personalization",
-            "Cross-channel orchestration", 
-            "Pricing/ROI",
-            "Scalability",
-            "Integration capabilities",
-            "Mobile-first approach",
-            "Enterprise security/compliance"
-        ], default=["Cross-channel orchestration", "Ease of implementation"])
-
-    # Competitive Comparison Matrix
-    if primary_competitor and key_priorities:
-        st.markdown(f"**Iterable vs. {primary_competitor} - Platform Comparison:**")
+        with col2:
+            st.markdown("**Decision Factors**")
+            key_priorities = st.multiselect("Customer's Top Priorities:", [
+                "Ease of implementation",
+                "Advanced personalization",
+                "Cross-channel orchestration", 
+                "Pricing/ROI",
+                "Scalability",
+                "Integration capabilities",
+                "Mobile-first approach",
+                "Enterprise security/compliance"
+            ], default=["Cross-channel orchestration", "Ease of implementation"])
+
+        # Competitive Comparison Matrix
+        if primary_competitor and key_priorities:
+            st.markdown(f"**Iterable vs. {primary_competitor} - Platform Comparison:**")
         
-        # Build dynamic comparison based on customer priorities and competitor
-        competitor_challenges = {
-            "Braze": {
-                "Ease of implementation": "Code-heavy implementation requiring months of technical development",
-                "Advanced personalization": "Complex segmentation setup with rigid data schema constraints", 
-                "Cross-channel orchestration": "Channel silos requiring separate configuration for each touchpoint",
-                "Pricing/ROI": "Complex enterprise pricing with hidden implementation and professional service costs",
-                "Scalability": "Technical debt accumulation as campaigns become more complex",
-                "Integration capabilities": "API-heavy integrations requiring ongoing developer maintenance",
-                "Mobile-first approach": "Strong mobile but disconnected from other channel experiences",
-                "Enterprise security/compliance": "Enterprise features but complex compliance configuration"
-            },
-            "Klaviyo": {
-                "Ease of implementation": "E-commerce focused setup with limitations beyond retail use cases",
-                "Advanced personalization": "Basic behavioral triggers with limited cross-channel context",
-                "Cross-channel orchestration": "Email-centric platform with add-on solutions for other channels", 
-                "Pricing/ROI": "Rapid price escalation as contact volume and features increase",
-                "Scalability": "SMB architecture with performance limitations at enterprise scale",
-                "Integration capabilities": "E-commerce integrations but limited enterprise data connectivity",
-                "Mobile-first approach": "Limited mobile capabilities beyond basic push notifications",
-                "Enterprise security/compliance": "Growing enterprise features but still primarily SMB-focused"
-            },
-            "Salesforce Marketing Cloud": {
-                "Ease of implementation": "Consultant-dependent setup requiring extensive professional services",
-                "Advanced personalization": "Advanced capabilities but complex configuration and maintenance",
-                "Cross-channel orchestration": "Powerful but requires technical expertise to coordinate channels",
-                "Pricing/ROI": "Expensive module-based pricing with hidden costs for basic functionality",
-                "Scalability": "Enterprise scale but with complexity overhead and slow deployment",
-                "Integration capabilities": "Strong Salesforce ecosystem but complex external integrations",
-                "Mobile-first approach": "Mobile capabilities exist but buried in complex interface design",
-                "Enterprise security/compliance": "Strong compliance but requires significant configuration effort"
-            },
-            "Mailchimp": {
-                "Ease of implementation": "Simple setup but limited advanced workflow capabilities",
-                "Advanced personalization": "Basic automation with template-driven, non-dynamic content",
-                "Cross-channel orchestration": "Email-focused with basic additional channel support",
-                "Pricing/ROI": "Low initial cost but feature limitations become expensive constraints",
-                "Scalability": "SMB platform with significant limitations at enterprise volume",
-                "Integration capabilities": "Basic integrations with limited enterprise data flexibility",
-                "Mobile-first approach": "Limited mobile strategy beyond basic responsive email",
-                "Enterprise security/compliance": "Basic security adequate for SMB but not enterprise-grade"
-            },
-            "SendGrid/Twilio Engage": {
-                "Ease of implementation": "Developer-focused implementation requiring technical resources",
-                "Advanced personalization": "API-based personalization requiring custom development work",
-                "Cross-channel orchestration": "Transactional focus with limited lifecycle marketing orchestration",
-                "Pricing/ROI": "Developer tooling costs that don't align with marketing ROI metrics",
-                "Scalability": "Excellent delivery scale but limited marketing campaign sophistication",
-                "Integration capabilities": "Strong API connectivity but requires development effort",
-                "Mobile-first approach": "SMS/communication focused but limited marketing journey capabilities",
-                "Enterprise security/compliance": "Strong infrastructure but limited marketing compliance features"
-            },
-            "HubSpot": {
-                "Ease of implementation": "CRM-first setup with marketing as secondary consideration",
-                "Advanced personalization": "Generic automation limited by all-in-one platform constraints",
-                "Cross-channel orchestration": "Basic marketing automation within CRM workflow limitations",
-                "Pricing/ROI": "Bundle pricing for CRM features you may not need for marketing",
-                "Scalability": "Good CRM scale but limited sophisticated marketing campaign capabilities",
-                "Integration capabilities": "CRM-centric integrations with marketing data flexibility constraints",
-                "Mobile-first approach": "Mobile CRM features but limited advanced mobile marketing",
-                "Enterprise security/compliance": "CRM compliance focus with limited marketing-specific features"
-            },
-            "Adobe Campaign": {
-                "Ease of implementation": "Legacy architecture requiring specialist consultants and lengthy setup",
-                "Advanced personalization": "Advanced capabilities but complex configuration and user training",
-                "Cross-channel orchestration": "Powerful orchestration but requires significant technical expertise",
-                "Pricing/ROI": "Complex enterprise licensing with unpredictable cost scaling",
-                "Scalability": "Enterprise scale but with outdated architecture and performance issues",
-                "Integration capabilities": "Adobe ecosystem strength but complex external system connectivity",
-                "Mobile-first approach": "Mobile capabilities exist but buried in legacy interface complexity",
-                "Enterprise security/compliance": "Strong enterprise features but requiring extensive configuration"
-            }
-        }
+            # Build dynamic comparison based on customer priorities and competitor
+            competitor_challenges = catalog["competitor_challenges"]
         
-        iterable_advantages = {
-            "Ease of implementation": "Visual workflow builder with self-service setup - go live in weeks, not months",
-            "Advanced personalization": "Real-time behavioral triggers with flexible data model and dynamic content",
-            "Cross-channel orchestration": "Native omnichannel platform with unified customer journey coordination",
-            "Pricing/ROI": "Transparent usage-based pricing with predictable scaling and no hidden costs",
-            "Scalability": "Cloud-native architecture designed for enterprise scale with consistent performance",
-            "Integration capabilities": "Flexible data integration with real-time activation across all channels",
-            "Mobile-first approach": "Unified mobile strategy integrated with all touchpoints and customer context",
-            "Enterprise security/compliance": "Built-in enterprise security with automated compliance and data governance"
-        }
+            iterable_advantages = catalog["iterable_advantages"]
         
-        # Create dynamic comparison based on selected priorities
-        if key_priorities:
-            col1, col2 = st.columns(2)
+            # Create dynamic comparison based on selected priorities
+            if key_priorities:
+                col1, col2 = st.columns(2)
             
-            with col1:
-                st.markdown(f"**{primary_competitor} Limitations:**")
-                competitor_content = ""
-                for priority in key_priorities:
-                    if priority in competitor_challenges[primary_competitor]:
-                        competitor_content += f"**{priority}:**\n {competitor_challenges[primary_competitor][priority]}\n\n"
+                with col1:
+                    st.markdown(f"**{primary_competitor} Limitations:**")
+                    competitor_content = ""
+                    for priority in key_priorities:
+                        if priority in competitor_challenges[primary_competitor]:
+                            competitor_content += f"**{priority}:**\n {competitor_challenges[primary_competitor][priority]}\n\n"
                 
-                # Add additional context based on competitor
-                additional_context = {
-                    "Braze": " Complex technical setup requiring developer resources\n Steep learning curve for marketing teams\n Hidden implementation costs and ongoing maintenance overhead",
-                    "Klaviyo": " Limited enterprise features and scalability constraints\n E-commerce focus limits cross-industry applicability\n Rapid cost escalation as usage grows beyond SMB levels",
-                    "Salesforce Marketing Cloud": " Requires extensive consultant support and training\n Module-based architecture creates feature silos\n Legacy architecture impacts performance and user experience",
-                    "Mailchimp": " Basic automation capabilities insufficient for enterprise needs\n Limited data flexibility and advanced segmentation options\n Template-driven approach restricts personalization depth",
-                    "SendGrid/Twilio Engage": " Developer-first platform requires technical expertise\n Limited marketing-specific features and journey capabilities\n API complexity creates barriers for marketing team adoption",
-                    "HubSpot": " All-in-one approach creates feature limitations\n CRM-centric design constrains marketing flexibility\n Generic automation lacks specialized engagement capabilities",
-                    "Adobe Campaign": " Legacy platform with outdated user interface\n Complex implementation requiring specialized consultants\n Batch processing limitations impact real-time capabilities"
-                }
+                    # Add additional context based on competitor
+                    additional_context = catalog["additional_context"]
                 
                 
-                st.error(competitor_content if competitor_content else f"{primary_competitor} approach has limitations in your priority areas.")
+                    st.error(competitor_content if competitor_content else f"{primary_competitor} approach has limitations in your priority areas.")
             
-            with col2:
-                st.markdown("**Iterable's Advantage:**")
-                iterable_content = ""
-                for priority in key_priorities:
-                    if priority in iterable_advantages:
-                        iterable_content += f"**{priority}:**\n {iterable_advantages[priority]}\n\n"
+                with col2:
+                    st.markdown("**Iterable's Advantage:**")
+                    iterable_content = ""
+                    for priority in key_priorities:
+                        if priority in iterable_advantages:
+                            iterable_content += f"**{priority}:**\n {iterable_advantages[priority]}\n\n"
                 
                 
-                st.success(iterable_content if iterable_content else "Iterable addresses your key priorities with modern platform capabilities.")
+                    st.success(iterable_content if iterable_content else "Iterable addresses your key priorities with modern platform capabilities.")
+
+competitive_section()
 
 # --- Footer ---
 st.markdown("---")
 st.markdown("*This demo showcases Iterable's platform capabilities and Solutions Consultant expertise in customer journey orchestration.*")
+
+metrics.observe("phase_seconds", time.perf_counter() - run_started, phase="script_run")
@@ -0,0 +1,257 @@
+"""Headless rerun benchmarks for app.py.
+
+Replays the app's real interactions through Streamlit's ``AppTest`` harness
+and reports, per interaction, script execution time percentiles and the
+memory allocated and peak traced while the rerun executes. Interactions whose
+callbacks rerun only some fragments (adding or resetting timeline events) are
+not comparable with full-script reruns, so each result records which kind of
+rerun it measured. OpenAI is replaced by a local fake client, so no API key or
+network access is needed.
+
+    python benchmarks/bench_reruns.py --iterations 50 --output bench_results.json
+    python benchmarks/bench_reruns.py --compare bench_results.json
+
+With ``--compare`` the run exits non-zero if any interaction's p50 or p95
+regressed by more than ``--threshold`` percent against the given results.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit
+from streamlit.testing.v1 import AppTest
+
+import llm
+from metrics import metrics
+
+APP_PATH = os.path.join(ROOT, "app.py")
+FAKE_RESPONSE = (
+    "**Recommended Next Action:** Send the SMS reminder now.\n\n"
+    "**Strategic Reasoning:** The cart was abandoned two hours ago.\n\n"
+    "**Expected Outcome:** 8-12% of recipients complete checkout."
+)
+
+
+# --- Fake OpenAI Client ---
+class FakeCompletions:
+    def create(self, stream=False, **kwargs):
+        if stream:
+            return iter([
+                types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=word + " "))])
+                for word in FAKE_RESPONSE.split(" ")
+            ])
+        message = types.SimpleNamespace(content=FAKE_RESPONSE)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+class FakeClient:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=FakeCompletions())
+
+    def with_options(self, **kwargs):
+        return self
+
+
+# --- Interactions ---
+def widget(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+def switch_persona(at, i):
+    widget(at.sidebar.selectbox, "Choose a Persona:").select(["PulseFit", "GlowSkin"][i % 2])
+
+
+def add_event(at, i):
+    event_selector = widget(at.selectbox, "Simulate User Event:")
+    event_selector.select(event_selector.options[i % len(event_selector.options)])
+    widget(at.button, "Add Event to Timeline").click()
+
+
+def reset_timeline(at, i):
+    widget(at.button, "Reset Timeline").click()
+
+
+def change_martech_stack(at, i):
+    tools = widget(at.multiselect, "Select Your Current Tools:")
+    tools.select("Google Analytics") if i % 2 == 0 else tools.unselect("Google Analytics")
+
+
+def change_competitor(at, i):
+    competitor = widget(at.selectbox, "Primary Competitor in Evaluation:")
+    competitor.select(competitor.options[i % len(competitor.options)])
+
+
+def change_priorities(at, i):
+    priorities = widget(at.multiselect, "Customer's Top Priorities:")
+    priorities.select("Scalability") if i % 2 == 0 else priorities.unselect("Scalability")
+
+
+def event_suggestions(at, i):
+    widget(at.button, "Event Suggestions").click()
+
+
+INTERACTIONS = {
+    "idle_rerun": lambda at, i: None,
+    "switch_persona": switch_persona,
+    "add_event": add_event,
+    "reset_timeline": reset_timeline,
+    "orchestration_hub_tools": change_martech_stack,
+    "competitor_select": change_competitor,
+    "priority_multiselect": change_priorities,
+    "ai_event_suggestions": event_suggestions,
+}
+
+
+# --- Runner ---
+def new_app():
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.secrets["OPENAI_API_KEY"] = "benchmark"
+    at.run()
+    return at
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def rerun_kind(at, interaction, i):
+    """"full" if the interaction reran the whole script, "fragment" if only fragments ran.
+
+    app.py observes the script_run phase at the end of the script, so it is
+    only recorded by full reruns; metrics are enabled for this one untimed run.
+    """
+    key = ("phase_seconds", (("phase", "script_run"),))
+    metrics.enabled = True
+    try:
+        before = metrics.snapshot().get(key, {"count": 0})["count"]
+        interaction(at, i)
+        at.run()
+        after = metrics.snapshot().get(key, {"count": 0})["count"]
+    finally:
+        metrics.enabled = False
+    return "full" if after > before else "fragment"
+
+
+def benchmark(name, interaction, iterations, warmup):
+    at = new_app()
+    for i in range(warmup):
+        interaction(at, i)
+        at.run()
+    rerun = rerun_kind(at, interaction, warmup)
+    warmup += 1
+
+    timings = []
+    for i in range(iterations):
+        interaction(at, warmup + i)
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+        if at.exception:
+            raise RuntimeError(f"{name} raised: {at.exception[0].value}")
+
+    # A separate traced pass so tracemalloc overhead does not skew the timings.
+    allocated, peaks = [], []
+    tracemalloc.start()
+    for i in range(max(1, iterations // 5)):
+        interaction(at, warmup + iterations + i)
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        at.run()
+        current, peak = tracemalloc.get_traced_memory()
+        allocated.append(current - before)
+        peaks.append(peak - before)
+    tracemalloc.stop()
+
+    return {
+        "rerun": rerun,
+        "iterations": iterations,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+        "retained_kib": percentile(allocated, 0.50) / 1024,
+        "peak_kib": max(peaks) / 1024,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["interactions"]
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or previous.get("rerun", current["rerun"]) != current["rerun"]:
+            continue  # a different kind of rerun is not a regression baseline
+        for metric in ("p50_ms", "p95_ms"):
+            change = (current[metric] - previous[metric]) / previous[metric] * 100 if previous[metric] else 0.0
+            if change > threshold:
+                regressions.append(f"{name} {metric}: {previous[metric]:.1f} -> {current[metric]:.1f} ms (+{change:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--only", nargs="*", choices=sorted(INTERACTIONS), help="interactions to run")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    llm.get_client = lambda api_key: FakeClient()
+    llm.response_cache.max_entries = 0  # measure the request path, not cache hits
+    llm.similar_responses.max_entries = 0
+
+    results = {}
+    for name in args.only or INTERACTIONS:
+        results[name] = benchmark(name, INTERACTIONS[name], args.iterations, args.warmup)
+        r = results[name]
+        print(f"{name:<26} {r['rerun']:<9} p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+              f"retained {r['retained_kib']:8.1f} KiB  peak {r['peak_kib']:8.1f} KiB")
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "interactions": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Local OpenAI-compatible stand-in for load tests.
+
+Serves ``POST /v1/chat/completions`` (plain and ``stream=True``) with a canned
+answer, after a configurable time to first token and at a configurable token
+rate, so the app can be driven without an API key, network access or cost.
+Point the app at it with ``LLM_BASE_URL``:
+
+    python benchmarks/fake_openai_server.py --port 8700 --latency 0.8 --tokens-per-second 60
+    LLM_BASE_URL=http://127.0.0.1:8700/v1 OPENAI_API_KEY=fake streamlit run app.py
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_ANSWER = (
+    "**Recommended Next Action:** Send the SMS reminder now. "
+    "**Strategic Reasoning:** The cart was abandoned two hours ago and SMS has the highest open rate for this persona. "
+    "**Expected Outcome:** 8-12% of recipients complete checkout within a day. "
+    "**Tactical Details:** Keep it under 160 characters, include the product name and a one-tap checkout link."
+)
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering chat completions with simulated timing"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, tokens_per_second=50.0, response_tokens=60):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def tokens(self, max_tokens):
+        words = FAKE_ANSWER.split(" ")
+        count = min(self.response_tokens, max_tokens or self.response_tokens)
+        return [words[i % len(words)] + " " for i in range(count)]
+
+    def handle_error(self, request, client_address):
+        # Clients drop keep-alive connections whenever they like; that is not an error here.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def start(self):
+        """Serve on a daemon thread; returns self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        server = self.server
+        with server._lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+        try:
+            tokens = server.tokens(body.get("max_tokens"))
+            time.sleep(server.latency)
+            if body.get("stream"):
+                self._stream(body, tokens)
+            else:
+                time.sleep(len(tokens) / server.tokens_per_second)
+                self._send_json(200, self._completion(body, "".join(tokens), len(tokens)))
+        finally:
+            with server._lock:
+                server.in_flight -= 1
+
+    # --- Responses ---
+    def _completion(self, body, content, completion_tokens):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": completion_tokens, "total_tokens": completion_tokens},
+        }
+
+    def _stream(self, body, tokens):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        interval = 1.0 / self.server.tokens_per_second
+        for i, token in enumerate(tokens + [None]):
+            delta = {"content": token} if token is not None else {}
+            if i == 0:
+                delta["role"] = "assistant"
+            self._send_event({
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4o-mini"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None if token is not None else "stop"}],
+            })
+            if token is not None:
+                time.sleep(interval)
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_event(self, payload):
+        self._send_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def _send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=60, help="tokens per answer (capped by max_tokens)")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer((args.host, args.port), args.latency, args.tokens_per_second, args.response_tokens)
+    print(f"Fake OpenAI API on {server.base_url} (first token {args.latency:.2f} s, {args.tokens_per_second:g} tokens/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
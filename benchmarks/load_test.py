@@ -0,0 +1,336 @@
+"""Concurrent-user load test for app.py.
+
+Starts the local OpenAI stand-in (fake_openai_server.py) and a real Streamlit
+server pointed at it, then simulates N concurrent users over Streamlit's
+websocket protocol, the same way browsers talk to it. Each user picks a
+persona, builds an event timeline, compares competitors and presses the
+three AI buttons. For each concurrency level the run reports interaction
+throughput, latency percentiles per interaction, upstream LLM calls and the
+server's resident memory, so you can see how many sessions one instance
+holds before response times degrade.
+
+    python benchmarks/load_test.py --users 1 5 10 25 --sessions 2 --output load_results.json
+    python benchmarks/load_test.py --users 10 --latency 1.5 --tokens-per-second 30
+
+Before the first level, one visit to the freshly started server measures
+cold start: time until the server is healthy and until the first visitor's
+page has rendered. ``--warm-start`` launches the server through
+``startup.py serve`` so the caches are warmed before it accepts sessions.
+
+Use ``--url`` to drive a server you started yourself (memory is then only
+reported if ``--server-pid`` is given). The server inherits this process's
+environment, so the usual LLM_* and SESSION_* settings apply; the response
+cache and similar-request reuse are disabled unless LLM_CACHE_MAX_ENTRIES and
+LLM_REUSE_MAX_ENTRIES are set explicitly.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from websockets.sync.client import connect
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from bench_reruns import percentile
+from fake_openai_server import FakeOpenAIServer
+
+APP_PATH = os.path.join(ROOT, "app.py")
+STARTUP_PATH = os.path.join(ROOT, "startup.py")
+AI_BUTTONS = {
+    "event_suggestions": "Event Suggestions",
+    "journey_optimization": "Journey Optimization",
+    "business_impact": "Calculate Iterable's Business Impact",
+}
+
+
+# --- Simulated Browser ---
+class StreamlitUser:
+    """One browser session driven over the Streamlit websocket protocol.
+
+    Widget values are kept by label and re-sent on every rerun, as the
+    frontend does; widget ids are taken from the most recent script run
+    because some depend on their options (the event selector changes with
+    the persona). Like the frontend, an interaction with a widget inside an
+    ``st.fragment`` asks for a rerun of that fragment only.
+    """
+
+    def __init__(self, websocket, timeout=120):
+        self.timeout = timeout
+        self.widgets = {}  # label -> (type, id, options, fragment id)
+        self.values = {}  # label -> (value field, value)
+        self._changed = None
+        self.errors = []
+        self._ws = websocket
+
+    def options(self, label):
+        return self.widgets[label][2]
+
+    def select(self, label, value):
+        self.values[label] = ("string_value", value)
+        self._changed = label
+
+    def run(self, trigger=None):
+        """Rerun the script, optionally clicking the button ``trigger``; returns seconds"""
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        states = message.rerun_script.widget_states
+        for label, (field, value) in self.values.items():
+            if label in self.widgets:
+                state = states.widgets.add(id=self.widgets[label][1])
+                setattr(state, field, value)
+        if trigger:
+            states.widgets.add(id=self.widgets[trigger][1], trigger_value=True)
+        source = trigger or self._changed
+        if source in self.widgets:
+            message.rerun_script.fragment_id = self.widgets[source][3]
+        self._changed = None
+
+        started = time.perf_counter()
+        self._ws.send(message.SerializeToString())
+        self._wait_for_script()
+        return time.perf_counter() - started
+
+    def _wait_for_script(self):
+        while True:
+            self._quick_ack()
+            message = ForwardMsg()
+            message.ParseFromString(self._ws.recv(timeout=self.timeout))
+            kind = message.WhichOneof("type")
+            if kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                self._record_element(message.delta.new_element, message.delta.fragment_id)
+            elif kind == "script_finished":
+                # A script ended by st.rerun() is immediately followed by the new run.
+                if message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    def _quick_ack(self):
+        # A run arrives as many small frames; with delayed ACKs here, Nagle's
+        # algorithm on the server holds each frame back ~40 ms, which would
+        # swamp the server time being measured. Linux only, and not sticky.
+        if hasattr(socket, "TCP_QUICKACK"):
+            self._ws.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+    def _record_element(self, element, fragment_id):
+        kind = element.WhichOneof("type")
+        proto = getattr(element, kind)
+        if kind == "exception":
+            self.errors.append(proto.message)
+        elif getattr(proto, "id", "") and getattr(proto, "label", ""):
+            self.widgets[proto.label] = (kind, proto.id, list(getattr(proto, "options", [])), fragment_id)
+
+
+def stream_url(url):
+    return url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+
+
+def first_page(url):
+    """Seconds to render the page for one visitor"""
+    with connect(stream_url(url), subprotocols=["streamlit"], max_size=None, open_timeout=60) as websocket:
+        return StreamlitUser(websocket).run()
+
+
+def user_session(url, events, rng, timings):
+    """One visitor's click path; appends (interaction, seconds) to ``timings``"""
+    with connect(stream_url(url), subprotocols=["streamlit"], max_size=None, open_timeout=60) as websocket:
+        user = StreamlitUser(websocket)
+        timings.append(("load", user.run()))
+        user.select("Choose a Persona:", rng.choice(user.options("Choose a Persona:")))
+        timings.append(("switch_persona", user.run()))
+        for _ in range(events):
+            user.select("Simulate User Event:", rng.choice(user.options("Simulate User Event:")))
+            timings.append(("add_event", user.run(trigger="Add Event to Timeline")))
+        competitor = "Primary Competitor in Evaluation:"
+        for _ in range(events):
+            user.select(competitor, rng.choice(user.options(competitor)))
+            timings.append(("competitor_select", user.run()))
+        for name, label in AI_BUTTONS.items():
+            timings.append((name, user.run(trigger=label)))
+        return user.errors
+
+
+# --- Server ---
+def resident_kib(pid):
+    """Resident set size of a process from /proc, or None where unavailable"""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, pid, interval=0.25):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, resident_kib(self.pid) or 0)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def start_streamlit(port, llm_base_url, warm_start=False):
+    env = dict(os.environ)
+    env["LLM_BASE_URL"] = llm_base_url
+    env.setdefault("OPENAI_API_KEY", "load-test")
+    env.setdefault("LLM_CACHE_MAX_ENTRIES", "0")
+    env.setdefault("LLM_REUSE_MAX_ENTRIES", "0")
+    command = [sys.executable, STARTUP_PATH, "serve"] if warm_start else [sys.executable, "-m", "streamlit", "run", APP_PATH]
+    process = subprocess.Popen(
+        command + ["--server.headless", "true", "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + "/_stcore/health", timeout=2):
+                return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Streamlit server did not become healthy within 60 s")
+
+
+# --- Runner ---
+def run_level(url, users, sessions, events, seed, server_pid, fake_server):
+    timings, errors = [], []
+    upstream_before = fake_server.requests if fake_server else 0
+    rss_before = resident_kib(server_pid) if server_pid else None
+    sampler = MemorySampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        for _ in range(sessions):
+            try:
+                errors.extend(user_session(url, events, rng, timings))
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    by_interaction = {}
+    for name, seconds in timings:
+        by_interaction.setdefault(name, []).append(seconds)
+    all_timings = [seconds for _, seconds in timings]
+    return {
+        "users": users,
+        "sessions": users * sessions,
+        "interactions": len(timings),
+        "errors": errors[:20],
+        "error_count": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(timings) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(all_timings, 0.50) * 1000,
+        "p95_ms": percentile(all_timings, 0.95) * 1000,
+        "p99_ms": percentile(all_timings, 0.99) * 1000,
+        "per_interaction": {
+            name: {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+            }
+            for name, values in by_interaction.items()
+        },
+        "upstream_requests": (fake_server.requests - upstream_before) if fake_server else None,
+        "server_rss_kib_before": rss_before,
+        "server_rss_kib_peak": sampler.stop() if sampler else None,
+        "server_rss_kib_after": resident_kib(server_pid) if server_pid else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 5, 10, 25], help="concurrency levels to run")
+    parser.add_argument("--sessions", type=int, default=2, help="click-through sessions per user per level")
+    parser.add_argument("--events", type=int, default=3, help="events added to the timeline per session")
+    parser.add_argument("--latency", type=float, default=0.5, help="fake API time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="fake API token rate")
+    parser.add_argument("--port", type=int, default=8599, help="port for the Streamlit server")
+    parser.add_argument("--warm-start", action="store_true", help="start the server through startup.py serve")
+    parser.add_argument("--url", help="drive an already running app instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for memory figures")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default="load_results.json")
+    args = parser.parse_args()
+
+    fake_server = process = None
+    cold_start = None
+    if args.url:
+        url, server_pid = args.url, args.server_pid
+    else:
+        fake_server = FakeOpenAIServer(("127.0.0.1", 0), args.latency, args.tokens_per_second).start()
+        started = time.perf_counter()
+        process, url = start_streamlit(args.port, fake_server.base_url, args.warm_start)
+        server_pid = process.pid
+        cold_start = {"warm_start": args.warm_start, "healthy_s": time.perf_counter() - started}
+
+    levels = []
+    try:
+        if cold_start:
+            cold_start["first_page_s"] = first_page(url)
+            print(f"Cold start{' (warmed)' if args.warm_start else ''}: healthy after {cold_start['healthy_s']:.2f} s, "
+                  f"first page in {cold_start['first_page_s'] * 1000:.0f} ms")
+        for users in args.users:
+            level = run_level(url, users, args.sessions, args.events, args.seed, server_pid, fake_server)
+            levels.append(level)
+            rss = f"  rss peak {level['server_rss_kib_peak'] / 1024:7.1f} MiB" if level["server_rss_kib_peak"] else ""
+            print(f"{users:>4} users  {level['throughput_per_s']:6.2f} interactions/s  p50 {level['p50_ms']:7.0f} ms  "
+                  f"p95 {level['p95_ms']:7.0f} ms  p99 {level['p99_ms']:7.0f} ms  errors {level['error_count']}{rss}")
+            for name, stats in level["per_interaction"].items():
+                print(f"        {name:<22} p50 {stats['p50_ms']:7.0f} ms  p95 {stats['p95_ms']:7.0f} ms")
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        if fake_server:
+            fake_server.shutdown()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "fake_api": {"latency_s": args.latency, "tokens_per_second": args.tokens_per_second} if fake_server else None,
+        "cold_start": cold_start,
+        "sessions_per_user": args.sessions,
+        "events_per_session": args.events,
+        "levels": levels,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Static demo content loaded once per process from data/catalog.json.
+
+The catalog holds the persona event lists, the event-to-node mapping, the use
+case summaries and the competitive positioning copy. It is parsed once into
+read-only structures (mappings become ``MappingProxyType``, lists become
+tuples, strings are interned) and shared by every session. The file's
+modification time is checked on access, so edits are picked up without a
+restart or a deploy.
+"""
+
+import json
+import os
+import sys
+import threading
+from types import MappingProxyType
+
+CATALOG_VERSION = 1
+CATALOG_PATH = os.environ.get(
+    "CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "catalog.json")
+)
+
+_lock = threading.Lock()
+_loaded = {}  # path -> (mtime, catalog)
+
+
+def freeze(value):
+    """Recursively convert parsed JSON into immutable, interned structures"""
+    if isinstance(value, dict):
+        return MappingProxyType({sys.intern(k): freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def load_catalog(path=CATALOG_PATH):
+    """Parse and freeze a catalog file"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != CATALOG_VERSION:
+        raise ValueError(f"Unsupported catalog version {data.get('version')!r} in {path}")
+    return freeze(data)
+
+
+def get_catalog(path=CATALOG_PATH):
+    """Return the shared catalog, reloading it if the file changed on disk"""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _loaded.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _lock:
+        cached = _loaded.get(path)
+        if not cached or cached[0] != mtime:
+            _loaded[path] = (mtime, load_catalog(path))
+        return _loaded[path][1]
@@ -0,0 +1,191 @@
+"""Journey diagram rendering with a pre-rendered SVG cache.
+
+Every (persona, highlighted node) pair is rendered to SVG ahead of time with
+the Mermaid CLI and stored under ``static/diagrams``. The app serves those
+SVGs inline, so the browser neither downloads Mermaid nor lays out the graph.
+When an SVG is missing the page falls back to client-side Mermaid, loaded
+from ``static/vendor/mermaid.min.js`` through Streamlit's static file
+serving when present and from the CDN otherwise; either way the bundle is
+referenced by URL so the browser caches it across reruns.
+Built pages are memoized per process and, when ``SHARED_CACHE_PATH`` is
+set, shared between all app processes on the node.
+
+Run ``python diagrams.py`` to pre-render (requires ``mmdc`` from
+@mermaid-js/mermaid-cli) and ``python diagrams.py --vendor`` to download the
+Mermaid bundle for air-gapped laptops. Neither artifact is checked in, so
+both are opt-in; without them diagrams use the CDN.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import urllib.request
+from functools import lru_cache
+
+from streamlit import config as streamlit_config
+
+from journeys import JOURNEY_SPECS, get_journey, persona_cache, to_mermaid, WAIT, DECISION
+from shared_cache import shared_cache
+
+MERMAID_VERSION = "9.4.3"
+MERMAID_CDN_URL = f"https://unpkg.com/mermaid@{MERMAID_VERSION}/dist/mermaid.min.js"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIAGRAM_DIR = os.environ.get("DIAGRAM_CACHE_DIR", os.path.join(BASE_DIR, "static", "diagrams"))
+VENDOR_MERMAID_PATH = os.path.join(BASE_DIR, "static", "vendor", "mermaid.min.js")
+
+
+# --- Cache Keys ---
+def highlight_states(persona):
+    """Highlight options for a persona: none plus every non-wait, non-decision node"""
+    journey = get_journey(persona)
+    return [""] + [node_id for i, node_id in enumerate(journey.ids)
+                   if journey.kinds[i] not in (WAIT, DECISION)]
+
+
+def svg_path(persona, highlight_node=""):
+    """Cache file for a rendered diagram.
+
+    The name embeds a digest of the Mermaid source, so editing a journey
+    invalidates its renders without any manual cleanup.
+    """
+    source = to_mermaid(persona, highlight_node)
+    digest = hashlib.sha1(f"{MERMAID_VERSION}\n{source}".encode("utf-8")).hexdigest()[:12]
+    return os.path.join(DIAGRAM_DIR, f"{persona}-{highlight_node or 'none'}-{digest}.svg")
+
+
+# --- Lookup ---
+@persona_cache(maxsize=None)
+def get_svg(persona, highlight_node=""):
+    """Pre-rendered SVG markup, or None if this pair has not been rendered"""
+    path = svg_path(persona, highlight_node)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def vendor_mermaid_url():
+    """URL of the vendored bundle under Streamlit's static file serving (``/app/static/``)"""
+    base = streamlit_config.get_option("server.baseUrlPath").strip("/")
+    relative = os.path.relpath(VENDOR_MERMAID_PATH, os.path.join(BASE_DIR, "static")).replace(os.sep, "/")
+    return f"/{base + '/' if base else ''}app/static/{relative}"
+
+
+@lru_cache(maxsize=1)
+def mermaid_script_tag():
+    """Script tag loading Mermaid from the vendored bundle when it is served, else from the CDN.
+
+    The bundle (about 1 MB) is referenced by URL, never inlined, so it is not
+    resent with every diagram payload.
+    """
+    if os.path.exists(VENDOR_MERMAID_PATH) and streamlit_config.get_option("server.enableStaticServing"):
+        return f'<script src="{vendor_mermaid_url()}"></script>'
+    return f'<script src="{MERMAID_CDN_URL}"></script>'
+
+
+@persona_cache(maxsize=256)
+def diagram_html(persona, highlight_node=""):
+    """HTML document showing a journey diagram"""
+    path = svg_path(persona, highlight_node)
+    # The page differs by how the diagram is drawn (and where Mermaid is loaded from), so that is part of the key
+    if os.path.exists(path):
+        source = "svg"
+    else:
+        source = hashlib.sha1(mermaid_script_tag().encode("utf-8")).hexdigest()[:8]
+    key = f"{os.path.basename(path)[:-4]}:{source}"
+    return shared_cache.get_or_compute("diagram", key, lambda: _build_diagram_html(persona, highlight_node))
+
+
+def _build_diagram_html(persona, highlight_node):
+    svg = get_svg(persona, highlight_node)
+    if svg is not None:
+        return f"""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #ffffff; }}
+        .diagram {{ text-align: center; }}
+        .diagram svg {{ max-width: 100%; height: auto; }}
+    </style>
+</head>
+<body>
+    <div class="diagram">{svg}</div>
+</body>
+</html>
+"""
+
+    return f"""
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    {mermaid_script_tag()}
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #ffffff; }}
+        .mermaid {{ text-align: center; }}
+    </style>
+</head>
+<body>
+    <div class="mermaid">
+{to_mermaid(persona, highlight_node)}
+    </div>
+    <script>
+        mermaid.initialize({{
+            startOnLoad: true,
+            theme: 'default',
+            securityLevel: 'loose',
+            flowchart: {{ useMaxWidth: true, htmlLabels: true, curve: 'basis' }}
+        }});
+    </script>
+</body>
+</html>
+"""
+
+
+# --- Build Step ---
+def prerender_all(mmdc="mmdc", force=False):
+    """Render every (persona, highlight) pair to SVG; returns the number rendered"""
+    os.makedirs(DIAGRAM_DIR, exist_ok=True)
+    rendered = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for persona in JOURNEY_SPECS:
+            for highlight_node in highlight_states(persona):
+                path = svg_path(persona, highlight_node)
+                if os.path.exists(path) and not force:
+                    continue
+                source_path = os.path.join(tmp, "journey.mmd")
+                with open(source_path, "w", encoding="utf-8") as f:
+                    f.write(to_mermaid(persona, highlight_node))
+                subprocess.run([mmdc, "-i", source_path, "-o", path, "-b", "white"],
+                               check=True, capture_output=True)
+                rendered += 1
+    get_svg.cache_clear()
+    diagram_html.cache_clear()
+    return rendered
+
+
+def vendor_mermaid():
+    """Download the pinned Mermaid bundle into static/vendor/"""
+    os.makedirs(os.path.dirname(VENDOR_MERMAID_PATH), exist_ok=True)
+    with urllib.request.urlopen(MERMAID_CDN_URL, timeout=60) as response:
+        bundle = response.read()
+    with open(VENDOR_MERMAID_PATH, "wb") as f:
+        f.write(bundle)
+    mermaid_script_tag.cache_clear()
+    return len(bundle)
+
+
+if __name__ == "__main__":
+    if "--vendor" in sys.argv:
+        print(f"Downloaded Mermaid {MERMAID_VERSION} ({vendor_mermaid():,} bytes) to {VENDOR_MERMAID_PATH}")
+    mmdc = shutil.which("mmdc")
+    if mmdc is None:
+        sys.exit("mmdc not found; install it with `npm install -g @mermaid-js/mermaid-cli` to pre-render SVGs")
+    print(f"Rendered {prerender_all(mmdc, force='--force' in sys.argv)} diagrams into {DIAGRAM_DIR}")
@@ -0,0 +1,396 @@
+"""Append-only columnar store for simulated events across sessions.
+
+Every event a visitor adds to a timeline is also appended here with its
+persona, the journey node it led to, the session and a timestamp. Persona,
+event and node are dictionary-encoded to small integer codes, so a row is a
+few fixed-width numbers. Appends only touch an in-memory buffer; a background
+thread writes the buffer out as an immutable segment (one .npy file per
+column, memory-mapped when read back) and compacts small segments into larger
+ones. A manifest lists the live segments and is replaced atomically, so a
+crash mid-flush or mid-compaction never exposes half-written data.
+
+Queries scan the code columns with NumPy, which keeps group-by counts over
+millions of events in the millisecond range:
+
+    store.frequency("event", persona="GlowSkin")          # events by count
+    store.frequency("event", persona="GlowSkin", node="E")
+    store.frequency(("persona", "node"))
+    store.funnel("GlowSkin")                              # sessions reaching each node
+
+Without a directory the store keeps its segments in memory, which still pools
+events across the sessions of one server process. With ``max_rows`` set the
+oldest events are dropped once that many newer ones are stored: whole segments
+on disk (at most one segment over the cap is kept), and row-exactly in memory.
+
+    python event_store.py generate events/ --rows 5000000
+    python event_store.py frequency events/ --persona GlowSkin
+"""
+
+import argparse
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+COLUMNS = {"persona": np.int16, "event": np.int16, "node": np.int16, "session": np.int64, "timestamp": np.int64}
+DICTIONARY_COLUMNS = ("persona", "event", "node")
+
+
+def session_code(session_key):
+    """Integer for a hex session key; 44 bits leaves room to pack a node code beside it"""
+    return int(session_key[:11], 16)
+
+
+class EventStore:
+    """Columnar event store shared by every session"""
+
+    def __init__(self, path=None, flush_rows=4096, flush_seconds=5.0, compact_segments=8, compact_max_rows=1_000_000,
+                 max_rows=None):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.compact_segments = compact_segments
+        self.compact_max_rows = compact_max_rows
+        self.max_rows = max_rows
+        self.dropped_rows = 0
+        self._dictionary = {column: [] for column in DICTIONARY_COLUMNS}
+        self._codes = {column: {} for column in DICTIONARY_COLUMNS}
+        self._buffer = []  # rows not yet in a segment
+        self._segments = []  # (name, {column: array})
+        self._next_segment = 0
+        self._lock = threading.Lock()  # buffer, dictionary and segment list
+        self._write_lock = threading.Lock()  # flush and compaction
+        self._wake = threading.Event()
+        self._worker = None
+        self._oldest = 0.0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._open()
+
+    # --- Appends ---
+    def append(self, persona, event, node, session_key, timestamp=None):
+        """Record one event; only the in-memory buffer is touched"""
+        ts = int(time.time() if timestamp is None else timestamp)
+        with self._lock:
+            row = (self._encode("persona", persona), self._encode("event", event), self._encode("node", node or ""),
+                   session_code(session_key), ts)
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_rows
+        if self._worker is None:
+            self._start()
+        if full:
+            self._wake.set()
+
+    def _encode(self, column, value):
+        code = self._codes[column].get(value)
+        if code is None:
+            code = self._codes[column][value] = len(self._dictionary[column])
+            self._dictionary[column].append(value)
+        return code
+
+    # --- Segments ---
+    def flush(self):
+        """Write buffered rows out as a new segment"""
+        with self._write_lock:
+            with self._lock:
+                rows = len(self._buffer)
+                if not rows:
+                    return
+                columns = list(zip(*self._buffer[:rows]))
+                dictionary = {column: list(values) for column, values in self._dictionary.items()}
+            arrays = {name: np.array(values, dtype=dtype) for (name, dtype), values in zip(COLUMNS.items(), columns)}
+            name = self._write_segment(arrays, dictionary)
+            with self._lock:
+                self._segments.append((name, self._read_segment(name, arrays)))
+                del self._buffer[:rows]  # appends since the snapshot stay buffered
+                dropped = self._drop_oldest()
+                self._save_manifest()
+            for old in dropped:
+                self._remove_segment(old)
+
+    def _drop_oldest(self):
+        """Drop events beyond ``max_rows``, oldest first; returns the names of dropped segments"""
+        if not self.max_rows:
+            return []
+        excess = sum(len(columns["event"]) for _, columns in self._segments) - self.max_rows
+        dropped = []
+        while excess > 0 and self._segments:
+            name, columns = self._segments[0]
+            rows = len(columns["event"])
+            if rows > excess:
+                if not self.path:
+                    # Copy the kept rows so the dropped ones are freed rather than held by a view
+                    self._segments[0] = (name, {column: values[excess:].copy() for column, values in columns.items()})
+                    self.dropped_rows += excess
+                break
+            del self._segments[0]
+            dropped.append(name)
+            self.dropped_rows += rows
+            excess -= rows
+        return dropped
+
+    def compact(self):
+        """Merge small segments into one once enough of them pile up"""
+        with self._write_lock:
+            with self._lock:
+                small = [s for s in self._segments if len(s[1]["event"]) < self.compact_max_rows]
+                if len(small) < self.compact_segments:
+                    return False
+                dictionary = {column: list(values) for column, values in self._dictionary.items()}
+            merged = {name: np.concatenate([s[1][name] for s in small]) for name in COLUMNS}
+            name = self._write_segment(merged, dictionary)
+            replaced = {s[0] for s in small}
+            with self._lock:
+                self._segments = [s for s in self._segments if s[0] not in replaced]
+                self._segments.append((name, self._read_segment(name, merged)))
+                self._save_manifest()
+            for old in replaced:
+                self._remove_segment(old)
+            return True
+
+    def _start(self):
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._run, name="event-store", daemon=True)
+        self._worker.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            with self._lock:
+                due = self._buffer and (len(self._buffer) >= self.flush_rows
+                                        or time.monotonic() - self._oldest >= self.flush_seconds)
+            if due:
+                self.flush()
+                self.compact()
+
+    # --- Disk Layout ---
+    def _open(self):
+        manifest_path = os.path.join(self.path, "manifest.json")
+        manifest = {"segments": [], "next_segment": 0}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        dictionary = {}
+        dictionary_path = os.path.join(self.path, "dictionary.json")
+        if os.path.exists(dictionary_path):
+            with open(dictionary_path, encoding="utf-8") as f:
+                dictionary = json.load(f)
+        for column in DICTIONARY_COLUMNS:
+            for value in dictionary.get(column, []):
+                self._encode(column, value)
+        self._next_segment = manifest["next_segment"]
+        self._segments = [(name, self._read_segment(name)) for name in manifest["segments"]]
+        # Segments outside the manifest are leftovers of an interrupted flush or compaction
+        live = set(manifest["segments"])
+        for entry in os.listdir(self.path):
+            if entry.startswith("seg-") and entry not in live:
+                self._remove_segment(entry)
+
+    def _write_segment(self, arrays, dictionary):
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        if not self.path:
+            return name
+        # The dictionary only grows, so writing it first keeps every segment's codes resolvable
+        _write_json(os.path.join(self.path, "dictionary.json"), dictionary)
+        staging = os.path.join(self.path, name + ".tmp")
+        os.makedirs(staging, exist_ok=True)
+        for column, values in arrays.items():
+            np.save(os.path.join(staging, f"{column}.npy"), values)
+        os.replace(staging, os.path.join(self.path, name))
+        return name
+
+    def _read_segment(self, name, arrays=None):
+        if not self.path:
+            return arrays
+        return {column: np.load(os.path.join(self.path, name, f"{column}.npy"), mmap_mode="r") for column in COLUMNS}
+
+    def _remove_segment(self, name):
+        if self.path:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _save_manifest(self):
+        if self.path:
+            _write_json(os.path.join(self.path, "manifest.json"),
+                        {"segments": [s[0] for s in self._segments], "next_segment": self._next_segment})
+
+    # --- Queries ---
+    def _snapshot(self):
+        """Column chunks to scan: every segment, then the buffer"""
+        with self._lock:
+            chunks = [columns for _, columns in self._segments]
+            if self._buffer:
+                chunks.append({name: np.array(values, dtype=dtype)
+                               for (name, dtype), values in zip(COLUMNS.items(), zip(*self._buffer))})
+            dictionary = {column: list(values) for column, values in self._dictionary.items()}
+        return chunks, dictionary
+
+    def __len__(self):
+        chunks, _ = self._snapshot()
+        return sum(len(chunk["event"]) for chunk in chunks)
+
+    def _mask(self, chunk, filters, dictionary):
+        mask = None
+        for column, value in filters.items():
+            code = dictionary[column].index(value)
+            match = chunk[column] == code
+            mask = match if mask is None else mask & match
+        return mask
+
+    def frequency(self, by="event", **filters):
+        """Event counts grouped by one or more of persona, event and node.
+
+        Keyword arguments filter on column values, e.g. ``persona="GlowSkin"``.
+        Returns a dict from value (or tuple of values) to count, largest first.
+        """
+        group = (by,) if isinstance(by, str) else tuple(by)
+        chunks, dictionary = self._snapshot()
+        if any(value not in dictionary[column] for column, value in filters.items()):
+            return {}
+        # Count every combination of filter and group codes in one bincount,
+        # then pick the filter values out; no row mask is materialized.
+        columns = list(filters) + list(group)
+        sizes = [max(1, len(dictionary[column])) for column in columns]
+        counts = np.zeros(int(np.prod(sizes)), dtype=np.int64)
+        for chunk in chunks:
+            key = chunk[columns[0]].astype(np.int64)
+            for column, size in zip(columns[1:], sizes[1:]):
+                key *= size
+                key += chunk[column]
+            counts += np.bincount(key, minlength=len(counts))
+        counts = counts.reshape(sizes)[tuple(dictionary[c].index(v) for c, v in filters.items())].ravel()
+        result = {}
+        nonzero = np.flatnonzero(counts)
+        for flat in nonzero[np.argsort(-counts[nonzero], kind="stable")]:
+            codes = np.unravel_index(flat, sizes[len(filters):])
+            values = tuple(dictionary[column][code] for column, code in zip(group, codes))
+            result[values if len(group) > 1 else values[0]] = int(counts[flat])
+        return result
+
+    def funnel(self, persona):
+        """Distinct sessions whose events reached each journey node of a persona"""
+        chunks, dictionary = self._snapshot()
+        if persona not in dictionary["persona"]:
+            return {}
+        n_nodes = len(dictionary["node"])
+        keys = []
+        for chunk in chunks:
+            mask = self._mask(chunk, {"persona": persona}, dictionary)
+            keys.append((chunk["session"][mask] << 16) | chunk["node"][mask])
+        keys = np.sort(np.concatenate(keys)) if keys else np.empty(0, dtype=np.int64)
+        distinct = np.ones(len(keys), dtype=bool)
+        np.not_equal(keys[1:], keys[:-1], out=distinct[1:])
+        nodes = keys[distinct] & 0xFFFF
+        counts = np.bincount(nodes, minlength=n_nodes)
+        return {node: int(counts[i]) for node, i in sorted((n, i) for i, n in enumerate(dictionary["node"]))
+                if node and counts[i]}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "segment_rows": sum(len(columns["event"]) for _, columns in self._segments),
+                "buffered_rows": len(self._buffer),
+                "dropped_rows": self.dropped_rows,
+                "personas": len(self._dictionary["persona"]),
+                "events": len(self._dictionary["event"]),
+            }
+
+
+def _write_json(path, data):
+    staging = path + ".tmp"
+    with open(staging, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(staging, path)
+
+
+event_store = EventStore(
+    path=os.environ.get("EVENT_STORE_DIR") or None,
+    flush_rows=int(os.environ.get("EVENT_STORE_FLUSH_ROWS", 4096)),
+    max_rows=int(os.environ.get("EVENT_STORE_MAX_ROWS", 2_000_000)) or None,
+)
+
+
+# --- Synthetic Data ---
+def generate(path, rows, sessions=None, seed=0, chunk_rows=1_000_000):
+    """Fill a store with synthetic sessions replaying catalog events"""
+    from catalog import get_catalog
+
+    catalog = get_catalog()
+    store = EventStore(path, compact_max_rows=chunk_rows * 4)
+    personas = [store._encode("persona", p) for p in catalog["personas"]]
+    events = [[store._encode("event", e) for e in catalog["event_options"][p]] for p in catalog["personas"]]
+    nodes = [[store._encode("node", catalog["event_to_node_map"][p].get(e, "")) for e in catalog["event_options"][p]]
+             for p in catalog["personas"]]
+    width = max(len(e) for e in events)
+    event_table = np.array([(e * width)[:width] for e in events], dtype=np.int16)
+    node_table = np.array([(n * width)[:width] for n in nodes], dtype=np.int16)
+    rng = np.random.default_rng(seed)
+    sessions = sessions or max(1, rows // 20)
+    now = int(time.time())
+    for offset in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - offset)
+        session = rng.integers(0, sessions, size)
+        persona = session % len(personas)
+        choice = rng.integers(0, width, size)
+        arrays = {
+            "persona": np.asarray(personas, dtype=np.int16)[persona],
+            "event": event_table[persona, choice],
+            "node": node_table[persona, choice],
+            "session": session,
+            "timestamp": now - rng.integers(0, 30 * 86400, size),
+        }
+        with store._write_lock:
+            name = store._write_segment(arrays, store._dictionary)
+            store._segments.append((name, store._read_segment(name, arrays)))
+            store._save_manifest()
+        store.compact()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate", help="fill a store with synthetic events")
+    gen.add_argument("path")
+    gen.add_argument("--rows", type=int, default=5_000_000)
+    gen.add_argument("--seed", type=int, default=0)
+    for command in ("frequency", "funnel", "stats"):
+        query = commands.add_parser(command)
+        query.add_argument("path")
+        query.add_argument("--persona")
+        if command == "frequency":
+            query.add_argument("--by", default="event", help="persona, event or node")
+            query.add_argument("--node")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "generate":
+        store = generate(args.path, args.rows, seed=args.seed)
+        print(f"Wrote {len(store):,} events in {time.perf_counter() - started:.1f} s: {store.stats()}")
+        return
+    store = EventStore(args.path)
+    opened = time.perf_counter()
+    if args.command == "stats":
+        result = store.stats()
+    elif args.command == "funnel":
+        result = store.funnel(args.persona)
+    else:
+        filters = {k: v for k, v in (("persona", args.persona), ("node", args.node)) if v}
+        result = store.frequency(args.by, **filters)
+    print(json.dumps(result, indent=2))
+    print(f"{args.command} over {len(store):,} events in {(time.perf_counter() - opened) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
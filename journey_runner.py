@@ -0,0 +1,216 @@
+"""Execute persona journeys for a live cohort on a timing wheel.
+
+Where simulator.py computes a journey's outcome distribution in closed form,
+the runner actually executes it: users are enqueued at the trigger, walk
+through actions and decisions until they reach a wait, and sit in a
+``TimingWheel`` until it fires. Users that reach the same wait on the same
+tick share one timer holding a NumPy array of their ids, so millions of
+pending users cost a handful of timers, and decisions are drawn for a whole
+batch at once. The clock is virtual: ``run`` fast-forwards journey time as
+quickly as the work allows, or paces it at ``speed`` journey seconds per
+wall second, and records throughput for every tick.
+
+    python journey_runner.py GlowSkin --users 1000000 --days 7
+    python journey_runner.py PulseFit --users 100000 --arrivals-per-hour 5000 --days 14
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from journeys import ACTION, DECISION, EXIT, TRIGGER, WAIT, get_journey
+from simulator import DEFAULT_CONVERSION_RATES, action_channel
+from timing_wheel import TimingWheel, VirtualClock
+
+TICK_HISTORY = 10_080  # one week of one-minute ticks
+
+
+class JourneyRunner:
+    """Runs a cohort through a persona journey in virtual time.
+
+    ``dispatch``, if given, is an async callable ``(channel, node_id, user_ids)``
+    awaited for every batch of users reaching an action node; it is where a
+    real sender would be plugged in.
+    """
+
+    def __init__(self, persona, conversion_rates=None, tick_seconds=60.0, seed=None, dispatch=None):
+        journey = get_journey(persona)
+        if journey is None:
+            raise ValueError(f"Unknown persona: {persona}")
+        self.persona = persona
+        self.journey = journey
+        self.dispatch = dispatch
+        self.clock = VirtualClock(tick_seconds)
+        self.wheel = TimingWheel()
+        self.rng = np.random.default_rng(seed)
+
+        # Flatten the graph: next node for straight-through nodes, yes/no for decisions
+        n = len(journey.ids)
+        self.next_node = [-1] * n
+        self.yes_node = [-1] * n
+        self.wait_ticks = [0] * n
+        self.channel_of = [0] * n
+        self.channels = ["Organic"]
+        for i, node_id in enumerate(journey.ids):
+            for target, label in journey.successors(node_id):
+                j = journey.index[target]
+                if journey.kinds[i] == DECISION and label == "Yes":
+                    self.yes_node[i] = j
+                else:
+                    self.next_node[i] = j
+            if journey.kinds[i] == WAIT:
+                self.wait_ticks[i] = self.clock.ticks_for(journey.wait_hours[i])
+            elif journey.kinds[i] == ACTION:
+                channel = action_channel(journey.labels[i])
+                if channel not in self.channels:
+                    self.channels.append(channel)
+                self.channel_of[i] = self.channels.index(channel)
+        self.trigger = next(i for i in range(n) if journey.kinds[i] == TRIGGER)
+        rates = dict(DEFAULT_CONVERSION_RATES)
+        rates.update(conversion_rates or {})
+        self.rates = np.array([rates.get(channel, 0.0) for channel in self.channels])
+
+        # Per-user state, grown as users are enqueued
+        self.users = 0
+        self.node_of = np.empty(0, dtype=np.int16)
+        self.last_channel = np.empty(0, dtype=np.int8)
+
+        self.visits = np.zeros(n, dtype=np.int64)
+        self.sent = Counter()
+        self.timers_fired = 0
+        self.users_fired = 0
+        self._outbox = []
+        self.ticks = deque(maxlen=TICK_HISTORY)  # (tick, users fired, actions, wall seconds)
+        self.wall_seconds = 0.0
+
+    # --- Cohort ---
+    def enqueue(self, count):
+        """Add ``count`` new users at the trigger at the current journey time"""
+        if count <= 0:
+            return
+        start, self.users = self.users, self.users + count
+        if self.users > len(self.node_of):
+            capacity = max(self.users, 2 * len(self.node_of))
+            self.node_of = np.resize(self.node_of, capacity)
+            self.last_channel = np.resize(self.last_channel, capacity)
+        ids = np.arange(start, self.users, dtype=np.int64)
+        self.last_channel[ids] = 0
+        self._route(self.trigger, ids)
+
+    def _route(self, node, ids):
+        """Walk a batch forward until every user waits or exits"""
+        stack = [(node, ids)]
+        while stack:
+            node, ids = stack.pop()
+            if node < 0 or not len(ids):
+                continue
+            self.visits[node] += len(ids)
+            self.node_of[ids] = node
+            kind = self.journey.kinds[node]
+            if kind == WAIT:
+                self.wheel.schedule(self.wait_ticks[node], (self.next_node[node], ids), len(ids))
+            elif kind == DECISION:
+                converted = self.rng.random(len(ids)) < self.rates[self.last_channel[ids]]
+                stack.append((self.yes_node[node], ids[converted]))
+                stack.append((self.next_node[node], ids[~converted]))
+            elif kind == ACTION:
+                self.last_channel[ids] = self.channel_of[node]
+                self.sent[self.channels[self.channel_of[node]]] += len(ids)
+                self._outbox.append((self.channels[self.channel_of[node]], self.journey.ids[node], ids))
+                stack.append((self.next_node[node], ids))
+            elif kind != EXIT:
+                stack.append((self.next_node[node], ids))
+
+    # --- Clock ---
+    async def tick(self):
+        """Advance one tick: fire due timers, move their users on, dispatch actions"""
+        started = time.perf_counter()
+        expired = self.wheel.advance()
+        self.clock.ticks = self.wheel.now
+        fired = 0
+        for _, (node, ids), size in expired:
+            fired += size
+            self._route(node, ids)
+        self.timers_fired += len(expired)
+        self.users_fired += fired
+
+        outbox, self._outbox = self._outbox, []
+        if self.dispatch and outbox:
+            await asyncio.gather(*(self.dispatch(channel, node_id, ids) for channel, node_id, ids in outbox))
+        elapsed = time.perf_counter() - started
+        self.wall_seconds += elapsed
+        self.ticks.append((self.wheel.now, fired, sum(len(ids) for _, _, ids in outbox), elapsed))
+
+    async def run(self, hours, arrivals_per_hour=0.0, speed=None):
+        """Run for ``hours`` of journey time.
+
+        New users arrive at ``arrivals_per_hour``. With ``speed`` set, each tick
+        is paced to ``tick_seconds / speed`` of wall time; otherwise the clock
+        fast-forwards, yielding to the event loop between ticks.
+        """
+        per_tick = arrivals_per_hour * self.clock.tick_seconds / 3600.0
+        carry = 0.0
+        for _ in range(self.clock.ticks_for(hours)):
+            if per_tick:
+                carry += per_tick
+                arrivals = int(carry)
+                carry -= arrivals
+                self.enqueue(arrivals)
+            await self.tick()
+            await asyncio.sleep(self.clock.tick_seconds / speed if speed else 0)
+
+    # --- Metrics ---
+    def summary(self):
+        journey = self.journey
+        exits = {journey.ids[i]: int(self.visits[i]) for i, kind in enumerate(journey.kinds) if kind == EXIT}
+        wall = [t[3] for t in self.ticks]
+        wall.sort()
+        return {
+            "persona": self.persona,
+            "journey_hours": self.clock.hours,
+            "users": self.users,
+            "waiting": self.wheel.pending_items,
+            "pending_timers": self.wheel.pending_timers,
+            "visits": {journey.ids[i]: int(v) for i, v in enumerate(self.visits)},
+            "exits": exits,
+            "messages_sent": dict(self.sent),
+            "timers_fired": self.timers_fired,
+            "users_fired": self.users_fired,
+            "wall_seconds": self.wall_seconds,
+            "ticks_per_second": len(self.ticks) / sum(wall) if wall and sum(wall) else 0.0,
+            "users_fired_per_second": self.users_fired / self.wall_seconds if self.wall_seconds else 0.0,
+            "tick_p99_ms": wall[int(0.99 * (len(wall) - 1))] * 1000 if wall else 0.0,
+            "tick_max_ms": wall[-1] * 1000 if wall else 0.0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("persona")
+    parser.add_argument("--users", type=int, default=1_000_000, help="cohort enqueued at the start")
+    parser.add_argument("--arrivals-per-hour", type=float, default=0.0, help="users entering during the run")
+    parser.add_argument("--days", type=float, default=7.0, help="journey time to run")
+    parser.add_argument("--speed", type=float, help="journey seconds per wall second (default: as fast as possible)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    runner = JourneyRunner(args.persona, seed=args.seed)
+    started = time.perf_counter()
+    runner.enqueue(args.users)
+    asyncio.run(runner.run(args.days * 24, args.arrivals_per_hour, args.speed))
+    wall = time.perf_counter() - started
+
+    s = runner.summary()
+    print(f"{s['persona']}: {s['journey_hours'] / 24:g} days of journey time for {s['users']:,} users in {wall:.2f} s")
+    print(f"  timers fired {s['timers_fired']:,} ({s['users_fired']:,} users, {s['users_fired_per_second']:,.0f} users/s), "
+          f"{s['ticks_per_second']:,.0f} ticks/s, tick p99 {s['tick_p99_ms']:.2f} ms, max {s['tick_max_ms']:.1f} ms")
+    print(f"  still waiting {s['waiting']:,} users in {s['pending_timers']:,} timers")
+    print(f"  messages sent {s['messages_sent']}")
+    print(f"  exits {s['exits']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Incremental journey position for a session's event timeline.
+
+Each event in the timeline moves the customer to the journey node it maps to.
+Rather than replaying the whole history on every rerun, a ``JourneyState``
+keeps the current node, the touches (action nodes) sent so far and the
+simulated journey time elapsed, and folds in each new event in O(1) using a
+per-journey table of path costs between every pair of nodes. A full replay
+is only needed when the timeline is reset or the persona changes.
+"""
+
+from collections import deque
+from functools import lru_cache
+
+from journeys import ACTION, TRIGGER, WAIT, get_journey
+
+
+@lru_cache(maxsize=64)
+def path_costs(journey):
+    """Touches and wait hours along the shortest path between each pair of nodes.
+
+    ``path_costs(journey)[i][j]`` is ``(touches, hours)`` for moving from node
+    ``i`` to node ``j``: actions and waits at ``i`` and every node in between
+    count, ``j`` itself does not (it is the next step, not yet taken). Pairs
+    with no forward path are absent.
+    """
+    successors = [[journey.index[target] for target, _ in journey.successors(node_id)] for node_id in journey.ids]
+    table = []
+    for source in range(len(journey.ids)):
+        costs = {source: (0, 0.0)}
+        queue = deque([source])
+        while queue:
+            i = queue.popleft()
+            touches, hours = costs[i]
+            step = (touches + (journey.kinds[i] == ACTION),
+                    hours + (journey.wait_hours[i] if journey.kinds[i] == WAIT else 0.0))
+            for j in successors[i]:
+                if j not in costs:
+                    costs[j] = step
+                    queue.append(j)
+        table.append(costs)
+    return table
+
+
+class JourneyState:
+    """Where a session's simulated customer currently is in the journey"""
+
+    def __init__(self, persona, event_to_node):
+        self.persona = persona
+        self.event_to_node = event_to_node
+        self.journey = get_journey(persona)
+        self._costs = path_costs(self.journey) if self.journey else ()
+        kinds = self.journey.kinds if self.journey else ()
+        self._entry = next((i for i, kind in enumerate(kinds) if kind == TRIGGER), 0)
+        self.reset()
+
+    def reset(self):
+        self.node = ""
+        self.touches = 0
+        self.hours = 0.0
+        self.events = 0
+        self.entries = 0  # times the customer (re-)entered the journey
+        self.last_event = None
+
+    def advance(self, event):
+        """Consume one event; returns the new current node id"""
+        self.events += 1
+        self.last_event = event
+        target = self.event_to_node.get(event)
+        j = self.journey.index.get(target) if self.journey and target else None
+        if j is None:
+            return self.node
+        i = self.journey.index.get(self.node)
+        cost = self._costs[i].get(j) if i is not None else None
+        if cost is None:
+            # No forward path from the current node (first event, or the
+            # journey already ended): the customer re-enters at the trigger.
+            cost = self._costs[self._entry].get(j, (0, 0.0))
+            self.entries += 1
+        self.touches += cost[0]
+        self.hours += cost[1]
+        self.node = target
+        return self.node
+
+    def replay(self, events):
+        """Recompute from scratch over a whole timeline"""
+        self.reset()
+        for event in events:
+            self.advance(event)
+        return self
+
+    def describe(self):
+        """One-line summary of progress for the UI and AI prompts"""
+        if not self.events:
+            return "Not started"
+        hours = self.hours
+        elapsed = f"{hours / 24:.1f} days" if hours >= 48 else f"{hours:g} hours"
+        touches = f"{self.touches} touch{'es' if self.touches != 1 else ''} sent"
+        return f"{touches}, {elapsed} of journey time elapsed over {self.events} events"
@@ -0,0 +1,300 @@
+"""Journey definitions compiled into a compact graph IR.
+
+Each persona journey is declared once as a spec, compiled into a ``Journey``
+whose nodes and edges live in flat arrays, and cached per process. Mermaid,
+JSON and prompt text are all emitted from the compiled graph, so the diagram,
+the node descriptions and the AI prompt context can never drift apart.
+"""
+
+import functools
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+
+# --- Node Kinds ---
+TRIGGER = 0
+WAIT = 1
+DECISION = 2
+ACTION = 3
+EXIT = 4
+
+KIND_NAMES = ("trigger", "wait", "decision", "action", "exit")
+
+# --- Journey Specs ---
+# Nodes are (id, kind, mermaid label, detail). The detail is the UI description
+# for triggers/actions/exits, the wait duration in hours for waits and the
+# predicate key for decisions. Edges are (source, target, label).
+JOURNEY_SPECS = {
+    "GlowSkin": {
+        "title": "Cart Abandonment Recovery",
+        "nodes": [
+            ("A", "trigger", "User Adds Items to Cart", "User adds items to cart"),
+            ("B", "wait", "Wait 2 Hours", 2),
+            ("C", "decision", "Has User Purchased?", "purchased"),
+            ("D", "exit", "Exit: Purchase Completed", "Exit: Purchase completed"),
+            ("E", "action", "Send SMS: You left something behind", "Send SMS: 'You left something behind'"),
+            ("F", "wait", "Wait 4 Hours", 4),
+            ("G", "decision", "Has User Purchased?", "purchased"),
+            ("H", "action", "Send Email: Still want that glow? 10% off", "Send Email: 'Still want that glow? 10% off'"),
+            ("I", "wait", "Wait 2 Days", 48),
+            ("J", "decision", "Has User Purchased?", "purchased"),
+            ("K", "action", "Send Push: Your GlowKit is waiting", "Send Push: 'Your GlowKit is waiting'"),
+            ("L", "exit", "Exit: No Response After 3 Touches", "Exit: No response after 3 touches"),
+        ],
+    },
+    "PulseFit": {
+        "title": "App Re-engagement",
+        "nodes": [
+            ("A", "trigger", "User Signs Up for App", "User signs up for app"),
+            ("B", "wait", "Wait 24 Hours", 24),
+            ("C", "decision", "User Active in App?", "active_in_app"),
+            ("D", "exit", "Exit: User Engaged", "Exit: User engaged"),
+            ("E", "action", "Send Push: Ready to crush your fitness goals?", "Send Push: 'Ready to crush your fitness goals?'"),
+            ("F", "wait", "Wait 3 Days", 72),
+            ("G", "decision", "User Active in App?", "active_in_app"),
+            ("H", "action", "Send Email: 5 Quick Workouts to Get Started", "Send Email: '5 Quick Workouts to Get Started'"),
+            ("I", "wait", "Wait 1 Week", 168),
+            ("J", "decision", "User Active in App?", "active_in_app"),
+            ("K", "action", "Send SMS: Get 30% off premium", "Send SMS: 'Get 30% off premium'"),
+            ("L", "exit", "Exit: User Remains Inactive", "Exit: User remains inactive"),
+        ],
+    },
+    "JetQuest": {
+        "title": "Booking Conversion",
+        "nodes": [
+            ("A", "trigger", "User Browses Flight Deals", "User browses flight deals"),
+            ("B", "wait", "Wait 1 Hour", 1),
+            ("C", "decision", "User Booked Flight?", "booked_flight"),
+            ("D", "exit", "Exit: Booking Completed", "Exit: Booking completed"),
+            ("E", "action", "Send Email: Your flight deal expires soon", "Send Email: 'Your flight deal expires soon'"),
+            ("F", "wait", "Wait 6 Hours", 6),
+            ("G", "decision", "User Booked Flight?", "booked_flight"),
+            ("H", "action", "Send SMS: Last chance - save $200", "Send SMS: 'Last chance - save $200'"),
+            ("I", "wait", "Wait 1 Day", 24),
+            ("J", "decision", "User Booked Flight?", "booked_flight"),
+            ("K", "action", "Send Retargeting Ad: Similar destinations", "Send Retargeting Ad: Similar destinations"),
+            ("L", "exit", "Exit: Deal Expired", "Exit: Deal expired"),
+        ],
+    },
+    "LeadSync": {
+        "title": "Trial Activation",
+        "nodes": [
+            ("A", "trigger", "User Starts Free Trial", "User starts free trial"),
+            ("B", "wait", "Wait 2 Days", 48),
+            ("C", "decision", "User Setup Complete?", "setup_complete"),
+            ("D", "exit", "Exit: Trial Converted", "Exit: Trial converted"),
+            ("E", "action", "Send Email: Complete your setup in 5 minutes", "Send Email: 'Complete your setup in 5 minutes'"),
+            ("F", "wait", "Wait 3 Days", 72),
+            ("G", "decision", "User Active in Trial?", "active_in_trial"),
+            ("H", "action", "Send In-App: Need help? Quick guide", "Send In-App: 'Need help? Quick guide'"),
+            ("I", "wait", "Wait 1 Week", 168),
+            ("J", "decision", "User Engaged?", "engaged"),
+            ("K", "action", "Alert CSM: High-value prospect needs attention", "Alert CSM: High-value prospect needs attention"),
+            ("L", "exit", "Exit: Trial Expired", "Exit: Trial expired"),
+        ],
+    },
+}
+
+# All four journeys share the same recovery topology.
+STANDARD_EDGES = (
+    ("A", "B", ""), ("B", "C", ""), ("C", "D", "Yes"), ("C", "E", "No"),
+    ("E", "F", ""), ("F", "G", ""), ("G", "D", "Yes"), ("G", "H", "No"),
+    ("H", "I", ""), ("I", "J", ""), ("J", "D", "Yes"), ("J", "K", "No"),
+    ("K", "L", ""),
+)
+
+
+# --- Compiled Journey ---
+class Journey:
+    """Array-backed journey graph: node attributes by index, edges in CSR order"""
+
+    __slots__ = ("persona", "title", "ids", "index", "kinds", "labels", "details",
+                 "wait_hours", "edge_src", "edge_dst", "edge_labels", "out_start", "_out_edges")
+
+    def __init__(self, persona, spec):
+        nodes = spec["nodes"]
+        self.persona = persona
+        self.title = spec.get("title", persona)
+        self.ids = tuple(node[0] for node in nodes)
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        self.kinds = array("b", (KIND_NAMES.index(node[1]) for node in nodes))
+        self.labels = tuple(node[2] for node in nodes)
+        self.details = tuple(node[3] for node in nodes)
+        self.wait_hours = array("f", (node[3] if node[1] == "wait" else 0 for node in nodes))
+
+        # Edges keep declaration order for the Mermaid emitter; out_start indexes
+        # them by source node so successors can be read without scanning.
+        edges = spec.get("edges", STANDARD_EDGES)
+        self.edge_src = array("h", (self.index[src] for src, _, _ in edges))
+        self.edge_dst = array("h", (self.index[dst] for _, dst, _ in edges))
+        self.edge_labels = tuple(label for _, _, label in edges)
+        order = sorted(range(len(edges)), key=lambda e: self.edge_src[e])
+        self.out_start = array("h", [0] * (len(self.ids) + 1))
+        for e in order:
+            self.out_start[self.edge_src[e] + 1] += 1
+        for i in range(len(self.ids)):
+            self.out_start[i + 1] += self.out_start[i]
+        self._out_edges = tuple(order)
+
+    def successors(self, node_id):
+        """Return (target id, edge label) pairs leaving a node"""
+        i = self.index[node_id]
+        return [(self.ids[self.edge_dst[e]], self.edge_labels[e])
+                for e in self._out_edges[self.out_start[i]:self.out_start[i + 1]]]
+
+    def kind(self, node_id):
+        return KIND_NAMES[self.kinds[self.index[node_id]]]
+
+    def describe(self, node_id, default="Continue journey"):
+        """UI description for trigger, action and exit nodes"""
+        i = self.index.get(node_id)
+        if i is None or self.kinds[i] in (WAIT, DECISION):
+            return default
+        return self.details[i]
+
+
+# Specs for personas loaded from an external persona catalog, most recent last.
+MAX_REGISTERED_JOURNEYS = 32
+_registered_specs = OrderedDict()
+
+# Every persona_cache, so registering a journey can drop that persona's entries
+_persona_caches = []
+
+
+def persona_cache(maxsize=128):
+    """LRU cache for functions whose first argument is a persona.
+
+    Unlike lru_cache, one persona's entries can be dropped with
+    ``invalidate(persona)``; register_journey does so for every persona cache,
+    including those of other modules (diagrams).
+    """
+    def decorate(func):
+        entries = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(func)
+        def wrapper(persona, *args, **kwargs):
+            key = (persona, args, tuple(sorted(kwargs.items())))
+            with lock:
+                if key in entries:
+                    entries.move_to_end(key)
+                    return entries[key]
+            value = func(persona, *args, **kwargs)
+            with lock:
+                entries[key] = value
+                while maxsize is not None and len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return value
+
+        def invalidate(persona):
+            with lock:
+                for key in [key for key in entries if key[0] == persona]:
+                    del entries[key]
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.invalidate = invalidate
+        wrapper.cache_clear = cache_clear
+        _persona_caches.append(wrapper)
+        return wrapper
+    return decorate
+
+
+def register_journey(persona, spec):
+    """Make a catalog persona's journey spec available to get_journey()"""
+    if persona in JOURNEY_SPECS:
+        return
+    if _registered_specs.get(persona) == spec:
+        _registered_specs.move_to_end(persona)
+        return
+    _registered_specs[persona] = spec
+    while len(_registered_specs) > MAX_REGISTERED_JOURNEYS:
+        _registered_specs.popitem(last=False)
+    # Only this persona's compiled journey and renders are stale
+    for cached in _persona_caches:
+        cached.invalidate(persona)
+
+
+@persona_cache(maxsize=64)
+def get_journey(persona):
+    """Compile a persona journey once per process"""
+    spec = JOURNEY_SPECS.get(persona) or _registered_specs.get(persona)
+    return Journey(persona, spec) if spec else None
+
+
+# --- Emitters ---
+@persona_cache(maxsize=256)
+def to_mermaid(persona, highlight_node=""):
+    """Mermaid flowchart for a journey, optionally highlighting one node"""
+    journey = get_journey(persona)
+    if journey is None:
+        return ""
+
+    declared = set()
+
+    def ref(i):
+        node_id = journey.ids[i]
+        if node_id in declared:
+            return node_id
+        declared.add(node_id)
+        label = journey.labels[i]
+        return f"{node_id}{{{label}}}" if journey.kinds[i] == DECISION else f"{node_id}[{label}]"
+
+    lines = ["graph TD"]
+    for e, label in enumerate(journey.edge_labels):
+        arrow = f"-->|{label}|" if label else "-->"
+        lines.append(f"{ref(journey.edge_src[e])} {arrow} {ref(journey.edge_dst[e])}")
+    if highlight_node in journey.index:
+        lines.append("classDef highlight fill:#ffcc00;")
+        lines.append(f"class {highlight_node} highlight;")
+    return "\n    ".join(lines) + "\n"
+
+
+@persona_cache(maxsize=64)
+def to_json(persona):
+    """JSON document describing a journey's nodes and edges"""
+    journey = get_journey(persona)
+    if journey is None:
+        return "{}"
+    return json.dumps({
+        "persona": journey.persona,
+        "title": journey.title,
+        "nodes": [
+            {"id": node_id, "kind": journey.kind(node_id), "label": journey.labels[i],
+             "detail": journey.details[i]}
+            for i, node_id in enumerate(journey.ids)
+        ],
+        "edges": [
+            {"source": journey.ids[journey.edge_src[e]], "target": journey.ids[journey.edge_dst[e]],
+             "label": label}
+            for e, label in enumerate(journey.edge_labels)
+        ],
+    })
+
+
+@persona_cache(maxsize=64)
+def to_prompt_context(persona):
+    """One-line journey path (trigger and actions) for LLM prompts"""
+    journey = get_journey(persona)
+    if journey is None:
+        return ""
+    steps = []
+    for i, node_id in enumerate(journey.ids):
+        if journey.kinds[i] == TRIGGER:
+            steps.append(f"{node_id}: {journey.labels[i]}")
+        elif journey.kinds[i] == ACTION:
+            channel, _, message = journey.labels[i].partition(": ")
+            steps.append(f'{node_id}: {channel} "{message}"')
+    exits = "/".join(node_id for i, node_id in enumerate(journey.ids) if journey.kinds[i] == EXIT)
+    steps.append(f"{exits}: Exit")
+    return f"- **{persona}:** {journey.title}\n  " + " → ".join(steps)
+
+
+@lru_cache(maxsize=None)
+def all_journeys_prompt_context():
+    """Prompt context covering every defined journey"""
+    return "\n\n".join(to_prompt_context(persona) for persona in JOURNEY_SPECS)
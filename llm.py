@@ -0,0 +1,441 @@
+"""OpenAI access for the AI intelligence panels.
+
+One client is shared per process (and per API key) so the underlying HTTP
+connection pool stays warm between clicks, and completions are memoized in a
+content-addressed response cache with LRU eviction, a TTL, a size cap and
+optional on-disk persistence. Completions can also be streamed token by token
+with time-to-first-token and total latency recorded for each request, or run
+concurrently on a bounded worker pool. Every upstream call is admitted by the
+process-wide scheduler, which coalesces duplicates, rate-limits and retries.
+Requests that carry a similarity signature can also be answered from a
+stored response to a near-identical request; ``fresh=True`` skips both
+caches and replaces what they hold. Answers generated offline by
+precompute.py are loaded at startup and served before either cache. When
+``SHARED_CACHE_PATH`` is set, exact answers are also shared with every other
+app process on the node, and only one of them generates a given prompt,
+streamed or not; the others wait for its answer.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from scheduler import scheduler
+from shared_cache import shared_cache
+from similarity import similar_responses
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEFAULT_TEMPERATURE = 0.7
+
+# Any OpenAI-compatible endpoint, e.g. the local stand-in server used for load tests
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL") or None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRECOMPUTED_PATH = os.environ.get("PRECOMPUTED_PATH", os.path.join(BASE_DIR, "data", "precomputed.json.gz"))
+ARTIFACT_VERSION = 1
+
+
+# --- Shared Client ---
+@lru_cache(maxsize=4)
+def get_client(api_key):
+    """Return the process-wide OpenAI client for an API key.
+
+    The client keeps an httpx connection pool, so reusing it skips the TCP and
+    TLS handshake that a fresh client pays on every request. Retries are left
+    to the scheduler so they share its backoff and rate limit. openai is
+    imported here rather than at module load: it takes most of a second and
+    many sessions never make a request.
+    """
+    import openai
+    return openai.OpenAI(api_key=api_key, base_url=LLM_BASE_URL, max_retries=0)
+
+
+# --- Response Cache ---
+def cache_key(model, system_message, prompt, max_tokens, temperature):
+    """Content address of a completion request"""
+    payload = json.dumps([model, system_message, prompt, max_tokens, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of completion text with TTL and size limits.
+
+    When ``directory`` is set every entry is mirrored to a JSON file named by
+    its key, so the cache survives restarts; evicted or expired entries are
+    removed from disk as well.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=8 * 1024 * 1024, ttl_seconds=24 * 3600, directory=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_from_disk()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        created_at = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (created_at, value)
+            self._bytes += len(value.encode("utf-8"))
+            self._write(key, created_at, value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _expired(self, created_at):
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value.encode("utf-8"))
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write(self, key, created_at, value):
+        if not self.directory:
+            return
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": created_at, "value": value}, f)
+        os.replace(tmp_path, self._path(key))
+
+    def _load_from_disk(self):
+        loaded = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    record = json.load(f)
+                loaded.append((record["created_at"], name[:-5], record["value"]))
+            except (OSError, ValueError, KeyError):
+                continue
+        # Oldest first so the LRU order roughly follows creation time.
+        for created_at, key, value in sorted(loaded):
+            if self._expired(created_at):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+                continue
+            self._entries[key] = (created_at, value)
+            self._bytes += len(value.encode("utf-8"))
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 512)),
+    max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", 8 * 1024 * 1024)),
+    ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", 24 * 3600)),
+    directory=os.environ.get("LLM_CACHE_DIR") or None,
+)
+
+
+# --- Precomputed Answers ---
+def load_precomputed(path=PRECOMPUTED_PATH):
+    """{cache key: text} from a precompute.py artifact; its answers also seed the similarity index"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            artifact = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if artifact.get("version") != ARTIFACT_VERSION:
+        return {}
+    answers = {}
+    for key, entry in artifact["entries"].items():
+        answers[key] = entry["text"]
+        signature = {"anchor": tuple(entry["anchor"]), "features": frozenset(entry["features"])}
+        similar_responses.put(signature, entry["text"], tuple(entry["scope"]))
+    return answers
+
+
+precomputed = load_precomputed()
+
+
+def cached_response(key, signature, scope):
+    """(text, similarity) from the precomputed answers or exact caches (similarity None) or the similarity index, else None"""
+    cached = precomputed.get(key)
+    if cached is None:
+        cached = response_cache.get(key)
+    if cached is None:
+        cached = shared_cache.get("llm", key)
+        if cached is not None:
+            response_cache.put(key, cached)
+    if cached is not None:
+        return cached, None
+    if signature is not None:
+        return similar_responses.get(signature, scope)
+    return None
+
+
+def store_response(key, signature, scope, text, shared=True):
+    response_cache.put(key, text)
+    if shared:
+        shared_cache.put("llm", key, text)
+    if signature is not None:
+        similar_responses.put(signature, text, scope)
+
+
+# --- Completions ---
+def chat_completion(api_key, prompt, system_message, max_tokens=500,
+                    model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, use_cache=True, timeout=None,
+                    signature=None, fresh=False):
+    """Return completion text for a prompt, served from the cache when possible"""
+    return completion_with_reuse(api_key, prompt, system_message, max_tokens, model, temperature,
+                                 use_cache, timeout, signature, fresh)[0]
+
+
+def completion_with_reuse(api_key, prompt, system_message, max_tokens=500,
+                          model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, use_cache=True, timeout=None,
+                          signature=None, fresh=False):
+    """``chat_completion`` returning (text, similarity).
+
+    ``similarity`` is the Jaccard similarity of the request whose answer was
+    reused, or None for exact cache hits and new generations.
+    """
+    key = cache_key(model, system_message, prompt, max_tokens, temperature)
+    scope = (model, temperature, max_tokens)
+    if use_cache and not fresh:
+        cached = cached_response(key, signature, scope)
+        if cached is not None:
+            return cached
+
+    client = get_client(api_key)
+    if timeout is not None:
+        client = client.with_options(timeout=timeout)
+
+    def request():
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        content = response.choices[0].message.content
+        if use_cache and content:
+            store_response(key, signature, scope, content, shared=fresh)
+        return content
+
+    # A forced fresh generation must not join an identical call already in flight
+    if fresh or not use_cache:
+        return scheduler.run(key + ":fresh" if fresh else key, request, timeout=timeout), None
+    # Other processes missing the same prompt wait for this one's answer
+    return shared_cache.get_or_compute("llm", key, lambda: scheduler.run(key, request, timeout=timeout), lookup=False), None
+
+
+# --- Streaming ---
+# Most recent request timings, newest last.
+recent_timings = deque(maxlen=100)
+
+
+class CompletionStream:
+    """Iterable of completion text deltas.
+
+    After iteration finishes, ``text`` holds the full response and
+    ``time_to_first_token`` / ``total_latency`` the measured timings in
+    seconds. Cached responses are yielded as a single chunk; ``similarity``
+    is set when the response was reused from a similar request. ``timeout``
+    bounds the wait for an identical request another session is streaming.
+    """
+
+    def __init__(self, api_key, prompt, system_message, max_tokens=500,
+                 model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, use_cache=True,
+                 signature=None, fresh=False, timeout=None):
+        self.api_key = api_key
+        self.prompt = prompt
+        self.system_message = system_message
+        self.max_tokens = max_tokens
+        self.model = model
+        self.temperature = temperature
+        self.use_cache = use_cache
+        self.signature = signature
+        self.fresh = fresh
+        self.timeout = timeout
+        self.text = ""
+        self.cached = False
+        self.similarity = None
+        self.time_to_first_token = None
+        self.total_latency = None
+
+    def __iter__(self):
+        started = time.perf_counter()
+        key = cache_key(self.model, self.system_message, self.prompt, self.max_tokens, self.temperature)
+        scope = (self.model, self.temperature, self.max_tokens)
+        cached = cached_response(key, self.signature, scope) if self.use_cache and not self.fresh else None
+        if cached is not None:
+            self.cached = True
+            self.text, self.similarity = cached
+            self._record(started, started)
+            yield self.text
+            return
+        if self.fresh:
+            key += ":fresh"
+
+        # An identical request already streaming for another session is
+        # awaited and its full text yielded, instead of calling upstream again.
+        call, leader = scheduler.begin(key)
+        if not leader:
+            self.text = call.wait(self.timeout)
+            self._record(started, None)
+            yield self.text
+            return
+
+        parts = []
+        first_token_at = None
+        completed = claimed = False
+        error = waited = None
+        try:
+            if self.use_cache and not self.fresh and shared_cache.enabled:
+                # Another app process streaming the same prompt is awaited
+                # through the shared cache, instead of calling upstream again.
+                claimed, waited = shared_cache.claim_or_wait("llm", key, self.timeout)
+            if waited is not None:
+                parts.append(waited)
+                yield waited
+            else:
+                with scheduler.slot():
+                    stream = scheduler.with_retries(lambda: get_client(self.api_key).chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": self.system_message},
+                            {"role": "user", "content": self.prompt}
+                        ],
+                        temperature=self.temperature,
+                        max_tokens=self.max_tokens,
+                        stream=True
+                    ))
+                    for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if not delta:
+                            continue
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(delta)
+                        yield delta
+            self.text = "".join(parts)
+            completed = True
+            self._record(started, first_token_at)
+            if self.use_cache and self.text:
+                store_response(key.removesuffix(":fresh"), self.signature, scope, self.text, shared=waited is None)
+        except BaseException as e:
+            # Includes GeneratorExit when the page stops consuming the stream.
+            error = e if isinstance(e, Exception) else RuntimeError("Request interrupted")
+            raise
+        finally:
+            # Followers must never wait on a dead leader; a complete stream is
+            # published even if storing it failed.
+            if completed:
+                scheduler.end(key, call, result=self.text)
+            else:
+                scheduler.end(key, call, error=error)
+            if claimed:
+                shared_cache.release("llm", key)
+
+    def _record(self, started, first_token_at):
+        finished = time.perf_counter()
+        self.time_to_first_token = (first_token_at or finished) - started
+        self.total_latency = finished - started
+        recent_timings.append({
+            "model": self.model,
+            "cached": self.cached,
+            "similarity": self.similarity,
+            "time_to_first_token": self.time_to_first_token,
+            "total_latency": self.total_latency,
+        })
+
+
+# --- Concurrent Execution ---
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get("LLM_MAX_WORKERS", 4)), thread_name_prefix="llm")
+
+
+def _timed_completion(api_key, timeout, request):
+    started = time.perf_counter()
+    text, similarity = completion_with_reuse(api_key, request["prompt"], request["system_message"],
+                                             request.get("max_tokens", 500), timeout=timeout,
+                                             signature=request.get("signature"))
+    return text, time.perf_counter() - started, similarity
+
+
+def _outcome(future, slot):
+    try:
+        text, latency, similarity = future.result()
+        return slot, text, None, latency, similarity
+    except Exception as e:
+        return slot, None, e, None, None
+
+
+def run_concurrently(api_key, requests, timeout=60.0):
+    """Run several completions in parallel on the shared worker pool.
+
+    ``requests`` maps a slot name to a request dict with ``prompt``,
+    ``system_message`` and ``max_tokens`` (and optionally ``signature``).
+    Yields ``(slot, text, error, latency, similarity)`` as each request finishes, so the
+    caller can fill results in completion order. ``timeout`` bounds each
+    request and the batch as a whole; requests still running when it expires
+    are reported with a ``TimeoutError``. Closing the generator early (for
+    example when Streamlit interrupts the script) cancels every request that
+    has not started yet.
+    """
+    futures = {executor.submit(_timed_completion, api_key, timeout, request): slot
+               for slot, request in requests.items()}
+    pending = dict(futures)
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            yield _outcome(future, pending.pop(future))
+    except TimeoutError:
+        for future, slot in pending.items():
+            if future.done():
+                yield _outcome(future, slot)
+            else:
+                yield slot, None, TimeoutError(f"No response within {timeout:.0f} seconds"), None, None
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,241 @@
+"""Timing spans and histograms for the app's hot paths.
+
+Each phase of a script run (session init, persona switch, timeline update,
+diagram build, LLM calls, page sections) is timed with ``metrics.span`` and
+aggregated into cumulative histograms, alongside value histograms such as
+LLM token counts and diagram payload size. Components with running totals
+(the LLM scheduler, the session store) register collectors whose stats are
+exported as gauges and counters at scrape time. Histograms are served in the
+Prometheus text format on ``METRICS_PORT`` and/or every observation is
+appended as a JSON line to ``METRICS_FILE``, rotated by size. With neither
+set, ``span`` returns a shared no-op context manager and ``observe`` returns
+at once, so instrumentation costs well under a microsecond per call.
+
+    METRICS_PORT=9464 streamlit run app.py   # METRICS_HOST=0.0.0.0 to expose it beyond localhost
+    curl -s localhost:9464/metrics | grep demo_phase_seconds
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT") or 0)
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.environ.get("METRICS_FILE") or None
+METRICS_FILE_MAX_BYTES = int(os.environ.get("METRICS_FILE_MAX_BYTES", 10 * 1024 * 1024))
+METRICS_PREFIX = "demo_"
+
+# Upper bounds per histogram; anything larger lands in +Inf
+BUCKETS = {
+    "phase_seconds": (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+    "llm_tokens": (50, 100, 250, 500, 1000, 2000, 4000, 8000),
+    "diagram_html_bytes": (1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 1_000_000, 4_000_000),
+}
+DEFAULT_BUCKETS = BUCKETS["phase_seconds"]
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+    """Bucket counts, sum and count for one metric and label set"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile ``q``"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Span:
+    """Context manager timing one phase into ``phase_seconds``"""
+
+    __slots__ = ("metrics", "labels", "started")
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Streamlit's rerun and stop exceptions end a phase normally
+        if exc_type is not None and not exc_type.__module__.startswith("streamlit"):
+            self.labels["outcome"] = "error"
+        self.metrics.observe("phase_seconds", time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Metrics:
+    """Process-wide registry of histograms.
+
+    Disabled unless a port or file is configured; a disabled registry keeps
+    no state and does no work.
+    """
+
+    def __init__(self, port=0, path=None, max_bytes=METRICS_FILE_MAX_BYTES, backup_count=3, host=METRICS_HOST):
+        self.enabled = bool(port or path)
+        self.port = port
+        self.host = host
+        self._histograms = {}  # (name, sorted label items) -> Histogram
+        self._collectors = []  # (name prefix, stats function, counter names)
+        self._lock = threading.Lock()
+        self._server = None
+        self._log = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._log = logging.getLogger(f"{__name__}.file")
+            self._log.propagate = False
+            self._log.setLevel(logging.INFO)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._log.addHandler(handler)
+
+    # --- Recording ---
+    def span(self, phase, **labels):
+        """Time a ``with`` block as ``phase``; labels become Prometheus labels"""
+        if not self.enabled:
+            return _NOOP
+        labels["phase"] = phase
+        return Span(self, labels)
+
+    def timed(self, phase, **labels):
+        """Decorator form of ``span``; leaves the function untouched when disabled"""
+        def decorate(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(phase, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, value, **labels):
+        """Add one observation to histogram ``name``"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(BUCKETS.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+        if self._log is not None:
+            self._log.info(json.dumps({"ts": time.time(), "metric": name, "value": value, **dict(key[1])}))
+
+    def collect(self, prefix, stats, counters=()):
+        """Export the numbers in ``stats()`` at scrape time as ``<prefix>_<name>`` gauges.
+
+        Names listed in ``counters`` are monotonic totals, exported as
+        ``<prefix>_<name>_total`` counters.
+        """
+        if self.enabled:
+            self._collectors.append((prefix, stats, frozenset(counters)))
+
+    # --- Export ---
+    def snapshot(self):
+        """{(name, labels): {"count", "sum", "p50", "p95", "p99"}} for every histogram"""
+        with self._lock:
+            return {
+                key: {"count": h.count, "sum": h.sum, "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                for key, h in self._histograms.items()
+            }
+
+    def prometheus(self):
+        """All histograms in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            described = set()
+            for (name, labels), h in items:
+                metric = METRICS_PREFIX + name
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# TYPE {metric} histogram")
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                sep = "," if label_text else ""
+                cumulative = 0
+                for bound, count in zip(h.bounds + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'{metric}_bucket{{{label_text}{sep}le="{le}"}} {cumulative}')
+                plain = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{metric}_sum{plain} {h.sum:.6g}")
+                lines.append(f"{metric}_count{plain} {h.count}")
+        for prefix, stats, counters in self._collectors:
+            for name, value in sorted(stats().items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                counter = name in counters
+                metric = f"{METRICS_PREFIX}{prefix}_{name}{'_total' if counter else ''}"
+                lines.append(f"# TYPE {metric} {'counter' if counter else 'gauge'}")
+                lines.append(f"{metric} {value:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self):
+        """Start the /metrics endpoint on a daemon thread (once per process).
+
+        Binds ``METRICS_HOST`` (loopback by default). If the port is taken,
+        e.g. by another replica on the node, a warning is logged and this
+        process serves no endpoint.
+        """
+        if not self.port or self._server is not None:
+            return
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logging.getLogger(__name__).warning("Metrics endpoint not started on %s:%s: %s", self.host, self.port, e)
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics(port=METRICS_PORT, path=METRICS_FILE)
@@ -0,0 +1,251 @@
+"""Persona catalog backends.
+
+The app only needs three things from a persona catalog: the sorted persona
+names, a prefix search over them, and the full detail (events, event-to-node
+mapping, summary, journey) of the persona being shown. Backends answer those
+without holding every persona's detail in memory, so a catalog can grow to
+thousands of customer-specific personas.
+
+``JsonPersonaCatalog`` serves the built-in personas from data/catalog.json.
+``SqlitePersonaCatalog`` serves a local SQLite database; build one from a
+JSON-lines file with ``python personas.py import personas.jsonl personas.db``.
+"""
+
+import bisect
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+from catalog import get_catalog
+from journeys import JOURNEY_SPECS, Journey, register_journey
+from simulator import journey_stages
+
+# Persona details kept in memory per backend; sessions mostly sit on one persona.
+DETAIL_CACHE_SIZE = 8
+
+
+def journey_spec(detail):
+    """The journey spec of a persona detail, validated.
+
+    Raises ValueError naming the persona when the journey is missing, names
+    an unknown built-in journey, does not compile, has no path from its
+    trigger through the decisions to an exit, or when the event mapping
+    points at nodes the journey does not have.
+    """
+    name = detail.get("name") or "(unnamed)"
+    journey = detail.get("journey")
+    if isinstance(journey, str):
+        if journey not in JOURNEY_SPECS:
+            raise ValueError(f"Persona {name!r} uses unknown journey {journey!r}; "
+                             f"built-in journeys are {', '.join(JOURNEY_SPECS)}")
+        spec = JOURNEY_SPECS[journey]
+    elif isinstance(journey, dict):
+        spec = journey
+    else:
+        raise ValueError(f"Persona {name!r} has no journey")
+    try:
+        compiled = Journey(name, spec)
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise ValueError(f"Persona {name!r} has an invalid journey spec: {e!r}") from e
+    journey_stages(name, journey=compiled)
+    unknown = sorted({node for node in detail.get("event_to_node", {}).values() if node not in compiled.index})
+    if unknown:
+        raise ValueError(f"Persona {name!r} maps events to nodes missing from its journey: {', '.join(unknown)}")
+    return spec
+
+
+class PersonaCatalog:
+    """Base class: a prefix-searchable set of personas with lazily loaded detail.
+
+    A persona detail is a dict with ``name``, ``events`` (tuple),
+    ``event_to_node`` (mapping), ``summary`` and ``journey`` (a journey spec,
+    or the name of a built-in journey to reuse). ``load`` validates it and
+    adds the resolved ``journey_spec``.
+    """
+
+    def __init__(self):
+        self._details = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, name):
+        raise NotImplementedError
+
+    def names(self, limit=None):
+        """Persona names in display order"""
+        raise NotImplementedError
+
+    def search(self, prefix, limit=50):
+        """Persona names starting with ``prefix`` (case-insensitive)"""
+        raise NotImplementedError
+
+    def _fetch(self, name):
+        raise NotImplementedError
+
+    def load(self, name):
+        """Return a persona's detail, registering its journey for rendering.
+
+        Raises ValueError naming the persona if its detail is invalid.
+        """
+        with self._lock:
+            detail = self._details.get(name)
+            if detail is not None:
+                self._details.move_to_end(name)
+        if detail is None:
+            detail = self._fetch(name)
+            if detail is None:
+                return None
+            detail["journey_spec"] = journey_spec(detail)
+            with self._lock:
+                self._details[name] = detail
+                while len(self._details) > DETAIL_CACHE_SIZE:
+                    self._details.popitem(last=False)
+        register_journey(name, detail["journey_spec"])
+        return detail
+
+
+class JsonPersonaCatalog(PersonaCatalog):
+    """Personas defined in the shared catalog file"""
+
+    def __init__(self, catalog):
+        super().__init__()
+        self.catalog = catalog
+        self._names = tuple(catalog["personas"])
+        self._sorted = sorted((name.lower(), name) for name in self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self.catalog["event_options"]
+
+    def names(self, limit=None):
+        return list(self._names[:limit])
+
+    def search(self, prefix, limit=50):
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self._sorted, (prefix, ""))
+        matches = []
+        for key, name in self._sorted[start:]:
+            if not key.startswith(prefix) or len(matches) >= limit:
+                break
+            matches.append(name)
+        return matches
+
+    def _fetch(self, name):
+        if name not in self:
+            return None
+        return {
+            "name": name,
+            "events": self.catalog["event_options"][name],
+            "event_to_node": self.catalog["event_to_node_map"].get(name, {}),
+            "summary": self.catalog["summaries"].get(name, "N/A"),
+            "journey": name,
+        }
+
+
+class SqlitePersonaCatalog(PersonaCatalog):
+    """Personas stored in a local SQLite database.
+
+    Names are indexed case-insensitively, so prefix search is a B-tree range
+    scan; detail is stored as a JSON document and read only when a persona is
+    selected.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS personas (
+            name TEXT PRIMARY KEY,
+            name_key TEXT NOT NULL,
+            detail TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS personas_name_key ON personas (name_key);
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+        self._count = self._connection().execute("SELECT COUNT(*) FROM personas").fetchone()[0]
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads; keep one per thread.
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+        return connection
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, name):
+        return self._connection().execute(
+            "SELECT 1 FROM personas WHERE name = ?", (name,)).fetchone() is not None
+
+    def names(self, limit=None):
+        rows = self._connection().execute(
+            "SELECT name FROM personas ORDER BY name_key LIMIT ?", (-1 if limit is None else limit,))
+        return [row[0] for row in rows]
+
+    def search(self, prefix, limit=50):
+        prefix = prefix.lower()
+        rows = self._connection().execute(
+            "SELECT name FROM personas WHERE name_key >= ? AND name_key < ? ORDER BY name_key LIMIT ?",
+            (prefix, prefix + "\U0010ffff", limit))
+        return [row[0] for row in rows]
+
+    def _fetch(self, name):
+        row = self._connection().execute("SELECT detail FROM personas WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        detail = json.loads(row[0])
+        detail["events"] = tuple(detail.get("events", ()))
+        return detail
+
+    def upsert(self, details):
+        """Insert or replace persona details, rejecting invalid ones before writing any"""
+        details = list(details)
+        for detail in details:
+            journey_spec(detail)
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO personas (name, name_key, detail) VALUES (?, ?, ?)",
+                ((d["name"], d["name"].lower(), json.dumps(d)) for d in details))
+        self._count = connection.execute("SELECT COUNT(*) FROM personas").fetchone()[0]
+        with self._lock:
+            self._details.clear()
+
+
+# --- Shared Catalog ---
+PERSONA_DB = os.environ.get("PERSONA_DB")
+_shared = {}
+
+
+def get_persona_catalog():
+    """Process-wide persona catalog: SQLite when PERSONA_DB is set, else data/catalog.json"""
+    if PERSONA_DB:
+        key = PERSONA_DB
+        if key not in _shared:
+            _shared[key] = SqlitePersonaCatalog(PERSONA_DB)
+        return _shared[key]
+    catalog = get_catalog()
+    shared = _shared.get("json")
+    if shared is None or shared.catalog is not catalog:  # catalog file was reloaded
+        shared = _shared["json"] = JsonPersonaCatalog(catalog)
+    return shared
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "import":
+        sys.exit("usage: python personas.py import <personas.jsonl> <personas.db>")
+    with open(sys.argv[2], encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    store = SqlitePersonaCatalog(sys.argv[3])
+    store.upsert(records)
+    print(f"Imported {len(records)} personas into {sys.argv[3]} ({len(store)} total)")
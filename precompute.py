@@ -0,0 +1,185 @@
+"""Offline precomputation of AI answers for every finite demo state.
+
+The demo's state space is small: a handful of personas, about a dozen
+events each, and the journey node each event leads to. This batch job
+enumerates every state a presenter reaches with at most one event on the
+timeline, and for each one builds the exact requests the app would send:
+- Event Suggestions for every selected event, both before and after it is
+  added;
+- Journey Optimization for the empty timeline and each single event;
+- Business Impact for the Orchestration Hub defaults.
+
+The requests run on the shared LLM worker pool. Progress is checkpointed
+to a JSONL file so an interrupted run resumes where it stopped, and states
+already in the artifact are skipped, so after a template change only the
+new prompts are generated. The result is written as a versioned gzip
+artifact that llm.py loads at startup. Answers are keyed by the same
+content address as the response cache, so a click that builds one of these
+prompts becomes a lookup, and a changed template or catalog simply stops
+matching. The answers also seed the similarity index, so longer timelines
+can reuse them. The live LLM remains the fallback for unseen requests.
+
+    OPENAI_API_KEY=... python precompute.py
+    python precompute.py --dry-run
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import prompts
+from catalog import get_catalog
+from journey_state import JourneyState
+from llm import ARTIFACT_VERSION, DEFAULT_MODEL, DEFAULT_TEMPERATURE, PRECOMPUTED_PATH, cache_key, run_concurrently
+from personas import get_persona_catalog
+from timeline import EventTimeline
+
+
+# --- Enumeration ---
+def demo_requests(persona, detail):
+    """{label: request} for every precomputed state of one persona"""
+    event_to_node = detail["event_to_node"]
+    requests = {}
+    timelines = [EventTimeline()]
+    for event in detail["events"]:
+        timeline = EventTimeline()
+        timeline.append(event)
+        timelines.append(timeline)
+    for timeline in timelines:
+        state = JourneyState(persona, event_to_node).replay(timeline)
+        # Mirrors app.journey_position: the timeline's position wins, else the selected event is previewed
+        selected = list(timeline) if timeline else detail["events"]
+        for selected_event in selected:
+            highlight_node = state.node or event_to_node.get(selected_event, "")
+            latest_event = state.last_event or selected_event
+            requests[f"{persona}/event_suggestion/{'+'.join(timeline) or '-'}/{selected_event}"] = \
+                prompts.event_suggestion_request(persona, latest_event, timeline, highlight_node, progress=state.describe())
+        requests[f"{persona}/journey_optimization/{'+'.join(timeline) or '-'}"] = \
+            prompts.journey_optimization_request(persona, timeline)
+    requests[f"{persona}/business_impact/defaults"] = prompts.business_impact_request(persona, **prompts.ORCHESTRATION_DEFAULTS)
+    return requests
+
+
+def all_requests(personas=None):
+    persona_catalog = get_persona_catalog()
+    requests = {}
+    for persona in personas or persona_catalog.names():
+        requests.update(demo_requests(persona, persona_catalog.load(persona)))
+    return requests
+
+
+# --- Checkpoint and Artifact ---
+def artifact_entry(request, text):
+    signature = request["signature"]
+    return {
+        "text": text,
+        "scope": [DEFAULT_MODEL, DEFAULT_TEMPERATURE, request["max_tokens"]],
+        "anchor": list(signature["anchor"]),
+        "features": sorted(signature["features"]),
+    }
+
+
+def request_key(request):
+    return cache_key(DEFAULT_MODEL, request["system_message"], request["prompt"], request["max_tokens"], DEFAULT_TEMPERATURE)
+
+
+def load_artifact_entries(path):
+    """Entries of an existing artifact of the current version, so reruns only add new states"""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            artifact = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return artifact["entries"] if artifact.get("version") == ARTIFACT_VERSION else {}
+
+
+def load_checkpoint(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                done[record["key"]] = record["entry"]
+    return done
+
+
+def write_artifact(path, entries):
+    artifact = {
+        "version": ARTIFACT_VERSION,
+        "catalog_version": get_catalog().get("version"),
+        "model": DEFAULT_MODEL,
+        "created_at": time.time(),
+        "entries": entries,
+    }
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(artifact, f)
+    os.replace(tmp_path, path)
+
+
+def precompute(api_key, path=PRECOMPUTED_PATH, personas=None, batch_size=32, timeout=300.0, log=print):
+    """Generate every missing answer and write the artifact; returns (generated, failed, total)"""
+    requests = {request_key(request): request for request in all_requests(personas).values()}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    checkpoint_path = path + ".checkpoint.jsonl"
+    done = load_artifact_entries(path)
+    done.update(load_checkpoint(checkpoint_path))
+    pending = [key for key in requests if key not in done]
+    log(f"{len(requests)} requests, {len(requests) - len(pending)} already done")
+    generated = failed = 0
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        for start in range(0, len(pending), batch_size):
+            # The signature is left out so every state gets its own answer, not a similar one
+            batch = {key: {name: value for name, value in requests[key].items() if name != "signature"}
+                     for key in pending[start:start + batch_size]}
+            for key, text, error, latency, _ in run_concurrently(api_key, batch, timeout=timeout):
+                if error or not text:
+                    failed += 1
+                    log(f"  failed: {error or 'empty response'}")
+                    continue
+                done[key] = artifact_entry(requests[key], text)
+                checkpoint.write(json.dumps({"key": key, "entry": done[key]}) + "\n")
+                checkpoint.flush()
+                generated += 1
+            log(f"  {len(done)}/{len(requests)}")
+    write_artifact(path, {key: done[key] for key in requests if key in done})
+    if not failed:
+        os.remove(checkpoint_path)
+    return generated, failed, len(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=PRECOMPUTED_PATH, help="artifact path (default: %(default)s)")
+    parser.add_argument("--personas", nargs="+", help="limit to these personas")
+    parser.add_argument("--batch-size", type=int, default=32, help="requests submitted to the pool at a time")
+    parser.add_argument("--dry-run", action="store_true", help="only count the requests")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        requests = all_requests(args.personas)
+        kinds = {}
+        for label in requests:
+            kind = label.split("/")[1]
+            kinds[kind] = kinds.get(kind, 0) + 1
+        print(f"{len(requests)} requests: {kinds}")
+        return
+    api_key = os.environ.get("OPENAI_API_KEY", "")
+    if not api_key:
+        sys.exit("Set OPENAI_API_KEY (and LLM_BASE_URL for an OpenAI-compatible endpoint)")
+    started = time.perf_counter()
+    generated, failed, total = precompute(api_key, args.output, args.personas, args.batch_size)
+    print(f"Generated {generated} answers ({failed} failed, {total} total) into {args.output} "
+          f"in {time.perf_counter() - started:.1f} s")
+    if failed:
+        sys.exit(f"{failed} requests failed; rerun to retry them from the checkpoint")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Prompt templates for the AI intelligence panels.
+
+Templates are defined once at import and filled per request. Prompts carry
+only the active persona's journey path, the event timeline is fitted to a
+token budget (oldest events are summarized first), and every built prompt is
+measured with the model's tokenizer so its input size can be logged. Each
+request also carries a similarity signature (see similarity.py) so answers
+to near-identical requests can be reused.
+"""
+
+import logging
+import os
+from collections import Counter
+from functools import lru_cache
+
+from journeys import get_journey, to_prompt_context
+from similarity import request_signature
+from timeline import EventTimeline
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_TOKEN_BUDGET = int(os.environ.get("PROMPT_TIMELINE_TOKENS", 200))
+TOKENIZER_ENCODING = "o200k_base"  # gpt-4o family
+
+
+# --- Token Counting ---
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(TOKENIZER_ENCODING)
+
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, else a chars/4 estimate"""
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def fit_timeline(events, budget=TIMELINE_TOKEN_BUDGET):
+    """Render an event timeline within a token budget.
+
+    The most recent events are kept verbatim. Older events that do not fit
+    are collapsed into a single summary of their counts. Only the kept tail
+    of an ``EventTimeline`` is walked; its counts cover the rest.
+    """
+    if not events:
+        return "No events simulated."
+    if not isinstance(events, EventTimeline):
+        events = list(events)
+    kept, used = [], 0
+    for event in reversed(events):
+        cost = count_tokens(event) + 1
+        if kept and used + cost > budget:
+            break
+        kept.append(event)
+        used += cost
+    kept.reverse()
+    history = ", ".join(kept)
+    omitted_total = len(events) - len(kept)
+    if not omitted_total:
+        return history
+    omitted = (events.counts() if isinstance(events, EventTimeline) else Counter(events)) - Counter(kept)
+    counts = omitted.most_common(5)
+    summary = ", ".join(f"{event} x{count}" for event, count in counts)
+    if len(omitted) > len(counts):
+        summary += ", ..."
+    return f"[{omitted_total} earlier events: {summary}] {history}"
+
+
+# --- Templates ---
+EVENT_SUGGESTION_TEMPLATE = """
+You are a senior marketing strategist at Iterable. You must provide recommendations that EXACTLY match the highlighted step in the customer journey diagram.
+
+**Customer Profile:** {persona}
+**Recent Event:** {selected_event}
+**Event Timeline:** {event_history}
+**Journey Progress:** {progress}
+
+**CRITICAL: The journey diagram is currently highlighting this specific action:**
+{highlighted_action}
+
+**Journey Context for {persona}:**
+{journey_context}
+
+**MANDATORY REQUIREMENT:** Your recommendation must be about the HIGHLIGHTED ACTION ONLY: {highlighted_action}
+
+**Provide your recommendation in this format:**
+
+**Recommended Next Action:** [Must exactly match the highlighted action - if it's "Send SMS", recommend SMS strategy. If it's "Send Email", recommend email strategy, etc.]
+
+**Strategic Reasoning:** [Why this specific highlighted action is the right next step for this event]
+
+**Expected Outcome:** [What you expect from this specific action]
+
+**Tactical Details:** [Specific messaging, timing, or implementation guidance for this highlighted action]
+
+Do NOT recommend any action other than what is currently highlighted in the diagram.
+"""
+
+JOURNEY_OPTIMIZATION_TEMPLATE = """
+You are a customer journey optimization expert at Iterable. Analyze the current journey for persona '{persona}' and event timeline:
+{event_history}
+
+**Current Journey:**
+{journey_context}
+
+**Simulated Timing Sweep** (wait times and channel orders on the conversion vs. time-to-convert Pareto front):
+{sweep_summary}
+
+Provide strategic recommendations for:
+1. **Journey Improvements** - How to optimize the current flow
+2. **Timing Adjustments** - Better wait times or triggers, grounded in the sweep results when available
+3. **Personalization Opportunities** - Ways to make it more relevant
+4. **Performance Metrics** - Key KPIs to track
+5. **Expected Business Impact** - Quantified improvements in conversion rates and revenue
+
+Focus on practical, actionable insights that would improve conversion rates and customer experience.
+"""
+
+BUSINESS_IMPACT_TEMPLATE = """
+You are an Iterable ROI analyst. Based on this prospect's current situation, calculate specific, quantified business impact:
+
+**Current State:**
+- Tech Stack: {data_sources}
+- Challenges: {current_challenges}
+- Channels: {activation_channels}
+- Team Size: {team_size}
+- Persona Focus: {persona}
+
+**Calculate specific business impact metrics:**
+1. **Conversion Rate Improvement** - Based on their channels and persona type
+2. **Time Savings** - Hours saved per week from automation
+3. **Revenue Impact** - Annual revenue increase estimate
+4. **Campaign Efficiency** - Reduction in setup time and manual work
+5. **Customer Experience Score** - Improvement in unified experience
+
+Provide specific percentages and dollar amounts where possible. Make it realistic but compelling.
+
+IMPORTANT: Format as a brief, scannable list with numbers. Use "dollars" instead of dollar signs to avoid formatting issues. Avoid using asterisks in your response.
+"""
+
+# Orchestration Hub selections the app starts from; precompute.py warms the business impact answer for them
+ORCHESTRATION_DEFAULTS = {
+    "data_sources": ["Salesforce CRM", "Shopify/E-commerce Platform"],
+    "current_challenges": ["Data silos between tools", "Manual campaign coordination"],
+    "activation_channels": ["Email", "SMS", "Push Notifications"],
+    "team_size": "Medium (6-15 people)"
+}
+
+
+# --- Builders ---
+def _request(kind, prompt, system_message, max_tokens, signature):
+    input_tokens = count_tokens(system_message) + count_tokens(prompt)
+    logger.info("%s prompt: %d input tokens", kind, input_tokens)
+    return {
+        "prompt": prompt,
+        "system_message": system_message,
+        "max_tokens": max_tokens,
+        "input_tokens": input_tokens,
+        "signature": signature
+    }
+
+
+def _distinct_events(timeline):
+    if isinstance(timeline, EventTimeline):
+        return timeline.counts().keys()
+    return set(timeline or ())
+
+
+def event_suggestion_request(persona, selected_event, timeline, highlight_node, budget=TIMELINE_TOKEN_BUDGET,
+                             progress="Not started"):
+    """Prompt for recommendations on the highlighted journey step"""
+    journey = get_journey(persona)
+    highlighted_action = journey.describe(highlight_node) if journey else "Continue journey"
+    prompt = EVENT_SUGGESTION_TEMPLATE.format(
+        persona=persona,
+        selected_event=selected_event,
+        event_history=fit_timeline(timeline, budget),
+        progress=progress,
+        highlighted_action=highlighted_action,
+        journey_context=to_prompt_context(persona)
+    )
+    signature = request_signature("event_suggestion", persona, exact=(highlight_node,),
+                                  events=_distinct_events(timeline), latest=selected_event)
+    return _request("event_suggestion", prompt,
+                    "You are a senior marketing strategist specializing in customer engagement and MarTech.", 500, signature)
+
+
+def journey_optimization_request(persona, timeline, budget=TIMELINE_TOKEN_BUDGET, sweep_summary="Not run."):
+    """Prompt for optimizing the persona's journey"""
+    prompt = JOURNEY_OPTIMIZATION_TEMPLATE.format(
+        persona=persona,
+        event_history=fit_timeline(timeline, budget),
+        journey_context=to_prompt_context(persona),
+        sweep_summary=sweep_summary
+    )
+    signature = request_signature("journey_optimization", persona, exact=(sweep_summary,),
+                                  events=_distinct_events(timeline))
+    return _request("journey_optimization", prompt,
+                    "You are a customer journey optimization expert specializing in lifecycle marketing and conversion optimization.", 600, signature)
+
+
+def business_impact_request(persona, data_sources, current_challenges, activation_channels, team_size):
+    """Prompt for quantifying Iterable's impact on the prospect's stack"""
+    prompt = BUSINESS_IMPACT_TEMPLATE.format(
+        persona=persona,
+        data_sources=", ".join(data_sources),
+        current_challenges=", ".join(current_challenges),
+        activation_channels=", ".join(activation_channels),
+        team_size=team_size
+    )
+    signature = request_signature("business_impact", persona, exact=(team_size,), options=[
+        *(("source", value) for value in data_sources),
+        *(("challenge", value) for value in current_challenges),
+        *(("channel", value) for value in activation_channels),
+    ])
+    return _request("business_impact", prompt,
+                    "You are an ROI analyst specializing in MarTech transformation impact calculations.", 400, signature)
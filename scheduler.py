@@ -0,0 +1,207 @@
+"""Process-wide scheduling for upstream LLM requests.
+
+Every OpenAI call goes through one ``RequestScheduler``:
+
+- identical requests already in flight are coalesced, so concurrent sessions
+  asking the same question share one upstream call (single flight);
+- a semaphore caps concurrent calls and a token bucket caps requests per
+  minute, so bursts queue instead of tripping provider rate limits;
+- transient failures (429, 5xx, timeouts, dropped connections) are retried
+  with jittered exponential backoff;
+- queue depth, wait times, coalescing and retries are exported on the
+  metrics endpoint (``demo_llm_scheduler_*``), and every queue wait is timed
+  as the ``llm_queue_wait`` phase.
+"""
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import metrics
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError"}
+
+
+def is_retryable(error):
+    """Whether an upstream error is worth retrying"""
+    if getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    """Blocking token bucket refilled at ``rate_per_minute``"""
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, int(rate_per_minute / 6))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+class InFlightCall:
+    """Result slot shared by the leader of a request and its coalesced waiters"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def finish(self, result):
+        self.result = result
+        self._done.set()
+
+    def fail(self, error):
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Timed out waiting for an identical in-flight request")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RequestScheduler:
+    """Single-flight, rate-limited executor for upstream calls"""
+
+    def __init__(self, max_concurrency=4, requests_per_minute=120, max_retries=3,
+                 base_delay=0.5, max_delay=8.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(requests_per_minute)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._waits = deque(maxlen=1000)
+        self.queued = 0
+        self.running = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+
+    # --- Single Flight ---
+    def begin(self, key):
+        """Join or lead the in-flight call for ``key``; returns (call, is_leader)"""
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = self._in_flight[key] = InFlightCall()
+            self.requests += 1
+            return call, True
+
+    def end(self, key, call, result=None, error=None):
+        """Publish the leader's outcome to every waiter"""
+        with self._lock:
+            if self._in_flight.get(key) is call:
+                del self._in_flight[key]
+            if error is not None:
+                self.failures += 1
+        if error is not None:
+            call.fail(error)
+        else:
+            call.finish(result)
+
+    def run(self, key, fn, timeout=None):
+        """Return ``fn()``, sharing one execution among concurrent callers of ``key``"""
+        call, leader = self.begin(key)
+        if not leader:
+            return call.wait(timeout)
+        result = error = None
+        try:
+            with self.slot():
+                result = self.with_retries(fn)
+            return result
+        except BaseException as e:
+            # Includes KeyboardInterrupt and the like; waiters must not block forever
+            error = e if isinstance(e, Exception) else RuntimeError("Request interrupted")
+            raise
+        finally:
+            self.end(key, call, result=result, error=error)
+
+    # --- Admission ---
+    @contextmanager
+    def slot(self):
+        """Hold a concurrency slot and a rate-limit token for one upstream call"""
+        queued_at = time.monotonic()
+        with self._lock:
+            self.queued += 1
+        try:
+            self._slots.acquire()
+            self._bucket.acquire()
+        finally:
+            with self._lock:
+                self.queued -= 1
+        waited = time.monotonic() - queued_at
+        with self._lock:
+            self._waits.append(waited)
+            self.running += 1
+        metrics.observe("phase_seconds", waited, phase="llm_queue_wait")
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+            self._slots.release()
+
+    def with_retries(self, fn):
+        """Call ``fn``, retrying transient errors with full-jitter backoff"""
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+
+    # --- Metrics ---
+    def stats(self):
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": self.queued,
+                "running": self.running,
+                "in_flight_keys": len(self._in_flight),
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "failures": self.failures,
+                "wait_mean_seconds": sum(waits) / len(waits) if waits else 0.0,
+                "wait_p95_seconds": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "wait_max_seconds": waits[-1] if waits else 0.0,
+            }
+
+
+scheduler = RequestScheduler(
+    max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", 4)),
+    requests_per_minute=int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 120)),
+    max_retries=int(os.environ.get("LLM_MAX_RETRIES", 3)),
+)
+metrics.collect("llm_scheduler", scheduler.stats, counters=("requests", "coalesced", "retries", "failures"))
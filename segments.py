@@ -0,0 +1,309 @@
+"""Vectorized segment evaluation for journey decision nodes.
+
+Decision nodes ("Has User Purchased?", "User Active in App?", ...) name a
+predicate key; data/catalog.json defines each predicate as a set of event
+types, optionally limited to a trailing time window. Predicates are
+evaluated in bulk against a columnar user/event table memory-mapped from
+disk: the table keeps an index of rows by event type, so a predicate reads
+only the rows of its event types and marks the matching users in one boolean
+array. A cohort is then routed down every decision's Yes/No edges with array
+masks rather than per-user lookups. Evaluated segments are cached (the most
+recently used ``max_segments`` of them), and events added afterwards update
+them from the new rows alone. Small cohorts skip whole-table evaluation and
+read only their users' rows through a row index by user, which added events
+extend batch by batch.
+
+    python segments.py generate events/ --rows 50000000 --users 5000000
+    python segments.py route events/ GlowSkin --cohort 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from catalog import get_catalog
+from journeys import DECISION, EXIT, TRIGGER, WAIT, get_journey
+
+COLUMN_DTYPES = {"user_id": np.int32, "event": np.int16, "timestamp": np.int64}
+WRITE_CHUNK_ROWS = 5_000_000
+
+
+# --- Event Table ---
+class EventTable:
+    """Columnar event table memory-mapped from a directory of .npy columns.
+
+    ``user_id`` holds dense integer ids (0 to ``n_users - 1``), ``event``
+    holds codes into ``event_names`` (dictionary encoding) and ``timestamp``
+    holds epoch seconds. Row indexes by event type and by user are built on
+    first use and saved next to the columns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "dictionary.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.event_names = meta["events"]
+        self.event_codes = {name: code for code, name in enumerate(self.event_names)}
+        self.n_users = meta["n_users"]
+        self.user_id, self.event, self.timestamp = (
+            np.load(self._file(name), mmap_mode="r") for name in COLUMN_DTYPES
+        )
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.event)
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.npy")
+
+    @classmethod
+    def create(cls, path, rows, event_names, n_users):
+        """Allocate empty columns on disk; returns the writable column memmaps"""
+        os.makedirs(path, exist_ok=True)
+        for stale in os.listdir(path):
+            if stale.endswith("_index.npy") or stale.endswith("_offsets.npy"):
+                os.remove(os.path.join(path, stale))
+        with open(os.path.join(path, "dictionary.json"), "w", encoding="utf-8") as f:
+            json.dump({"events": list(event_names), "n_users": int(n_users)}, f)
+        return {
+            name: open_memmap(os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype, shape=(rows,))
+            for name, dtype in COLUMN_DTYPES.items()
+        }
+
+    @classmethod
+    def write(cls, path, user_id, event, timestamp, event_names, n_users=None):
+        """Write whole columns and open the result"""
+        user_id = np.asarray(user_id)
+        if n_users is None:
+            n_users = int(user_id.max()) + 1 if len(user_id) else 0
+        columns = cls.create(path, len(user_id), event_names, n_users)
+        for name, values in zip(COLUMN_DTYPES, (user_id, event, timestamp)):
+            columns[name][:] = values
+            columns[name].flush()
+        del columns
+        return cls(path)
+
+    # --- Indexes ---
+    def _index(self, name, keys, n_keys):
+        """Row ids grouped by key, as (order, offsets), cached on disk"""
+        if name in self._indexes:
+            return self._indexes[name]
+        order_path = os.path.join(self.path, f"{name}_index.npy")
+        offsets_path = os.path.join(self.path, f"{name}_offsets.npy")
+        source_mtime = os.path.getmtime(self._file(name))
+        if os.path.exists(order_path) and os.path.getmtime(order_path) >= source_mtime:
+            index = np.load(order_path, mmap_mode="r"), np.load(offsets_path)
+        else:
+            order = np.argsort(keys, kind="stable").astype(np.int64 if len(keys) >= 2 ** 31 else np.int32)
+            offsets = np.zeros(n_keys + 1, dtype=np.int64)
+            np.cumsum(np.bincount(keys, minlength=n_keys), out=offsets[1:])
+            np.save(order_path, order)
+            np.save(offsets_path, offsets)
+            index = order, offsets
+        self._indexes[name] = index
+        return index
+
+    def event_rows(self, codes):
+        """Row ids of every event with one of the given codes"""
+        order, offsets = self._index("event", self.event, len(self.event_names))
+        parts = [order[offsets[c]:offsets[c + 1]] for c in codes]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def user_rows(self, user_ids):
+        """Row ids of every event of the given users"""
+        order, offsets = self._index("user_id", self.user_id, self.n_users)
+        parts = [order[offsets[u]:offsets[u + 1]] for u in np.asarray(user_ids) if 0 <= u < self.n_users]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+# --- Segment Engine ---
+class SegmentEngine:
+    """Evaluates decision predicates for whole cohorts against an EventTable"""
+
+    # Cohorts below this share of all users are evaluated from their own rows
+    SMALL_COHORT_FRACTION = 0.01
+
+    def __init__(self, table, predicates=None, max_segments=64):
+        self.table = table
+        self.predicates = predicates if predicates is not None else get_catalog()["segment_predicates"]
+        self.n_users = table.n_users
+        self.max_segments = max_segments
+        self._segments = OrderedDict()  # (predicate key, as_of) -> bool per user, least recently used first
+        self._new = {"user_id": [], "event": [], "timestamp": []}  # events added since load
+        self._new_by_user = []  # per added batch: (sorted user ids, row order), the batch's user index
+
+    def _spec(self, key):
+        spec = self.predicates.get(key)
+        if spec is None:
+            raise ValueError(f"No segment predicate defined for {key!r}")
+        codes = [self.table.event_codes[e] for e in spec["events"] if e in self.table.event_codes]
+        within = spec.get("within_hours")
+        return codes, within
+
+    def _matches(self, key, as_of, user_id, event, timestamp):
+        codes, within = self._spec(key)
+        keep = np.isin(event, codes) & (timestamp <= as_of)
+        if within is not None:
+            keep &= timestamp >= as_of - within * 3600
+        return user_id[keep]
+
+    def segment(self, key, as_of):
+        """Boolean array over users: True where predicate ``key`` holds at ``as_of``"""
+        cached = self._segments.get((key, as_of))
+        if cached is not None:
+            self._segments.move_to_end((key, as_of))
+            return cached
+        codes, within = self._spec(key)
+        table = self.table
+        rows = table.event_rows(codes)
+        timestamp = table.timestamp[rows]
+        keep = timestamp <= as_of
+        if within is not None:
+            keep &= timestamp >= as_of - within * 3600
+        mask = np.zeros(self.n_users, dtype=bool)
+        mask[table.user_id[rows[keep]]] = True
+        if self._new["user_id"]:
+            new = {name: np.concatenate(values) for name, values in self._new.items()}
+            mask[self._matches(key, as_of, new["user_id"], new["event"], new["timestamp"])] = True
+        self._segments[(key, as_of)] = mask
+        while len(self._segments) > self.max_segments:
+            self._segments.popitem(last=False)
+        return mask
+
+    def user_matches(self, key, as_of, users):
+        """Boolean array over ``users``: True where predicate ``key`` holds, read from their rows only"""
+        users = np.asarray(users)
+        cached = self._segments.get((key, as_of))
+        if cached is not None:
+            self._segments.move_to_end((key, as_of))
+            return cached[users]
+        table = self.table
+        rows = table.user_rows(users)
+        matched = [self._matches(key, as_of, table.user_id[rows], table.event[rows], table.timestamp[rows])]
+        for batch, (sorted_users, order) in enumerate(self._new_by_user):
+            lo, hi = np.searchsorted(sorted_users, users, "left"), np.searchsorted(sorted_users, users, "right")
+            rows = np.concatenate([order[a:b] for a, b in zip(lo, hi) if a < b] or [np.empty(0, dtype=np.int64)])
+            matched.append(self._matches(key, as_of, *(self._new[name][batch][rows] for name in self._new)))
+        return np.isin(users, np.concatenate(matched))
+
+    def add_events(self, user_id, events, timestamp):
+        """Record new events; cached segments are updated from these rows only"""
+        user_id = np.asarray(user_id, dtype=np.int64)
+        timestamp = np.asarray(timestamp, dtype=np.int64)
+        codes = np.array([self.table.event_codes.get(e, -1) if isinstance(e, str) else e for e in events],
+                         dtype=np.int16)
+        if len(user_id) and user_id.max() >= self.n_users:
+            self.n_users = int(user_id.max()) + 1
+            for k, mask in self._segments.items():
+                self._segments[k] = np.concatenate([mask, np.zeros(self.n_users - len(mask), dtype=bool)])
+        for name, values in zip(("user_id", "event", "timestamp"), (user_id, codes, timestamp)):
+            self._new[name].append(values)
+        order = np.argsort(user_id, kind="stable")
+        self._new_by_user.append((user_id[order], order))
+        for (key, as_of), mask in self._segments.items():
+            mask[self._matches(key, as_of, user_id, codes, timestamp)] = True
+
+    def route(self, persona, cohort, start):
+        """Send a cohort through a persona journey in one vectorized pass per node.
+
+        ``cohort`` holds the user ids entering at ``start`` (epoch seconds).
+        Each decision is evaluated as of the start plus the waits before it.
+        Returns users reaching each node and the Yes/No split per decision.
+        """
+        journey = get_journey(persona)
+        if journey is None:
+            raise ValueError(f"Unknown persona: {persona}")
+        visits = dict.fromkeys(journey.ids, 0)
+        decisions = {}
+        trigger = next(i for i, kind in enumerate(journey.kinds) if kind == TRIGGER)
+        stack = [(journey.ids[trigger], np.asarray(cohort), 0.0)]
+        while stack:
+            node_id, users, elapsed = stack.pop()
+            visits[node_id] += len(users)
+            i = journey.index[node_id]
+            kind = journey.kinds[i]
+            if kind == EXIT or not len(users):
+                continue
+            if kind == WAIT:
+                elapsed += float(journey.wait_hours[i]) * 3600
+            successors = journey.successors(node_id)
+            if kind == DECISION:
+                key, as_of = journey.details[i], int(start + elapsed)
+                if len(users) < self.n_users * self.SMALL_COHORT_FRACTION:
+                    holds = self.user_matches(key, as_of, users)
+                else:
+                    holds = self.segment(key, as_of)[users]
+                split = {"Yes": users[holds], "No": users[~holds]}
+                decisions[node_id] = {"yes": int(holds.sum()), "no": int(len(users) - holds.sum())}
+                stack.extend((target, split.get(label, users), elapsed) for target, label in successors)
+            else:
+                stack.extend((target, users, elapsed) for target, _ in successors)
+        return {"persona": persona, "cohort": len(cohort), "visits": visits, "decisions": decisions}
+
+
+# --- Synthetic Data ---
+def generate(path, rows, n_users, days=30, end=None, seed=0):
+    """Write a synthetic event table over every catalog event type"""
+    catalog = get_catalog()
+    names = sorted({event for events in catalog["event_options"].values() for event in events})
+    end = int(end if end is not None else time.time())
+    rng = np.random.default_rng(seed)
+    weights = rng.pareto(1.5, len(names)) + 1  # a few event types dominate, as in real data
+    weights /= weights.sum()
+    columns = EventTable.create(path, rows, names, n_users)
+    for offset in range(0, rows, WRITE_CHUNK_ROWS):
+        size = min(WRITE_CHUNK_ROWS, rows - offset)
+        columns["user_id"][offset:offset + size] = rng.integers(0, n_users, size)
+        columns["event"][offset:offset + size] = rng.choice(len(names), size, p=weights)
+        columns["timestamp"][offset:offset + size] = rng.integers(end - days * 86400, end, size)
+    for column in columns.values():
+        column.flush()
+    del columns
+    return EventTable(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate", help="write a synthetic event table")
+    gen.add_argument("path")
+    gen.add_argument("--rows", type=int, default=50_000_000)
+    gen.add_argument("--users", type=int, default=5_000_000)
+    gen.add_argument("--days", type=int, default=30)
+    gen.add_argument("--seed", type=int, default=0)
+    route = commands.add_parser("route", help="route a cohort through a persona journey")
+    route.add_argument("path")
+    route.add_argument("persona")
+    route.add_argument("--cohort", type=int, help="users entering (default: every user)")
+    route.add_argument("--start-days-ago", type=float, default=14, help="when the cohort entered")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "generate":
+        table = generate(args.path, args.rows, args.users, args.days, seed=args.seed)
+        print(f"Wrote {len(table):,} events for {table.n_users:,} users to {args.path} in {time.perf_counter() - started:.1f} s")
+        return
+
+    table = EventTable(args.path)
+    engine = SegmentEngine(table)
+    end = int(table.timestamp.max()) if len(table) else int(time.time())
+    cohort = np.arange(min(args.cohort or table.n_users, table.n_users))
+    try:
+        result = engine.route(args.persona, cohort, end - int(args.start_days_ago * 86400))
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Routed {len(cohort):,} users through {args.persona} over {len(table):,} events "
+          f"in {time.perf_counter() - started:.2f} s")
+    for node_id, split in result["decisions"].items():
+        print(f"  {node_id}: yes {split['yes']:,}  no {split['no']:,}")
+    print(f"  visits {result['visits']}")
+
+
+if __name__ == "__main__":
+    main()
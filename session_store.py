@@ -0,0 +1,273 @@
+"""Bounded storage for per-session AI responses.
+
+Sessions no longer keep their own copy of each LLM response. Responses are
+stored once per process, zlib-compressed and addressed by content digest, with
+a reference count; a session only holds the digests for its slots, so sessions
+that received the same answer share it. Sessions idle for longer than
+``idle_seconds`` release their responses, optionally spilling them to disk so
+they come back if the visitor returns, and the number of tracked sessions is
+capped. Spill files of visitors who never return are deleted after
+``spill_ttl_seconds``. Store totals are exported on the metrics endpoint.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metrics import metrics
+
+COMPRESS_MIN_BYTES = 256
+
+
+class SessionStore:
+    """Content-addressed response storage shared by every session"""
+
+    def __init__(self, idle_seconds=1800, max_sessions=1000, spill_dir=None, sweep_interval=60,
+                 spill_ttl_seconds=24 * 3600):
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.spill_dir = spill_dir
+        self.spill_ttl_seconds = spill_ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._blobs = {}  # digest -> [refcount, stored bytes, compressed flag]
+        self._sessions = OrderedDict()  # session key -> {"last_seen": t, "slots": {slot: digest}}
+        self._spilling = {}  # session key -> {slot: text} evicted but not yet written to disk
+        self._spilled = set()  # session keys with a spill file
+        self._restoring = set()  # session keys whose spill file is being read back
+        self._lock = threading.Lock()
+        self._restored = threading.Condition(self._lock)
+        self._spill_lock = threading.Lock()  # orders spill file writes; taken without _lock held
+        self._last_sweep = time.monotonic()
+        self.evictions = 0
+        self.spilled_files = 0
+        self.spilled_bytes = 0
+        self.expired_spills = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self._spilled = {name[:-len(".json.gz")] for name in os.listdir(spill_dir) if name.endswith(".json.gz")}
+
+    # --- Slot Access ---
+    def get(self, session_key, slot):
+        """Response text stored in a session slot, or '' if empty"""
+        with self._session(session_key) as session:
+            digest = session["slots"].get(slot)
+            text = self._text(digest) if digest is not None else ""
+        self._maybe_sweep()
+        return text
+
+    def set(self, session_key, slot, text):
+        """Store response text in a session slot, sharing identical responses"""
+        with self._session(session_key) as session:
+            previous = session["slots"].get(slot)
+            session["slots"][slot] = self._retain(text)
+            if previous is not None:
+                self._release(previous)
+        self._maybe_sweep()
+
+    def clear(self, session_key, *slots):
+        """Empty the given slots (all slots if none are named)"""
+        with self._session(session_key) as session:
+            for slot in slots or list(session["slots"]):
+                digest = session["slots"].pop(slot, None)
+                if digest is not None:
+                    self._release(digest)
+
+    # --- Metrics ---
+    def session_bytes(self, session_key):
+        """Stored bytes attributed to a session, splitting shared responses evenly"""
+        with self._lock:
+            session = self._sessions.get(session_key)
+            if session is None:
+                return 0
+            return sum(len(self._blobs[d][1]) / self._blobs[d][0] for d in session["slots"].values())
+
+    def stats(self):
+        with self._lock:
+            stored = sum(len(blob[1]) for blob in self._blobs.values())
+            references = sum(len(s["slots"]) for s in self._sessions.values())
+            return {
+                "sessions": len(self._sessions),
+                "unique_responses": len(self._blobs),
+                "references": references,
+                "stored_bytes": stored,
+                "bytes_per_session": stored / len(self._sessions) if self._sessions else 0.0,
+                "evictions": self.evictions,
+                "spilled_files": self.spilled_files,
+                "spilled_bytes": self.spilled_bytes,
+                "expired_spills": self.expired_spills,
+            }
+
+    # --- Eviction ---
+    def sweep(self, now=None):
+        """Release responses of idle sessions and enforce the session cap"""
+        now = time.monotonic() if now is None else now
+        spills = []
+        with self._lock:
+            self._last_sweep = now
+            # Sessions are kept in last-seen order, so idle ones are at the front.
+            while self._sessions:
+                key, session = next(iter(self._sessions.items()))
+                if now - session["last_seen"] <= self.idle_seconds and len(self._sessions) <= self.max_sessions:
+                    break
+                spills += self._evict(key)
+        self._write_spills(spills)
+        if self.spill_dir:
+            self.expire_spills()
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+
+    @contextmanager
+    def _session(self, session_key):
+        """Touch a session with the lock held; a spilled one is read back from disk with the lock released"""
+        restored = None
+        self._lock.acquire()
+        try:
+            while session_key in self._restoring:
+                self._restored.wait()
+            if session_key not in self._sessions and session_key in self._spilled:
+                self._spilled.discard(session_key)
+                self._restoring.add(session_key)
+                self._lock.release()
+                try:
+                    restored = self._read_spill(session_key)
+                finally:
+                    self._lock.acquire()
+                    self._restoring.discard(session_key)
+                    self._restored.notify_all()
+            session, spills = self._touch(session_key, restored)
+            yield session
+        finally:
+            self._lock.release()
+        self._write_spills(spills)
+
+    def _touch(self, session_key, restored=None):
+        """Session for the key, created if needed; also returns the spills its creation caused.
+
+        ``restored`` holds slots read back from the session's spill file; a
+        spill still waiting to be written is taken back from memory.
+        """
+        spills = []
+        session = self._sessions.get(session_key)
+        if session is None:
+            session = self._sessions[session_key] = {"last_seen": 0.0, "slots": {}}
+            self._merge(session, self._spilling.pop(session_key, None))
+            while len(self._sessions) > self.max_sessions:
+                spills += self._evict(next(iter(self._sessions)))
+        self._merge(session, restored)
+        session["last_seen"] = time.monotonic()
+        self._sessions.move_to_end(session_key)
+        return session, spills
+
+    def _merge(self, session, texts):
+        # Slots already set are newer than anything spilled
+        for slot, text in (texts or {}).items():
+            if slot not in session["slots"]:
+                session["slots"][slot] = self._retain(text)
+
+    def _retain(self, text):
+        raw = text.encode("utf-8")
+        digest = hashlib.sha1(raw).hexdigest()
+        if digest in self._blobs:
+            self._blobs[digest][0] += 1
+        else:
+            compressed = len(raw) >= COMPRESS_MIN_BYTES
+            self._blobs[digest] = [1, zlib.compress(raw) if compressed else raw, compressed]
+        return digest
+
+    def _text(self, digest):
+        data, compressed = self._blobs[digest][1:]
+        return (zlib.decompress(data) if compressed else data).decode("utf-8")
+
+    def _release(self, digest):
+        blob = self._blobs[digest]
+        blob[0] -= 1
+        if blob[0] <= 0:
+            del self._blobs[digest]
+
+    def _evict(self, session_key):
+        """Drop a session; returns the ``(key, texts)`` spill to write once the lock is released"""
+        session = self._sessions.pop(session_key)
+        spills = []
+        if self.spill_dir and session["slots"]:
+            texts = {slot: self._text(digest) for slot, digest in session["slots"].items()}
+            self._spilling[session_key] = texts
+            spills.append((session_key, texts))
+        for digest in session["slots"].values():
+            self._release(digest)
+        self.evictions += 1
+        return spills
+
+    # --- Disk Spill ---
+    def _spill_path(self, session_key):
+        return os.path.join(self.spill_dir, f"{session_key}.json.gz")
+
+    def expire_spills(self, now=None):
+        """Delete spill files older than ``spill_ttl_seconds``; returns how many were deleted"""
+        now = time.time() if now is None else now
+        expired = files = size = 0
+        with os.scandir(self.spill_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json.gz"):
+                    continue
+                try:
+                    stat = entry.stat()
+                    if now - stat.st_mtime > self.spill_ttl_seconds:
+                        os.remove(entry.path)
+                        expired += 1
+                        with self._lock:
+                            self._spilled.discard(entry.name[:-len(".json.gz")])
+                        continue
+                except OSError:
+                    continue  # restored (and removed) by its session meanwhile
+                files += 1
+                size += stat.st_size
+        with self._lock:
+            self.expired_spills += expired
+            self.spilled_files, self.spilled_bytes = files, size
+        return expired
+
+    def _write_spills(self, spills):
+        # Written outside the store lock; a spill taken back or evicted again meanwhile is skipped or removed.
+        for session_key, texts in spills:
+            path = self._spill_path(session_key)
+            with self._spill_lock:
+                with self._lock:
+                    if self._spilling.get(session_key) is not texts:
+                        continue
+                with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+                    json.dump(texts, f)
+                os.replace(path + ".tmp", path)
+                with self._lock:
+                    written = self._spilling.get(session_key) is texts
+                    if written:
+                        del self._spilling[session_key]
+                        self._spilled.add(session_key)
+                if not written:
+                    os.remove(path)
+
+    def _read_spill(self, session_key):
+        path = self._spill_path(session_key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                texts = json.load(f)
+            os.remove(path)
+        except (OSError, ValueError):
+            return None
+        return texts
+
+
+session_store = SessionStore(
+    idle_seconds=float(os.environ.get("SESSION_IDLE_SECONDS", 1800)),
+    max_sessions=int(os.environ.get("SESSION_MAX_SESSIONS", 1000)),
+    spill_dir=os.environ.get("SESSION_SPILL_DIR") or None,
+    spill_ttl_seconds=float(os.environ.get("SESSION_SPILL_TTL_SECONDS", 24 * 3600)),
+)
+metrics.collect("session_store", session_store.stats, counters=("evictions", "expired_spills"))
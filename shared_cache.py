@@ -0,0 +1,304 @@
+"""Cache tier shared by every Streamlit process on a node.
+
+Each replica behind the load balancer keeps its own in-process caches, so
+without a shared tier every replica warms up separately and holds its own
+copy. ``SharedCache`` stores entries in one SQLite database in WAL mode, so
+any number of processes read concurrently while one writes at a time:
+
+- ``get_or_compute`` is atomic across processes: the first process to miss
+  claims the key, computes and stores the value, and the others wait for it
+  instead of computing it again (a claim expires if its holder dies);
+  ``claim_or_wait`` offers the same protocol to callers that produce the
+  value incrementally, such as a streamed completion;
+- total value size is bounded, evicting the least recently used entries;
+- hits and misses are counted per namespace in the database, so the hit
+  rate covers the traffic of every replica.
+
+In-process caches stay in front of it as a first level. With no path the
+cache is disabled and ``get_or_compute`` simply computes.
+
+    SHARED_CACHE_PATH=/dev/shm/demo-cache.db streamlit run app.py
+    python shared_cache.py stats /dev/shm/demo-cache.db
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH") or None
+SHARED_CACHE_MAX_BYTES = int(os.environ.get("SHARED_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+
+class SharedCache:
+    """Size-bounded key/value cache in a SQLite database shared between processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+        CREATE TABLE IF NOT EXISTS claims (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            namespace TEXT PRIMARY KEY,
+            hits INTEGER NOT NULL DEFAULT 0,
+            misses INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (name, value) VALUES ('bytes', 0);
+    """
+
+    def __init__(self, path=None, max_bytes=SHARED_CACHE_MAX_BYTES, claim_seconds=120.0, poll_seconds=0.05,
+                 flush_seconds=1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.claim_seconds = claim_seconds
+        self.poll_seconds = poll_seconds
+        self.flush_seconds = flush_seconds
+        self.owner = uuid.uuid4().hex
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counts = Counter()  # (namespace, "hits" | "misses") -> not yet written
+        self._touched = {}  # (namespace, key) -> last access not yet written
+        self._flushed = time.monotonic()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection().executescript(self.SCHEMA)
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def _connection(self):
+        # sqlite3 connections may not be shared across threads or forked processes; keep one per thread.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _write(self, statements):
+        """Run ``statements(connection)`` in one immediate write transaction"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(connection)
+            connection.execute("COMMIT")
+            return result
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    # --- Lookups ---
+    def _peek(self, namespace, key):
+        row = self._connection().execute(
+            "SELECT value FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+        return None if row is None else row[0]
+
+    def get(self, namespace, key):
+        """Stored value or None; counted as a hit or miss"""
+        if not self.enabled:
+            return None
+        value = self._peek(namespace, key)
+        with self._lock:
+            self._counts[(namespace, "misses" if value is None else "hits")] += 1
+            if value is not None:
+                self._touched[(namespace, key)] = time.time()
+            due = time.monotonic() - self._flushed >= self.flush_seconds
+        if due:
+            self.flush()
+        return value
+
+    def put(self, namespace, key, value):
+        if not self.enabled or value is None:
+            return
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        def statements(connection):
+            row = connection.execute(
+                "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, value, size, time.time()))
+            total = connection.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'bytes' RETURNING value",
+                (size - (row[0] if row else 0),)).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Least recently used first, until the total fits again
+            victims, freed = [], 0
+            for victim_namespace, victim_key, victim_size in connection.execute(
+                    "SELECT namespace, key, size FROM entries ORDER BY accessed"):
+                if total - freed <= self.max_bytes:
+                    break
+                victims.append((victim_namespace, victim_key))
+                freed += victim_size
+            connection.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+            connection.execute("UPDATE meta SET value = value - ? WHERE name = 'bytes'", (freed,))
+
+        self._write(statements)
+
+    def get_or_compute(self, namespace, key, compute, lookup=True):
+        """Stored value, else ``compute()`` run by exactly one process and stored for all.
+
+        Pass ``lookup=False`` when the caller has just missed with ``get``.
+        """
+        value = self.get(namespace, key) if lookup else None
+        if value is not None or not self.enabled:
+            return value if value is not None else compute()
+        claimed, value = self.claim_or_wait(namespace, key)
+        if not claimed:
+            return value if value is not None else compute()
+        try:
+            value = compute()
+            self.put(namespace, key, value)
+            return value
+        finally:
+            self.release(namespace, key)
+
+    def claim_or_wait(self, namespace, key, timeout=None):
+        """Claim a missing key for computing it, or wait for the process holding the claim.
+
+        Returns ``(True, None)`` once claimed: the caller computes and puts
+        the value, then calls ``release``. Returns ``(False, value)`` when
+        another process stored it meanwhile, and ``(False, None)`` if none
+        did within ``timeout`` (default ``claim_seconds``).
+        """
+        deadline = time.monotonic() + (self.claim_seconds if timeout is None else timeout)
+        while True:
+            if self._claim(namespace, key):
+                value = self._peek(namespace, key)  # finished between the caller's miss and the claim
+                if value is None:
+                    return True, None
+                self.release(namespace, key)
+                self._count_waited(namespace)
+                return False, value
+            time.sleep(self.poll_seconds)
+            value = self._peek(namespace, key)
+            if value is not None:
+                self._count_waited(namespace)
+                return False, value
+            if time.monotonic() > deadline:
+                return False, None
+
+    def _count_waited(self, namespace):
+        # Served without computing: count the miss that led here as a hit
+        with self._lock:
+            self._counts[(namespace, "misses")] -= 1
+            self._counts[(namespace, "hits")] += 1
+
+    def _claim(self, namespace, key):
+        now = time.time()
+
+        def statements(connection):
+            cursor = connection.execute(
+                "INSERT INTO claims (namespace, key, owner, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE claims.expires < ?",
+                (namespace, key, self.owner, now + self.claim_seconds, now))
+            return cursor.rowcount == 1
+
+        return self._write(statements)
+
+    def release(self, namespace, key):
+        """Give up a claim taken with ``claim_or_wait``"""
+        self._write(lambda connection: connection.execute(
+            "DELETE FROM claims WHERE namespace = ? AND key = ? AND owner = ?", (namespace, key, self.owner)))
+
+    # --- Statistics ---
+    def flush(self):
+        """Write buffered hit/miss counts and access times"""
+        if not self.enabled:
+            return
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            touched, self._touched = self._touched, {}
+            self._flushed = time.monotonic()
+        if not counts and not touched:
+            return
+
+        def statements(connection):
+            for (namespace, field), count in counts.items():
+                connection.execute(
+                    f"INSERT INTO counters (namespace, {field}) VALUES (?, ?) "
+                    f"ON CONFLICT (namespace) DO UPDATE SET {field} = {field} + excluded.{field}",
+                    (namespace, count))
+            connection.executemany(
+                "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                [(accessed, namespace, key) for (namespace, key), accessed in touched.items()])
+
+        self._write(statements)
+
+    def stats(self):
+        """Entries, bytes and per-namespace hits/misses across every process"""
+        if not self.enabled:
+            return {}
+        self.flush()
+        connection = self._connection()
+        namespaces = {}
+        for namespace, hits, misses in connection.execute("SELECT namespace, hits, misses FROM counters"):
+            lookups = hits + misses
+            namespaces[namespace] = {"hits": hits, "misses": misses, "hit_rate": hits / lookups if lookups else 0.0}
+        for namespace, entries in connection.execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace"):
+            namespaces.setdefault(namespace, {"hits": 0, "misses": 0, "hit_rate": 0.0})["entries"] = entries
+        hits = sum(n["hits"] for n in namespaces.values())
+        lookups = hits + sum(n["misses"] for n in namespaces.values())
+        return {
+            "bytes": connection.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0],
+            "max_bytes": self.max_bytes,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "namespaces": namespaces,
+        }
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts.clear()
+            self._touched.clear()
+
+        def statements(connection):
+            # Plain statements: executescript would commit the open transaction itself
+            for statement in ("DELETE FROM entries", "DELETE FROM claims", "DELETE FROM counters",
+                              "UPDATE meta SET value = 0 WHERE name = 'bytes'"):
+                connection.execute(statement)
+
+        self._write(statements)
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("stats", "clear"):
+        sys.exit("usage: python shared_cache.py stats|clear <cache.db>")
+    cache = SharedCache(sys.argv[2])
+    if sys.argv[1] == "clear":
+        cache.clear()
+        print(f"Cleared {sys.argv[2]}")
+    else:
+        stats = cache.stats()
+        print(f"{stats['bytes']:,} of {stats['max_bytes']:,} bytes, hit rate {stats['hit_rate']:.1%}")
+        for namespace, n in sorted(stats["namespaces"].items()):
+            print(f"  {namespace:<10} {n.get('entries', 0):>6,} entries  {n['hits']:>8,} hits  {n['misses']:>8,} misses  ({n['hit_rate']:.1%})")
@@ -0,0 +1,179 @@
+"""Reuse of AI responses across near-identical requests.
+
+The exact-match response cache only helps when a prompt repeats byte for
+byte, but demo timelines rarely do: "Cart Abandoned, SMS Received" and
+"Cart Abandoned, Wishlist Item Added, SMS Received" highlight the same
+journey step and deserve the same recommendation. Each request therefore
+carries a canonical signature: an anchor that must match exactly (request
+kind, persona, highlighted node, ...) and a set of features (distinct
+events, latest event, selected options) compared by Jaccard similarity.
+
+Signatures are indexed with MinHash and locality-sensitive hashing: every
+feature set is reduced to ``num_perm`` minimum hashes, split into bands,
+and stored in one bucket per band, so a lookup only compares against
+entries sharing at least one band. Candidates are then verified with their
+exact Jaccard similarity against ``threshold``.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+# --- Signatures ---
+def request_signature(kind, persona, exact=(), events=(), latest=None, options=()):
+    """Canonical signature of an AI request.
+
+    ``exact`` values must match for a response to be reused; ``events``
+    (distinct, order ignored), ``latest`` and ``options`` (name, value)
+    pairs form the feature set compared by similarity.
+    """
+    features = {f"event:{event.strip().lower()}" for event in events}
+    if latest:
+        features.add(f"latest:{latest.strip().lower()}")
+    features.update(f"{name}:{value}" for name, value in options)
+    return {"anchor": (kind, persona, *exact), "features": frozenset(features)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _feature_hashes(features):
+    return np.array([int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=4).digest(), "little")
+                     for f in sorted(features)], dtype=np.uint64)
+
+
+def _band_layout(threshold, num_perm):
+    """(bands, rows) whose LSH S-curve best separates pairs around ``threshold``.
+
+    Minimizes the probability mass of false negatives above the threshold
+    plus false positives below it, weighting misses fourfold since candidates
+    are verified exactly anyway.
+    """
+    grid = np.linspace(0.0, 1.0, 201)
+    best = None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        hit = 1 - (1 - grid ** rows) ** bands
+        false_positive = np.trapezoid(np.where(grid < threshold, hit, 0), grid)
+        false_negative = np.trapezoid(np.where(grid >= threshold, 1 - hit, 0), grid)
+        error = false_positive + 4 * false_negative
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+
+# --- Index ---
+class SimilarResponseIndex:
+    """Thread-safe LSH index from request signatures to response text.
+
+    Entries are evicted least recently used beyond ``max_entries``; zero
+    disables the index.
+    """
+
+    def __init__(self, threshold=0.6, max_entries=1024, num_perm=64, seed=1):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands, self.rows = _band_layout(threshold, num_perm)
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)[:, None]
+        self.lookups = 0
+        self.hits = 0
+        self._entries = OrderedDict()  # id -> (anchor, features, text, bucket keys)
+        self._buckets = {}  # (anchor, band, band digest) -> set of ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def minhash(self, features):
+        """``num_perm`` minimum hashes of a feature set"""
+        if not features:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # Universal hashing (a * x + b) mod p; uint64 products wrap, which keeps them well mixed
+        hashed = (self._a * _feature_hashes(features)[None, :] + self._b) % MERSENNE_PRIME & MAX_HASH
+        return hashed.min(axis=1)
+
+    def _bucket_keys(self, anchor, features):
+        signature = self.minhash(features)
+        return [(anchor, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def get(self, signature, scope=()):
+        """(text, similarity) of the most similar stored response, or None"""
+        if not self.enabled:
+            return None
+        anchor = (*scope, *signature["anchor"])
+        features = signature["features"]
+        keys = self._bucket_keys(anchor, features)
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for key in keys:
+                candidates.update(self._buckets.get(key, ()))
+            best = None
+            for entry_id in candidates:
+                similarity = jaccard(features, self._entries[entry_id][1])
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (entry_id, similarity)
+            if best is None:
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best[0])
+            return self._entries[best[0]][2], best[1]
+
+    def put(self, signature, text, scope=()):
+        if not self.enabled or not text:
+            return
+        anchor = (*scope, *signature["anchor"])
+        features = signature["features"]
+        keys = self._bucket_keys(anchor, features)
+        with self._lock:
+            # A fresh answer for an identical feature set replaces the old one
+            for entry_id in set().union(*(self._buckets.get(key, ()) for key in keys)):
+                if self._entries[entry_id][1] == features:
+                    self._remove(entry_id)
+            entry_id, self._next_id = self._next_id, self._next_id + 1
+            self._entries[entry_id] = (anchor, features, text, keys)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id):
+        for key in self._entries.pop(entry_id)[3]:
+            bucket = self._buckets[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "threshold": self.threshold,
+                "bands": self.bands,
+                "rows": self.rows,
+            }
+
+
+similar_responses = SimilarResponseIndex(
+    threshold=float(os.environ.get("LLM_REUSE_THRESHOLD", 0.6)),
+    max_entries=int(os.environ.get("LLM_REUSE_MAX_ENTRIES", 1024)),
+)
@@ -0,0 +1,153 @@
+"""Cold-start profiling and boot-time warm-up.
+
+Streamlit only executes app.py when the first session connects, so on a
+fresh instance that visitor pays for importing every module, loading the
+catalogs, compiling journeys and building diagram HTML. ``profile`` times
+each of those steps in a new process and prints the breakdown; ``serve``
+runs the warm-up steps and then starts Streamlit in the same process, so
+the module-level caches are already populated when the first session
+arrives and the instance can be put behind the load balancer warm.
+
+    python startup.py profile
+    python startup.py serve --server.port 8501 --server.headless true
+"""
+
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(BASE_DIR, "app.py")
+
+# Modules app.py imports on its first run, dependencies before the modules importing them
+APP_MODULES = [
+    "streamlit", "numpy", "catalog", "journeys", "diagrams", "event_store", "journey_state",
+    "metrics", "scheduler", "shared_cache", "similarity", "llm", "personas", "prompts", "session_store", "simulator",
+    "sweep", "timeline",
+]
+
+
+# --- Warm-up Steps ---
+def warm_catalogs():
+    from catalog import get_catalog
+    from personas import get_persona_catalog
+    get_catalog()
+    persona_catalog = get_persona_catalog()
+    # Large catalogs load persona detail on demand; only the built-in set is preloaded
+    names = persona_catalog.names(limit=50)
+    for name in names:
+        persona_catalog.load(name)
+    return f"{len(names)} personas"
+
+
+def warm_journeys():
+    from journeys import JOURNEY_SPECS, get_journey
+    from simulator import journey_stages
+    for persona in JOURNEY_SPECS:
+        get_journey(persona)
+        journey_stages(persona)
+    return f"{len(JOURNEY_SPECS)} journeys"
+
+
+def warm_diagrams():
+    from diagrams import diagram_html, get_svg, highlight_states, mermaid_script_tag
+    from journeys import JOURNEY_SPECS
+    built = rendered = 0
+    for persona in JOURNEY_SPECS:
+        for highlight_node in highlight_states(persona):
+            diagram_html(persona, highlight_node)
+            built += 1
+            rendered += get_svg(persona, highlight_node) is not None
+    mermaid_script_tag()
+    return f"{built} diagram pages, {rendered} pre-rendered SVGs"
+
+
+def warm_llm():
+    # app sessions import openai lazily; at boot nobody is waiting for it
+    import openai
+    from llm import get_client
+    from prompts import count_tokens
+    count_tokens("warm up")  # loads the tokenizer
+    api_key = os.environ.get("OPENAI_API_KEY", "")
+    if not api_key:
+        return "openai, tokenizer (no OPENAI_API_KEY for the client)"
+    get_client(api_key)  # builds the connection pool
+    return "openai, tokenizer, client"
+
+
+def warm_page():
+    # One headless run of the page exercises Streamlit's own first-run code
+    # paths (element builders, component registration, script compilation)
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"Warm-up run of app.py failed: {app.exception[0].message}")
+    return "one headless script run"
+
+
+WARM_UP_STEPS = [
+    ("catalogs", warm_catalogs),
+    ("journeys", warm_journeys),
+    ("diagrams", warm_diagrams),
+    ("llm", warm_llm),
+    ("page", warm_page),
+]
+
+
+def warm_up(steps=WARM_UP_STEPS):
+    """Run every warm-up step; returns [(name, seconds, detail)]"""
+    timings = []
+    for name, step in steps:
+        started = time.perf_counter()
+        detail = step()
+        timings.append((name, time.perf_counter() - started, detail))
+    return timings
+
+
+# --- Profiling ---
+def import_modules(modules=APP_MODULES):
+    """Import each module in turn; returns [(module, seconds)] of the newly imported ones"""
+    sys.path.insert(0, BASE_DIR)
+    timings = []
+    for module in modules:
+        if module in sys.modules:
+            continue
+        started = time.perf_counter()
+        __import__(module)
+        timings.append((module, time.perf_counter() - started))
+    return timings
+
+
+def print_report(imports, steps, openai_on_import):
+    total_imports = sum(seconds for _, seconds in imports)
+    total_steps = sum(seconds for _, seconds, _ in steps)
+    print(f"Imports: {total_imports * 1000:,.0f} ms")
+    for module, seconds in sorted(imports, key=lambda item: -item[1]):
+        print(f"  {module:<16} {seconds * 1000:8.1f} ms")
+    print(f"Warm-up: {total_steps * 1000:,.0f} ms")
+    for name, seconds, detail in steps:
+        print(f"  {name:<16} {seconds * 1000:8.1f} ms  {detail}")
+    print(f"openai imported with the app modules: {'yes' if openai_on_import else 'no (deferred to the first AI request)'}")
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "profile"
+    if command == "profile":
+        imports = import_modules()
+        openai_on_import = "openai" in sys.modules
+        print_report(imports, warm_up(), openai_on_import)
+    elif command == "serve":
+        started = time.perf_counter()
+        import_modules()
+        warm_up()
+        print(f"Warmed up in {time.perf_counter() - started:.2f} s; starting Streamlit", flush=True)
+        from streamlit.web import cli
+        sys.argv = ["streamlit", "run", APP_PATH, *sys.argv[2:]]
+        cli.main(prog_name="streamlit")
+    else:
+        sys.exit(f"Unknown command {command!r}; use profile or serve")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Parameter sweep over journey wait times and channel order.
+
+Every candidate journey (one duration per wait node, one ordering of the
+action channels) is scored with the Monte Carlo simulator on common random
+numbers: the per-user uniforms are drawn once and placed in shared memory, so
+worker processes read them without copying and every candidate sees the same
+synthetic users. Candidates are spread over a process pool and results are
+appended to a JSON-lines checkpoint as they finish, so an interrupted sweep
+resumes where it stopped. The answer is the Pareto front of conversion rate
+(higher is better) against mean time to convert (lower is better).
+
+    python sweep.py GlowSkin --users 200000 --checkpoint sweeps/GlowSkin.jsonl
+    python sweep.py PulseFit --wait-options 12 24 72 168 --samples 500
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from journeys import WAIT, get_journey
+from simulator import journey_stages, simulate_journey
+
+DEFAULT_WAIT_OPTIONS = (1, 2, 4, 6, 12, 24, 48, 72, 168)
+QUICK_WAIT_OPTIONS = (2, 6, 24, 48, 168)  # small enough to sweep interactively
+DEFAULT_RESPONSE_HOURS = 12.0
+DEFAULT_USERS = 200_000
+
+
+# --- Candidates ---
+def wait_nodes(persona):
+    journey = get_journey(persona)
+    return [journey.ids[i] for i, kind in enumerate(journey.kinds) if kind == WAIT]
+
+
+def candidate_grid(persona, wait_options=DEFAULT_WAIT_OPTIONS, reorder_channels=True, samples=None, seed=0):
+    """Candidate (wait hours by node, channel order) pairs for a persona.
+
+    The full grid is every wait option at every wait node crossed with every
+    permutation of the journey's channels; ``samples`` draws a random subset.
+    """
+    nodes = wait_nodes(persona)
+    channels = journey_stages(persona)["channels"]
+    orders = sorted(set(itertools.permutations(channels))) if reorder_channels else [tuple(channels)]
+    grid = [
+        (tuple(zip(nodes, waits)), order)
+        for waits in itertools.product(wait_options, repeat=len(nodes))
+        for order in orders
+    ]
+    if samples and samples < len(grid):
+        grid = random.Random(seed).sample(grid, samples)
+    return grid
+
+
+def candidate_key(candidate):
+    waits, order = candidate
+    return json.dumps([[list(pair) for pair in waits], list(order)])
+
+
+# --- Workers ---
+_worker = {}
+
+
+def _attach(shm_name, n_users, persona, conversion_rates, response_hours):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker.update(
+        shm=shm,  # keep the mapping alive for the life of the worker
+        uniforms=np.ndarray((n_users,), dtype=np.float64, buffer=shm.buf),
+        persona=persona,
+        conversion_rates=conversion_rates,
+        response_hours=response_hours,
+    )
+
+
+def _evaluate(candidate):
+    waits, order = candidate
+    uniforms = _worker["uniforms"]
+    result = simulate_journey(_worker["persona"], len(uniforms), _worker["conversion_rates"], dict(waits),
+                              list(order), uniforms=uniforms, response_hours=_worker["response_hours"])
+    return {
+        "key": candidate_key(candidate),
+        "wait_hours": dict(waits),
+        "channel_order": list(order),
+        "conversion_rate": result["conversion_rate"],
+        "mean_hours": result["time_to_convert"]["mean_hours"],
+        "p50_hours": result["time_to_convert"]["p50_hours"],
+        "p90_hours": result["time_to_convert"]["p90_hours"],
+        "touches_per_user": result["touches_per_user"],
+    }
+
+
+# --- Pareto Front ---
+def pareto_front(results):
+    """Results not beaten on both conversion rate and mean time to convert"""
+    front, best_rate = [], -1.0
+    for result in sorted(results, key=lambda r: (r["mean_hours"], -r["conversion_rate"])):
+        if result["conversion_rate"] > best_rate:
+            front.append(result)
+            best_rate = result["conversion_rate"]
+    return front
+
+
+def describe_candidate(result):
+    waits = " · ".join(f"{node} {hours:g}h" for node, hours in result["wait_hours"].items())
+    return f"{waits}; {' → '.join(result['channel_order'])}"
+
+
+def describe_front(front, limit=5):
+    """Plain-text summary of the best trade-offs, fastest first"""
+    if not front:
+        return "No sweep results."
+    step = max(1, len(front) // limit)
+    picks = front[::step][:limit - 1] + [front[-1]] if len(front) > limit else front
+    return "\n".join(
+        f"- {describe_candidate(r)}: {r['conversion_rate']:.1%} convert, mean {r['mean_hours']:.1f} hours to convert"
+        for r in picks
+    )
+
+
+# --- Sweep ---
+def _load_checkpoint(path, config):
+    results = {}
+    if not path or not os.path.exists(path):
+        return results
+    lines = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                lines.append(json.loads(line))
+            except ValueError:
+                pass  # a line torn by an interrupted run; that candidate is simply redone
+    if lines and lines[0].get("config") != config:
+        raise ValueError(f"{path} was written by a sweep with different settings; use another checkpoint file")
+    for record in lines[1:]:
+        results[record["key"]] = record
+    return results
+
+
+def run_sweep(persona, candidates=None, n_users=DEFAULT_USERS, conversion_rates=None,
+              response_hours=DEFAULT_RESPONSE_HOURS, workers=None, checkpoint=None, seed=42, progress=None):
+    """Score candidates across a process pool and return results and the Pareto front.
+
+    With ``checkpoint`` set, results already in the file are reused and new
+    ones are appended as they complete. ``progress(done, total)`` is called
+    as results arrive.
+    """
+    candidates = candidate_grid(persona) if candidates is None else candidates
+    conversion_rates = dict(conversion_rates or {})
+    config = {"persona": persona, "users": n_users, "conversion_rates": conversion_rates,
+              "response_hours": response_hours, "seed": seed}
+    results = _load_checkpoint(checkpoint, config)
+    todo = [c for c in candidates if candidate_key(c) not in results]
+    resumed = len(candidates) - len(todo)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+
+    started = time.perf_counter()
+    out = None
+    if checkpoint:
+        os.makedirs(os.path.dirname(os.path.abspath(checkpoint)), exist_ok=True)
+        size = os.path.getsize(checkpoint) if os.path.exists(checkpoint) else 0
+        if size:
+            with open(checkpoint, "rb") as f:
+                f.seek(size - 1)
+                torn = f.read(1) != b"\n"
+        out = open(checkpoint, "a", encoding="utf-8")
+        if not size:
+            out.write(json.dumps({"config": config}) + "\n")
+        elif torn:
+            out.write("\n")
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n_users) * 8)
+    uniforms = np.ndarray((n_users,), dtype=np.float64, buffer=shm.buf)
+    done = resumed
+
+    def record(result):
+        nonlocal done
+        results[result["key"]] = result
+        if out:
+            out.write(json.dumps(result) + "\n")
+        done += 1
+        if progress:
+            progress(done, len(candidates))
+
+    try:
+        uniforms[:] = np.random.default_rng(seed).random(n_users)
+        initargs = (shm.name, n_users, persona, conversion_rates, response_hours)
+        if workers == 1:
+            _worker.update(uniforms=uniforms, persona=persona, conversion_rates=conversion_rates,
+                           response_hours=response_hours)
+            try:
+                for candidate in todo:
+                    record(_evaluate(candidate))
+            finally:
+                _worker.clear()
+        elif todo:
+            chunksize = max(1, len(todo) // (workers * 16))
+            # Spawned workers import only this module, which is safe from threaded hosts like Streamlit
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(workers, initializer=_attach, initargs=initargs) as pool:
+                for result in pool.imap_unordered(_evaluate, todo, chunksize=chunksize):
+                    record(result)
+    finally:
+        del uniforms  # the buffer cannot be closed while an array still views it
+        shm.close()
+        shm.unlink()
+        if out:
+            out.close()
+
+    keys = {candidate_key(c) for c in candidates}
+    scored = [r for key, r in results.items() if key in keys]
+    return {
+        "persona": persona,
+        "candidates": len(candidates),
+        "evaluated": len(todo),
+        "resumed": resumed,
+        "workers": workers,
+        "elapsed_s": time.perf_counter() - started,
+        "results": scored,
+        "front": pareto_front(scored),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("persona")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="synthetic users per candidate")
+    parser.add_argument("--wait-options", type=float, nargs="+", default=DEFAULT_WAIT_OPTIONS, help="hours to try at each wait")
+    parser.add_argument("--keep-channel-order", action="store_true", help="only sweep wait times")
+    parser.add_argument("--samples", type=int, help="evaluate a random subset of the grid")
+    parser.add_argument("--response-hours", type=float, default=DEFAULT_RESPONSE_HOURS, help="mean response time to a touch")
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--checkpoint", help="JSON-lines file to resume from and append to")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    candidates = candidate_grid(args.persona, args.wait_options, not args.keep_channel_order, args.samples, args.seed)
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"\r{done}/{total} candidates", end="", file=sys.stderr, flush=True)
+
+    try:
+        sweep = run_sweep(args.persona, candidates, args.users, response_hours=args.response_hours,
+                          workers=args.workers, checkpoint=args.checkpoint, seed=args.seed, progress=progress)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(file=sys.stderr)
+    print(f"{sweep['persona']}: {sweep['evaluated']} candidates evaluated, {sweep['resumed']} resumed, "
+          f"{sweep['workers']} workers, {sweep['elapsed_s']:.1f} s")
+    print(f"Pareto front ({len(sweep['front'])} configurations):")
+    for result in sweep["front"]:
+        print(f"  {result['conversion_rate']:6.1%}  mean {result['mean_hours']:6.1f} h  {describe_candidate(result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from event_store import EventStore
+
+SESSIONS = ["a" * 32, "b" * 32, "c" * 32]
+
+
+def fill(store, rows, flush_every=None):
+    for i in range(rows):
+        persona = "GlowSkin" if i % 3 else "PulseFit"
+        store.append(persona, f"event {i % 4}", "ABC"[i % 3], SESSIONS[i % 3], timestamp=i)
+        if flush_every and i % flush_every == flush_every - 1:
+            store.flush()
+
+
+@pytest.mark.parametrize("on_disk", [False, True])
+def test_queries_count_segments_and_buffer_alike(tmp_path, on_disk):
+    store = EventStore(str(tmp_path) if on_disk else None, flush_rows=10 ** 6)
+    fill(store, 300, flush_every=100)
+    fill(store, 30)  # still buffered
+
+    assert len(store) == 330
+    assert store.stats()["segments"] == 3
+    assert store.stats()["buffered_rows"] == 30
+    events = store.frequency("event")
+    assert sum(events.values()) == 330
+    assert list(events.values()) == sorted(events.values(), reverse=True)
+    assert sum(store.frequency("event", persona="GlowSkin").values()) == 220
+    assert store.frequency(("persona", "node"))[("PulseFit", "A")] == 110
+    assert store.frequency("event", persona="Unknown") == {}
+    assert store.funnel("GlowSkin") == {"B": 1, "C": 1}
+
+
+def test_compaction_merges_small_segments(tmp_path):
+    store = EventStore(str(tmp_path), compact_segments=4)
+    fill(store, 400, flush_every=50)
+
+    assert store.compact()
+    assert store.stats()["segments"] == 1
+    assert len(store) == 400
+    assert sorted(entry for entry in os.listdir(tmp_path) if entry.startswith("seg-")) == ["seg-000008"]
+
+
+def test_store_reopens_from_its_manifest(tmp_path):
+    store = EventStore(str(tmp_path))
+    fill(store, 120)
+    store.flush()
+
+    reopened = EventStore(str(tmp_path))
+    assert len(reopened) == 120
+    assert reopened.frequency("event") == store.frequency("event")
+
+
+def test_in_memory_retention_keeps_exactly_the_newest_rows():
+    store = EventStore(max_rows=250)
+    fill(store, 1000, flush_every=100)
+
+    assert len(store) == 250
+    assert store.stats()["dropped_rows"] == 750
+    assert min(int(columns["timestamp"].min()) for _, columns in store._segments) == 750
+
+
+def test_on_disk_retention_drops_whole_segments(tmp_path):
+    store = EventStore(str(tmp_path), max_rows=250, compact_segments=100)
+    fill(store, 1000, flush_every=100)
+
+    assert len(store) == 300  # the oldest kept segment straddles the cap
+    assert sorted(entry for entry in os.listdir(tmp_path) if entry.startswith("seg-")) == \
+        ["seg-000007", "seg-000008", "seg-000009"]
+    assert len(EventStore(str(tmp_path))) == 300
@@ -0,0 +1,62 @@
+import random
+
+from catalog import get_catalog
+from journey_state import JourneyState, path_costs
+from journeys import JOURNEY_SPECS, get_journey
+
+
+def state(persona="GlowSkin"):
+    return JourneyState(persona, get_catalog()["event_to_node_map"][persona])
+
+
+def test_path_costs_count_touches_and_waits_along_the_path():
+    journey = get_journey("GlowSkin")
+    costs = path_costs(journey)
+    index = journey.index
+
+    assert costs[index["A"]][index["E"]] == (0, 2.0)  # trigger, wait 2 hours, decision
+    assert costs[index["E"]][index["H"]] == (1, 4.0)  # SMS, wait 4 hours, decision
+    assert costs[index["A"]][index["L"]] == (3, 54.0)  # the whole "No" path
+    assert costs[index["A"]][index["D"]] == (0, 2.0)  # shortest way to the purchase exit
+    assert index["A"] not in costs[index["L"]]  # no way back from an exit
+
+
+def test_events_advance_the_customer_along_the_journey():
+    journey_state = state()
+    for event in ["Cart Abandoned", "SMS Received", "Email Opened", "Push Notification Ignored"]:
+        journey_state.advance(event)
+
+    assert journey_state.node == "L"
+    assert (journey_state.touches, journey_state.hours) == (3, 54.0)
+    assert journey_state.entries == 1
+    assert journey_state.describe() == "3 touches sent, 2.2 days of journey time elapsed over 4 events"
+
+
+def test_customer_reenters_at_the_trigger_after_an_exit():
+    journey_state = state().replay(["Cart Abandoned", "Discount Code Used", "SMS Received"])
+
+    assert journey_state.node == "H"
+    assert journey_state.entries == 2
+    # E -> D via the SMS and its 4 hour wait, then A -> H anew: SMS again, 2 + 4 hours
+    assert (journey_state.touches, journey_state.hours) == (2, 12.0)
+
+
+def test_unmapped_events_keep_the_current_node():
+    journey_state = state().replay(["Cart Abandoned", "Not A Catalog Event"])
+
+    assert journey_state.node == "E"
+    assert journey_state.events == 2
+    assert journey_state.last_event == "Not A Catalog Event"
+
+
+def test_incremental_advance_matches_a_full_replay():
+    rng = random.Random(4)
+    for persona in JOURNEY_SPECS:
+        events = list(get_catalog()["event_to_node_map"][persona])
+        timeline = [rng.choice(events) for _ in range(200)]
+        incremental = state(persona)
+        for n, event in enumerate(timeline, 1):
+            incremental.advance(event)
+            replayed = state(persona).replay(timeline[:n])
+            assert (incremental.node, incremental.touches, incremental.hours, incremental.entries) == \
+                (replayed.node, replayed.touches, replayed.hours, replayed.entries)
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import RequestScheduler, TokenBucket
+
+
+def coalesce(scheduler, fn, callers=8):
+    """Run ``fn`` under one key from several threads at once; returns each caller's result or error"""
+    outcomes = [None] * callers
+    started = threading.Barrier(callers)
+
+    def caller(i):
+        started.wait()
+        try:
+            outcomes[i] = scheduler.run("same prompt", fn, timeout=10)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return outcomes
+
+
+def test_coalesced_callers_share_one_upstream_call():
+    scheduler = RequestScheduler()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.2)
+        return "answer"
+
+    assert coalesce(scheduler, upstream) == ["answer"] * 8
+    assert len(calls) == 1
+    assert scheduler.stats()["coalesced"] == 7
+
+
+def test_coalesced_callers_share_the_leaders_error():
+    scheduler = RequestScheduler(max_retries=0)
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError("bad request")
+
+    outcomes = coalesce(scheduler, upstream)
+
+    assert len(calls) == 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert scheduler.stats()["in_flight_keys"] == 0
+    assert scheduler.run("same prompt", lambda: "retried later") == "retried later"
+
+
+def test_interrupted_leader_releases_its_waiters():
+    scheduler = RequestScheduler()
+    outcomes = {}
+
+    def upstream():
+        while not scheduler.stats()["coalesced"]:  # until the follower has joined
+            time.sleep(0.01)
+        raise KeyboardInterrupt
+
+    def leader():
+        try:
+            scheduler.run("prompt", upstream)
+        except KeyboardInterrupt as e:
+            outcomes["leader"] = e
+
+    def follower():
+        while not scheduler.stats()["in_flight_keys"]:
+            time.sleep(0.01)
+        try:
+            scheduler.run("prompt", lambda: "never called", timeout=5)
+        except Exception as e:
+            outcomes["follower"] = e
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=follower)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert isinstance(outcomes["leader"], KeyboardInterrupt)
+    assert isinstance(outcomes["follower"], RuntimeError)
+    assert scheduler.stats()["in_flight_keys"] == 0
+
+
+def test_transient_errors_are_retried():
+    scheduler = RequestScheduler(max_retries=3, base_delay=0.001)
+    attempts = []
+
+    class RateLimitError(Exception):
+        pass
+
+    def upstream():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError()
+        return "answer"
+
+    assert scheduler.run("prompt", upstream) == "answer"
+    assert scheduler.stats()["retries"] == 2
+
+
+def test_token_bucket_limits_the_request_rate():
+    bucket = TokenBucket(rate_per_minute=600, burst=2)  # 10 per second after a burst of 2
+    started = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+
+    assert time.monotonic() - started == pytest.approx(0.5, abs=0.15)
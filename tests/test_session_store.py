@@ -0,0 +1,37 @@
+import threading
+
+from session_store import SessionStore
+
+
+def test_evicted_sessions_come_back_from_disk(tmp_path):
+    store = SessionStore(max_sessions=2, spill_dir=str(tmp_path), sweep_interval=1e9)
+    for i in range(5):
+        store.set(f"s{i}", "answer", f"answer {i} " * 50)
+
+    assert store.stats()["evictions"] == 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["s0.json.gz", "s1.json.gz", "s2.json.gz"]
+    restarted = SessionStore(max_sessions=10, spill_dir=str(tmp_path))
+    assert restarted.get("s0", "answer") == "answer 0 " * 50
+    for i in range(1, 5):
+        assert store.get(f"s{i}", "answer") == f"answer {i} " * 50
+
+
+def test_concurrent_sessions_keep_their_slots_through_spills(tmp_path):
+    store = SessionStore(max_sessions=3, spill_dir=str(tmp_path), sweep_interval=1e9)
+    lost = []
+
+    def visitor(n):
+        for i in range(200):
+            key = f"s{(n + i) % 8}"
+            store.set(key, f"slot{n}", f"text {n}")
+            if store.get(key, f"slot{n}") != f"text {n}":
+                lost.append((n, key))
+
+    threads = [threading.Thread(target=visitor, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert lost == []
+    assert store.stats()["evictions"] > 0
@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+
+from shared_cache import SharedCache
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fill(cache):
+    for i in range(10):
+        cache.put("llm", f"k{i}", f"answer {i}")
+    cache.get("llm", "k0")
+    cache.get("llm", "missing")
+    cache.put("diagram", "d0", "<html></html>")
+
+
+def assert_empty(cache):
+    stats = cache.stats()
+    assert stats["bytes"] == 0
+    assert stats["namespaces"] == {}
+    assert cache.get("llm", "k0") is None
+
+
+def test_clear_empties_the_cache(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    fill(cache)
+    stats = cache.stats()
+    assert stats["bytes"] > 0
+    assert stats["namespaces"]["llm"]["entries"] == 10
+    assert stats["namespaces"]["llm"]["hits"] == 1
+
+    cache.clear()
+
+    assert_empty(cache)
+    cache.put("llm", "k0", "after clear")
+    assert cache.get("llm", "k0") == "after clear"
+
+
+def test_clear_command(tmp_path):
+    path = str(tmp_path / "cache.db")
+    fill(SharedCache(path))
+
+    subprocess.run([sys.executable, os.path.join(BASE_DIR, "shared_cache.py"), "clear", path], check=True)
+
+    assert_empty(SharedCache(path))
+
+
+# --- Streamed completions ---
+class FakeClient:
+    """OpenAI client stand-in streaming a fixed answer word by word"""
+
+    def __init__(self, calls):
+        self.calls = calls
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, stream=False, **kwargs):
+        self.calls.append(kwargs)
+        return iter([
+            types.SimpleNamespace(choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=word))])
+            for word in ("streamed ", "answer")
+        ])
+
+
+def stream_setup(tmp_path, monkeypatch, prompt):
+    import llm
+    cache = SharedCache(str(tmp_path / "cache.db"), poll_seconds=0.01)
+    calls = []
+    monkeypatch.setattr(llm, "shared_cache", cache)
+    monkeypatch.setattr(llm, "get_client", lambda api_key: FakeClient(calls))
+    key = llm.cache_key(llm.DEFAULT_MODEL, "system", prompt, 500, llm.DEFAULT_TEMPERATURE)
+    return llm, cache, calls, key
+
+
+def test_stream_stores_its_answer_for_other_processes(tmp_path, monkeypatch):
+    llm, cache, calls, key = stream_setup(tmp_path, monkeypatch, "prompt stored for others")
+
+    text = "".join(llm.CompletionStream("key", "prompt stored for others", "system"))
+
+    assert text == "streamed answer"
+    assert len(calls) == 1
+    other = SharedCache(cache.path)  # another replica
+    assert other.claim_or_wait("llm", key) == (False, "streamed answer")
+
+
+def test_stream_waits_for_another_process_streaming_the_same_prompt(tmp_path, monkeypatch):
+    llm, cache, calls, key = stream_setup(tmp_path, monkeypatch, "prompt streamed elsewhere")
+    other = SharedCache(cache.path)  # another replica, already streaming this prompt
+    assert other.claim_or_wait("llm", key) == (True, None)
+
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(
+        text="".join(llm.CompletionStream("key", "prompt streamed elsewhere", "system", timeout=10))))
+    thread.start()
+    time.sleep(0.2)
+    assert thread.is_alive()
+    other.put("llm", key, "answer from the other replica")
+    other.release("llm", key)
+    thread.join(10)
+
+    assert result["text"] == "answer from the other replica"
+    assert calls == []
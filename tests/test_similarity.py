@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+
+from similarity import SimilarResponseIndex, jaccard, request_signature
+
+
+def signature(features, persona="GlowSkin"):
+    return {"anchor": ("event_suggestion", persona), "features": frozenset(features)}
+
+
+def near_duplicates(n, size=20, changed=2, seed=0):
+    """``n`` (stored, query) feature set pairs differing in ``changed`` features (Jaccard 18/22)"""
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(n):
+        stored = [f"event:{i}-{k}" for k in range(size)]
+        query = stored[changed:] + [f"event:{i}-new-{k}" for k in range(changed)]
+        rng.shuffle(query)
+        pairs.append((stored, query))
+    return pairs
+
+
+def test_near_duplicate_prompts_are_recalled():
+    index = SimilarResponseIndex(threshold=0.6, max_entries=1000)
+    pairs = near_duplicates(500)
+    for i, (stored, _) in enumerate(pairs):
+        index.put(signature(stored), f"answer {i}")
+
+    found = [index.get(signature(query)) for _, query in pairs]
+
+    recalled = sum(hit is not None and hit[0] == f"answer {i}" for i, hit in enumerate(found))
+    assert recalled / len(pairs) >= 0.98
+    assert all(hit[1] == jaccard(frozenset(stored), frozenset(query))
+               for hit, (stored, query) in zip(found, pairs) if hit)
+
+
+def test_dissimilar_prompts_are_never_served():
+    index = SimilarResponseIndex(threshold=0.6)
+    index.put(signature([f"event:{k}" for k in range(10)]), "answer")
+
+    assert index.get(signature([f"event:{k}" for k in range(5, 15)])) is None  # Jaccard 1/3
+    assert index.get(signature([f"event:{k}" for k in range(10)], persona="PulseFit")) is None
+    assert index.get(signature([f"event:{k}" for k in range(10)]), scope=("other model",)) is None
+
+
+def test_minhash_estimates_jaccard_similarity():
+    index = SimilarResponseIndex(num_perm=256)
+    a = frozenset(f"f{k}" for k in range(100))
+    b = frozenset(f"f{k}" for k in range(30, 130))  # Jaccard 70/130
+
+    estimate = float(np.mean(index.minhash(a) == index.minhash(b)))
+
+    assert abs(estimate - jaccard(a, b)) < 0.1
+
+
+def test_least_recently_used_entries_are_evicted():
+    index = SimilarResponseIndex(max_entries=2)
+    for name in ("first", "second"):
+        index.put(signature([name]), name)
+    index.get(signature(["first"]))
+    index.put(signature(["third"]), "third")
+
+    assert index.get(signature(["second"])) is None
+    assert index.get(signature(["first"]))[0] == "first"
+    assert index.stats()["entries"] == 2
+
+
+def test_request_signature_ignores_event_order_and_case():
+    a = request_signature("event_suggestion", "GlowSkin", events=["Cart Abandoned", "Email Opened"])
+    b = request_signature("event_suggestion", "GlowSkin", events=["email opened ", "cart abandoned"])
+
+    assert a == b
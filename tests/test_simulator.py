@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from journeys import JOURNEY_SPECS, STANDARD_EDGES, register_journey
+from simulator import journey_stages, simulate_journey
+
+
+@pytest.mark.parametrize("persona", list(JOURNEY_SPECS))
+def test_funnel_totals_equal_the_number_of_users(persona):
+    result = simulate_journey(persona, n_users=200_000, seed=7)
+    stages = journey_stages(persona)
+    funnel = result["funnel"]
+
+    assert funnel[stages["trigger"]] == 200_000
+    assert funnel[stages["success_exit"]] + funnel[stages["failure_exit"]] == 200_000
+    assert sum(result["conversions_by_decision"].values()) == funnel[stages["success_exit"]]
+    assert result["touches_distribution"].sum() == 200_000
+
+
+def test_users_convert_at_the_configured_rates():
+    result = simulate_journey("GlowSkin", n_users=1_000_000, seed=3, conversion_rates={"Organic": 0.2})
+    first = journey_stages("GlowSkin")["decisions"][0]
+
+    assert result["conversions_by_decision"][first] / 1_000_000 == pytest.approx(0.2, abs=0.002)
+
+
+def test_common_random_numbers_give_identical_results():
+    uniforms = np.random.default_rng(0).random(50_000)
+    a = simulate_journey("PulseFit", n_users=50_000, uniforms=uniforms)
+    b = simulate_journey("PulseFit", n_users=50_000, uniforms=uniforms)
+
+    assert a["funnel"] == b["funnel"]
+
+
+@pytest.mark.parametrize("edges, message", [
+    ([e for e in STANDARD_EDGES if e != ("C", "D", "Yes")], "no 'Yes' edge"),
+    ([e for e in STANDARD_EDGES if e != ("J", "K", "No")] + [("J", "E", "No")], "loops back"),
+    ([e for e in STANDARD_EDGES if e != ("K", "L", "")], "without an exit"),
+])
+def test_invalid_journey_graphs_raise(edges, message):
+    register_journey("Broken", dict(JOURNEY_SPECS["GlowSkin"], edges=edges))
+
+    with pytest.raises(ValueError, match=message):
+        journey_stages("Broken")
@@ -0,0 +1,27 @@
+import ast
+import os
+
+from startup import APP_MODULES, BASE_DIR
+
+
+def local_imports(module):
+    """Top-level project modules imported by a module"""
+    with open(os.path.join(BASE_DIR, f"{module}.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return {name for name in names if os.path.exists(os.path.join(BASE_DIR, f"{name}.py"))}
+
+
+def test_app_modules_cover_every_module_app_imports():
+    seen, pending = set(), ["app"]
+    while pending:
+        for name in local_imports(pending.pop()) - seen:
+            seen.add(name)
+            pending.append(name)
+
+    assert sorted(seen - set(APP_MODULES)) == []
@@ -0,0 +1,55 @@
+from timeline import EventTimeline
+
+
+def test_ring_buffer_drops_the_oldest_events_and_their_counts():
+    timeline = EventTimeline(max_events=3)
+    for event in ["Cart Abandoned", "Email Opened", "Email Opened", "SMS Clicked", "Purchase"]:
+        timeline.append(event, timestamp=0)
+
+    assert list(timeline) == ["Email Opened", "SMS Clicked", "Purchase"]
+    assert len(timeline) == 3
+    assert timeline.total == 5
+    assert timeline.dropped == 2
+    assert "Cart Abandoned" not in timeline
+    assert timeline.count("Email Opened") == 1
+    assert timeline.counts() == {"Email Opened": 1, "SMS Clicked": 1, "Purchase": 1}
+    assert timeline.distinct() == 3
+
+
+def test_counts_match_the_retained_events_after_many_evictions():
+    timeline = EventTimeline(max_events=100)
+    events = [f"event {i % 7}" for i in range(10_000)]
+    for event in events:
+        timeline.append(event, timestamp=0)
+
+    expected = {}
+    for event in events[-100:]:
+        expected[event] = expected.get(event, 0) + 1
+    assert timeline.counts() == expected
+    assert timeline.dropped == 9_900
+    assert sum(timeline.counts().values()) == len(timeline)
+
+
+def test_append_returns_the_repeat_count():
+    timeline = EventTimeline()
+
+    assert [timeline.append("Email Opened") for _ in range(3)] == [1, 2, 3]
+
+
+def test_render_shows_the_trailing_window_and_hidden_events():
+    timeline = EventTimeline(max_events=10)
+    timeline.extend(f"e{i}" for i in range(12))
+
+    assert timeline.render(window=3, separator=", ") == "… 7 earlier events, e9, e10, e11"
+    timeline.append("e12")
+    assert timeline.render(window=3, separator=", ") == "… 7 earlier events, e10, e11, e12"
+
+
+def test_clear_resets_totals():
+    timeline = EventTimeline(max_events=2)
+    timeline.extend(["a", "b", "c"])
+    timeline.clear()
+
+    assert not timeline
+    assert timeline.total == timeline.dropped == 0
+    assert "b" not in timeline
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from timing_wheel import TimingWheel, VirtualClock
+
+
+def run(wheel, ticks):
+    """(tick, payload) of every timer fired over the next ``ticks`` ticks"""
+    fired = []
+    for _ in range(ticks):
+        fired.extend((wheel.now, payload) for _, payload, _ in wheel.advance())
+    return fired
+
+
+def test_timers_fire_in_order_across_every_level():
+    wheel = TimingWheel(slot_bits=2, levels=4)  # 4 slots per level, horizon of 256 ticks
+    delays = [1, 3, 4, 5, 15, 16, 17, 63, 64, 65, 200, 255]
+    for delay in reversed(delays):
+        wheel.schedule(delay, delay)
+
+    assert run(wheel, 256) == [(delay, delay) for delay in delays]
+    assert wheel.pending_timers == wheel.pending_items == 0
+
+
+def test_timers_scheduled_mid_turn_fire_on_their_tick():
+    wheel = TimingWheel(slot_bits=3, levels=3)
+    rng = random.Random(5)
+    expected, fired = [], []
+    for _ in range(40):
+        fired += run(wheel, rng.randrange(30))
+        delay = rng.randrange(1, 400)
+        wheel.schedule(delay, len(expected))
+        expected.append((wheel.now + delay, len(expected)))
+
+    fired += run(wheel, 400)
+
+    assert sorted(fired) == sorted(expected)
+    assert [tick for tick, _ in fired] == sorted(tick for tick, _ in fired)
+
+
+def test_pending_counts_follow_timer_sizes():
+    wheel = TimingWheel()
+    wheel.schedule(2, "batch", size=500)
+    wheel.schedule(2, "single")
+
+    assert (wheel.pending_timers, wheel.pending_items) == (2, 501)
+    run(wheel, 1)
+    assert (wheel.pending_timers, wheel.pending_items) == (2, 501)
+    assert [payload for _, payload in run(wheel, 1)] == ["batch", "single"]
+    assert (wheel.pending_timers, wheel.pending_items) == (0, 0)
+
+
+def test_delays_beyond_the_horizon_are_rejected():
+    wheel = TimingWheel(slot_bits=2, levels=2)
+
+    with pytest.raises(ValueError):
+        wheel.schedule(16, "too late")
+
+
+def test_virtual_clock_rounds_to_whole_ticks():
+    clock = VirtualClock(tick_seconds=60)
+
+    assert clock.ticks_for(2) == 120
+    assert clock.ticks_for(0) == 1
+    clock.ticks = 90
+    assert clock.hours == 1.5
@@ -0,0 +1,108 @@
+"""Per-session event timeline.
+
+A timeline keeps simulated events in insertion order with the time each was
+added. Events may repeat (a second "Email Opened" is a real signal), so a
+``Counter`` tracks how often each event occurs, which makes membership and
+repeat-count checks O(1). Storage is a ring buffer: past ``max_events`` the
+oldest events drop off and their counts are released, so replaying a long
+customer history keeps memory flat. Only a trailing window is rendered, and
+the rendered text is reused until the timeline changes.
+"""
+
+import os
+import time
+from collections import Counter, deque
+from itertools import islice
+
+TIMELINE_MAX_EVENTS = int(os.environ.get("TIMELINE_MAX_EVENTS", 50000))
+
+
+class EventTimeline:
+    """Insertion-ordered, bounded event history with O(1) membership"""
+
+    def __init__(self, max_events=TIMELINE_MAX_EVENTS):
+        self.max_events = max_events
+        self._events = deque(maxlen=max_events)  # (event, timestamp)
+        self._counts = Counter()
+        self.total = 0  # events ever appended, including dropped ones
+        self._rendered = None  # (total, window, separator, text)
+
+    def __len__(self):
+        return len(self._events)
+
+    def __bool__(self):
+        return bool(self._events)
+
+    def __contains__(self, event):
+        return self._counts[event] > 0
+
+    def __iter__(self):
+        return (event for event, _ in self._events)
+
+    def __reversed__(self):
+        return (event for event, _ in reversed(self._events))
+
+    @property
+    def dropped(self):
+        """Events that fell off the front of the ring buffer"""
+        return self.total - len(self._events)
+
+    # --- Updates ---
+    def append(self, event, timestamp=None):
+        """Add an event; returns how many times it is now in the timeline"""
+        if len(self._events) == self.max_events:
+            oldest, _ = self._events[0]
+            self._counts[oldest] -= 1
+            if not self._counts[oldest]:
+                del self._counts[oldest]
+        self._events.append((event, time.time() if timestamp is None else timestamp))
+        self._counts[event] += 1
+        self.total += 1
+        return self._counts[event]
+
+    def extend(self, events):
+        for event in events:
+            if isinstance(event, tuple):
+                self.append(*event)
+            else:
+                self.append(event)
+
+    def clear(self):
+        self._events.clear()
+        self._counts.clear()
+        self.total = 0
+        self._rendered = None
+
+    # --- Queries ---
+    def count(self, event):
+        return self._counts[event]
+
+    def distinct(self):
+        """Number of different events in the timeline"""
+        return len(self._counts)
+
+    def counts(self):
+        """Occurrences of each event currently in the timeline"""
+        return Counter(self._counts)
+
+    def last(self):
+        """The most recent (event, timestamp), or None"""
+        return self._events[-1] if self._events else None
+
+    def window(self, size):
+        """The last ``size`` entries as (event, timestamp), oldest first"""
+        tail = list(islice(reversed(self._events), size))
+        tail.reverse()
+        return tail
+
+    def render(self, window=20, separator=" → "):
+        """Text of the trailing window, noting how many earlier events are hidden"""
+        cached = self._rendered
+        if cached and cached[:3] == (self.total, window, separator):
+            return cached[3]
+        text = separator.join(event for event, _ in self.window(window))
+        hidden = len(self._events) - min(window, len(self._events))
+        if hidden:
+            text = f"… {hidden:,} earlier events{separator}{text}"
+        self._rendered = (self.total, window, separator, text)
+        return text